@@ -0,0 +1,158 @@
+# ann_index.py
+import json
+from typing import Dict
+import numpy as np
+import faiss
+
+# 근사 최근접 이웃(ANN) 색인 종류와 기본 파라미터
+#  flat:     전수 검색 (정확, 작은 코퍼스용)
+#  ivf_flat: nlist개 군집 중 nprobe개만 검색
+#  hnsw:     그래프 검색 (학습 불필요, 삭제 시 그래프 재구성)
+#  ivf_pq:   IVF + 곱 양자화 (벡터당 m * nbits 비트만 저장)
+#  pq:       전수 검색 + 곱 양자화 (군집 없이 모든 PQ 코드와 비교)
+INDEX_TYPES = ('flat', 'ivf_flat', 'hnsw', 'ivf_pq', 'pq')
+DEFAULT_INDEX_PARAMS = {
+    'flat': {'storage': 'float32'},
+    'ivf_flat': {'nlist': 256, 'nprobe': 16, 'storage': 'float32'},
+    'hnsw': {'M': 32, 'ef_construction': 80, 'ef_search': 64, 'storage': 'float32'},
+    'ivf_pq': {'nlist': 256, 'nprobe': 16, 'm': None, 'nbits': 8},  # m=None: 차원에 맞춰 자동 선택
+    'pq': {'m': None, 'nbits': 8},
+}
+# flat/ivf_flat/hnsw 벡터 저장 형식 (float16: 1/2 크기, int8: 1/4 크기로 차원별 최솟값~최댓값을 256단계로 양자화)
+STORAGE_TYPES = {
+    'float32': None,
+    'float16': faiss.ScalarQuantizer.QT_fp16,
+    'int8': faiss.ScalarQuantizer.QT_8bit,
+}
+MAX_PQ_SUBQUANTIZERS = 64
+# faiss 권장: 군집(또는 PQ 코드)당 학습 벡터 39개 이상
+MIN_POINTS_PER_CENTROID = 39
+# 양자화/IVF 색인의 벡터 수가 학습에 쓴 벡터 수의 이 배수를 넘으면 원본 벡터로 다시 학습
+RETRAIN_GROWTH_FACTOR = 2.0
+
+
+def resolve_index_params(index_type: str, params: Dict = None) -> Dict:
+    """기본 파라미터에 사용자 파라미터를 덮어쓴 값"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+    merged = dict(DEFAULT_INDEX_PARAMS[index_type])
+    unknown = set(params or {}) - set(merged)
+    if unknown:
+        raise ValueError(f"Unknown {index_type} parameters: {sorted(unknown)}")
+    merged.update(params or {})
+    if merged.get('storage', 'float32') not in STORAGE_TYPES:
+        raise ValueError(f"Unknown storage: {merged['storage']} (expected one of {tuple(STORAGE_TYPES)})")
+    return merged
+
+
+def index_spec(index_type: str, params: Dict = None) -> str:
+    """색인 설정을 나타내는 문자열 (저장된 색인 재사용 여부 판단용)"""
+    return f"{index_type}{json.dumps(resolve_index_params(index_type, params), sort_keys=True)}"
+
+
+def build_index(index_type: str, vectors: np.ndarray, params: Dict = None) -> faiss.Index:
+    """
+    빈 색인을 만들고 필요하면 vectors로 학습 (벡터 추가는 호출하는 쪽에서)
+    학습 벡터가 적으면 nlist/nbits를 데이터 수에 맞게 줄입니다.
+    """
+    params = resolve_index_params(index_type, params)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    qtype = STORAGE_TYPES[params.get('storage', 'float32')]
+
+    if index_type == 'flat':
+        if qtype is None:
+            return faiss.IndexFlatL2(dim)
+        index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2)
+        index.train(vectors)
+        return index
+
+    if index_type == 'hnsw':
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, params['M'])
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, params['M'])
+            index.train(vectors)
+        index.hnsw.efConstruction = params['ef_construction']
+        index.hnsw.efSearch = params['ef_search']
+        return index
+
+    if index_type == 'pq':
+        index = faiss.IndexPQ(dim, *_pq_shape(params, count, dim))
+        index.train(vectors)
+        return index
+
+    nlist = max(1, min(params['nlist'], count // MIN_POINTS_PER_CENTROID))
+    if nlist != params['nlist']:
+        print(f"학습 벡터 {count}개에 맞게 nlist를 {params['nlist']} -> {nlist}로 줄입니다.")
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == 'ivf_flat':
+        if qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, faiss.METRIC_L2)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, *_pq_shape(params, count, dim))
+    # 저장/로드 후에도 검색 범위가 유지되도록 색인 자체에 nprobe 설정 (write_index가 함께 저장)
+    index.nprobe = min(params['nprobe'], nlist)
+    index.train(vectors)
+    return index
+
+
+def _pq_shape(params: Dict, count: int, dim: int) -> tuple:
+    """PQ 부분 벡터 수 m과 코드 비트 수 nbits (학습 벡터가 적으면 nbits를 줄임)"""
+    m = params['m'] or default_pq_subquantizers(dim)
+    if dim % m:
+        raise ValueError(f"pq: m={m} must divide the vector dimension {dim}")
+    nbits = params['nbits']
+    while nbits > 1 and count < MIN_POINTS_PER_CENTROID * (1 << nbits):
+        nbits -= 1
+    if nbits != params['nbits']:
+        print(f"학습 벡터 {count}개에 맞게 nbits를 {params['nbits']} -> {nbits}로 줄입니다.")
+    return m, nbits
+
+
+def default_pq_subquantizers(dim: int) -> int:
+    """부분 벡터가 2차원 이상이 되는 dim의 약수 중 가장 큰 값 (최대 MAX_PQ_SUBQUANTIZERS)"""
+    limit = max(1, min(MAX_PQ_SUBQUANTIZERS, dim // 2))
+    return next(m for m in range(limit, 0, -1) if dim % m == 0)
+
+
+def remove_ids(index: faiss.Index, ids: np.ndarray) -> bool:
+    """
+    색인에서 위치 ids의 벡터 삭제 (남은 벡터는 순서를 유지한 채 앞으로 당겨짐)
+    코드를 그대로 저장하는 전수 검색 색인(flat, 양자화 flat, pq)은 바로 삭제하고,
+    삭제를 지원하지 않는 양자화하지 않은 HNSW는 남은 벡터를 (손실 없이) 복원해 다시 추가합니다.
+    IVF와 양자화 HNSW는 복원한 값을 다시 양자화하게 되고 군집도 처음 학습한 벡터에 머무르므로
+    삭제하지 않고 False를 반환합니다 (호출하는 쪽에서 원본 벡터로 rebuild_index).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if isinstance(index, faiss.IndexFlatCodes):
+        index.remove_ids(ids)
+        return True
+    if isinstance(index, faiss.IndexHNSWFlat):
+        keep = np.setdiff1d(np.arange(index.ntotal), ids)
+        vectors = index.reconstruct_n(0, index.ntotal)[keep]
+        index.reset()
+        if len(vectors):
+            index.add(vectors)
+        return True
+    return False
+
+
+def trained_on_data(index: faiss.Index) -> bool:
+    """코드/군집이 학습 벡터에 따라 정해지는 색인인지 (양자화 저장, PQ, IVF)"""
+    return not isinstance(index, (faiss.IndexFlat, faiss.IndexHNSWFlat))
+
+
+def rebuild_index(index_type: str, vectors: np.ndarray, params: Dict = None) -> faiss.Index:
+    """원본 float 벡터로 새로 학습한 색인에 벡터를 모두 추가"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = build_index(index_type, vectors, params)
+    index.add(vectors)
+    return index
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """직렬화한 색인 크기 (메모리 사용량 근사치)"""
+    return int(faiss.serialize_index(index).nbytes)
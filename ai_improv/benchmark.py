@@ -0,0 +1,363 @@
+import os
+import sys
+import glob
+import time
+import shutil
+from midi_feature_extractor import MIDIFeatureExtractor, ENGINES
+from chord_lut import get_chord_lut, _music21_common_name, _dyad_name
+from feature_cache import FeatureCache
+from musical_embeddings import MusicalEmbeddings, EMBEDDING_DIM
+import numpy as np
+from ann_index import INDEX_TYPES, build_index, index_memory_bytes
+
+# python benchmark.py [MIDI 디렉토리] [반복 횟수]
+
+def time_engine(extractor, midi_files, engine, repeat):
+    """엔진별로 전체 파일 특징 추출에 걸린 시간(초) 측정"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for midi_file in midi_files:
+            extractor.extract_features(midi_file, engine=engine)
+    return time.perf_counter() - start
+
+def benchmark_engines(midi_files, repeat=3):
+    extractor = MIDIFeatureExtractor(use_cache=False)
+
+    # 엔진별 결과가 같은지 먼저 확인
+    mismatches = []
+    for midi_file in midi_files:
+        results = [extractor.extract_features(midi_file, engine=engine) for engine in ENGINES]
+        if any(result != results[0] for result in results[1:]):
+            mismatches.append(os.path.basename(midi_file))
+
+    print(f"\n=== 특징 추출 엔진 비교 ({len(midi_files)}개 파일 x {repeat}회) ===")
+    timings = {engine: time_engine(extractor, midi_files, engine, repeat) for engine in ENGINES}
+    total = len(midi_files) * repeat
+    for engine, elapsed in timings.items():
+        print(f"{engine:>8}: {elapsed:.3f}초 ({total / elapsed:.1f} 파일/초)")
+    print(f"속도 향상: {timings['music21'] / timings['mido']:.1f}배")
+    print(f"결과 불일치 파일: {mismatches if mismatches else '없음'}")
+
+def benchmark_cache(midi_files, cache_dir):
+    """빈 캐시(미스)와 채워진 캐시(적중)에서의 특징 추출 시간 비교"""
+    cache = FeatureCache(cache_dir)
+    cache.clear()
+    extractor = MIDIFeatureExtractor(cache=cache)
+
+    print(f"\n=== 특징 캐시 비교 ({len(midi_files)}개 파일) ===")
+    cold = time_engine(extractor, midi_files, None, 1)
+    warm = time_engine(extractor, midi_files, None, 1)
+    print(f"빈 캐시: {cold:.3f}초, 채워진 캐시: {warm:.3f}초 ({cold / warm:.1f}배)")
+    print(f"캐시 통계: {cache.stats()}")
+    cache.clear()
+
+def benchmark_batch(midi_files, workers=None):
+    """순차 추출과 프로세스 풀 일괄 추출 시간 비교"""
+    extractor = MIDIFeatureExtractor(engine='mido', use_cache=False)
+
+    print(f"\n=== 일괄 특징 추출 비교 ({len(midi_files)}개 파일) ===")
+    serial = time_engine(extractor, midi_files, None, 1)
+    start = time.perf_counter()
+    records = list(extractor.extract_features_batch(midi_files, workers=workers))
+    parallel = time.perf_counter() - start
+    failures = [record for record in records if not record['ok']]
+    print(f"순차: {serial:.3f}초, 프로세스 풀: {parallel:.3f}초 ({serial / parallel:.1f}배)")
+    print(f"실패: {[(record['file'], record['error_type']) for record in failures] if failures else '없음'}")
+
+def benchmark_groups(midi_files, groups=('tempo', 'time_signatures')):
+    """미리 만든 노트 테이블에서 전체 특징 계산과 선택한 그룹만 계산하는 시간 비교"""
+    extractor = MIDIFeatureExtractor(engine='mido', use_cache=False)
+    tables = [extractor.extract_note_table(midi_file) for midi_file in midi_files]
+
+    print(f"\n=== 선택적 특징 그룹 비교 ({len(midi_files)}개 파일, {list(groups)}) ===")
+    _music21_common_name.cache_clear()
+    _dyad_name.cache_clear()
+    start = time.perf_counter()
+    for table in tables:
+        extractor.features_from_table(table)
+    full = time.perf_counter() - start
+
+    _music21_common_name.cache_clear()
+    _dyad_name.cache_clear()
+    start = time.perf_counter()
+    for table in tables:
+        features = extractor.features_from_table(table, groups)
+        for name in groups:
+            features[name]
+    selected = time.perf_counter() - start
+    print(f"전체 그룹: {full:.4f}초, 선택 그룹: {selected:.4f}초 ({full / selected:.1f}배)")
+
+def benchmark_chord_names(midi_files):
+    """music21 commonName 직접 계산과 음높이 클래스 표 조회의 코드 이름 계산 시간 비교"""
+    extractor = MIDIFeatureExtractor(engine='mido', use_cache=False)
+    chords = [pitches for midi_file in midi_files
+              for pitches in extractor.extract_note_table(midi_file).chord_pitches()]
+    lut = get_chord_lut()
+
+    print(f"\n=== 코드 이름 계산 비교 ({len(chords)}개 코드) ===")
+    _music21_common_name.cache_clear()
+    start = time.perf_counter()
+    expected = [_music21_common_name(pitches) for pitches in chords]
+    direct = time.perf_counter() - start
+
+    _music21_common_name.cache_clear()
+    _dyad_name.cache_clear()
+    start = time.perf_counter()
+    names = [lut.name(pitches) for pitches in chords]
+    lookup = time.perf_counter() - start
+    print(f"music21: {direct:.4f}초, 코드 표: {lookup:.4f}초 ({direct / lookup:.1f}배)")
+    print(f"이름 불일치: {sum(1 for a, b in zip(expected, names) if a != b)}개")
+
+def benchmark_embeddings(midi_files, repeat=100):
+    """특징 수치 임베딩 처리량 (Ollama 임베딩은 서버 왕복이 필요해 여기서는 측정하지 않음)"""
+    extractor = MIDIFeatureExtractor(use_cache=False, extended=True)
+    features = [extractor.extract_features(midi_file, engine='mido') for midi_file in midi_files]
+    texts = [str(f) for f in features]
+    embeddings = MusicalEmbeddings()
+
+    print(f"\n=== 특징 수치 임베딩 ({len(features)}개 x {repeat}회, {embeddings.dimension}차원) ===")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for f in features:
+            embeddings.embed_features(f)
+    direct = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        embeddings.embed_documents(texts)
+    parsed = time.perf_counter() - start
+    count = len(features) * repeat
+    print(f"딕셔너리 입력: {count / direct:.0f}개/초, 텍스트 입력: {count / parsed:.0f}개/초")
+
+def synthetic_corpus(count, queries, dim=EMBEDDING_DIM, clusters=200, seed=0):
+    """군집 구조가 있는 단위 벡터 코퍼스와 질의 (실제 임베딩 분포 흉내)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.random((clusters, dim), dtype=np.float32)
+    def sample(n):
+        x = centers[rng.integers(clusters, size=n)] + rng.normal(0, 0.05, (n, dim)).astype(np.float32)
+        return x / np.linalg.norm(x, axis=1, keepdims=True)
+    return sample(count), sample(queries)
+
+def benchmark_ann(count=100000, queries=500, k=10, index_params=None):
+    """색인 종류별 recall@k (전수 검색 기준), 질의 지연, 생성 시간, 색인 크기"""
+    index_params = index_params or {}
+    corpus, query = synthetic_corpus(count, queries)
+    print(f"\n=== ANN 색인 비교 (합성 벡터 {count}개, 질의 {queries}개, k={k}) ===")
+    exact = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_index(index_type, corpus, index_params.get(index_type))
+        index.add(corpus)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for q in query:
+            _, found = index.search(q[None, :], k)
+        latency = (time.perf_counter() - start) / queries * 1000
+        _, found = index.search(query, k)
+        if exact is None:
+            exact = found
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, exact)])
+        print(f"{index_type:9s} recall@{k}: {recall:.3f}, 질의: {latency:.3f}ms, "
+              f"생성: {build:.2f}초, 크기: {index_memory_bytes(index) / 1024 / 1024:.1f}MB")
+
+def benchmark_quantization(count=50000, queries=500, k=10, dims=(EMBEDDING_DIM, 768)):
+    """벡터 저장 형식별 (float32/float16/int8/PQ) 벡터당 크기, recall@k (float32 전수 검색 기준), 질의 지연"""
+    configs = [
+        ('float32', 'flat', {}),
+        ('float16', 'flat', {'storage': 'float16'}),
+        ('int8', 'flat', {'storage': 'int8'}),
+        ('pq', 'pq', {}),
+        ('hnsw+int8', 'hnsw', {'storage': 'int8'}),
+    ]
+    for dim in dims:
+        corpus, query = synthetic_corpus(count, queries, dim=dim)
+        print(f"\n=== 벡터 양자화 (합성 벡터 {count}개 x {dim}차원, 질의 {queries}개, k={k}) ===")
+        exact = None
+        for name, index_type, params in configs:
+            index = build_index(index_type, corpus, params)
+            index.add(corpus)
+            start = time.perf_counter()
+            _, found = index.search(query, k)
+            latency = (time.perf_counter() - start) / queries * 1000
+            if exact is None:
+                exact = found
+            recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, exact)])
+            print(f"{name:10s} 벡터당 {index_memory_bytes(index) / count:7.1f}바이트, recall@{k}: {recall:.3f}, "
+                  f"질의: {latency:.3f}ms")
+
+def benchmark_filter(count=100000, queries=200, k=3, seed=0):
+    """메타데이터 사전 필터 검색과 전체 검색의 질의 시간 비교 (합성 코퍼스, flat 색인)"""
+    from langchain_core.documents import Document
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from metadata_filter import AttributeIndex, filtered_search
+
+    rng = np.random.default_rng(seed)
+    corpus, query = synthetic_corpus(count, queries)
+    meters = np.array(['4/4', '3/4', '6/8', '5/4'])[rng.choice(4, size=count, p=[0.7, 0.15, 0.1, 0.05])]
+    tempos = rng.integers(60, 200, size=count)
+    docs = {str(i): Document(page_content="", metadata={'features': {
+        'tempo': {'main_tempo': float(tempos[i])}, 'time_signatures': [str(meters[i])]}}) for i in range(count)}
+    index = build_index('flat', corpus)
+    index.add(corpus)
+    store = FAISS(embedding_function=None, index=index, docstore=InMemoryDocstore(docs),
+                  index_to_docstore_id={i: str(i) for i in range(count)})
+    attributes = AttributeIndex.from_vectorstore(store)
+
+    print(f"\n=== 메타데이터 사전 필터 ({count}개, 질의 {queries}개, k={k}) ===")
+    start = time.perf_counter()
+    for q in query:
+        store.similarity_search_with_score_by_vector(q, k=k)
+    full = (time.perf_counter() - start) / queries * 1000
+    print(f"필터 없음: {full:.3f}ms")
+    for filters in ({'time_signature': '3/4'},
+                    {'time_signature': '5/4', 'main_tempo': (100, 120)},
+                    {'main_tempo': (60, 180)}):
+        start = time.perf_counter()
+        for q in query:
+            mask = attributes.candidates(filters)
+            filtered_search(store, q, k, mask)
+        elapsed = (time.perf_counter() - start) / queries * 1000
+        print(f"{filters}: 후보 {int(mask.sum())}개, {elapsed:.3f}ms ({full / elapsed:.1f}배)")
+
+def benchmark_rerank(midi_files, candidates=200, repeat=50):
+    """음악적 재정렬 (음높이 클래스 분포 + 음정 n-gram + 선율 윤곽 DTW) 후보 200개 처리 시간"""
+    from musical_rerank import similarity_scores
+    extractor = MIDIFeatureExtractor(use_cache=False, extended=True)
+    features = [extractor.extract_features(midi_file, engine='mido') for midi_file in midi_files]
+    pool = (features * (candidates // len(features) + 1))[:candidates]
+
+    print(f"\n=== 음악적 재정렬 (후보 {candidates}개 x {repeat}회) ===")
+    start = time.perf_counter()
+    for i in range(repeat):
+        similarity_scores(features[i % len(features)], pool)
+    print(f"질의당 {(time.perf_counter() - start) / repeat * 1000:.2f}ms")
+
+def benchmark_motif(midi_files, copies=200, queries=100, seed=0):
+    """모티프 역색인: 학습 파일 선율선을 copies배로 늘린 코퍼스의 색인 시간/크기와 모티프 질의 시간"""
+    from motif_index import MotifIndex
+    extractor = MIDIFeatureExtractor(use_cache=False)
+    lines = [extractor.extract_note_table(midi_file, engine='mido').melody_line() for midi_file in midi_files]
+    index = MotifIndex()
+    for copy in range(copies):
+        for midi_file, line in zip(midi_files, lines):
+            index.add(f"{copy}:{midi_file}", line)
+    start = time.perf_counter()
+    index.build()
+    elapsed = time.perf_counter() - start
+    notes = len(index.pitches)
+
+    print(f"\n=== 모티프 역색인 (음 {notes}개, 파일 {len(index)}개) ===")
+    print(f"색인: {elapsed:.2f}s, 게시 목록 {index.postings.nbytes / notes:.2f}바이트/음, "
+          f"전체 {index.memory_bytes() / 1e6:.1f}MB")
+    rng = np.random.default_rng(seed)
+    motifs = []
+    for _ in range(queries):
+        pitches = lines[rng.integers(len(lines))][0]
+        if len(pitches) >= 8:
+            offset = rng.integers(len(pitches) - 7)
+            motifs.append(pitches[offset:offset + 8] + rng.integers(-5, 6))
+    start = time.perf_counter()
+    for motif in motifs:
+        index.search(motif, k=10)
+    print(f"8음 모티프 질의 {len(motifs)}개: 질의당 {(time.perf_counter() - start) / max(1, len(motifs)) * 1000:.2f}ms")
+
+def benchmark_dedup(count=20000, seed=0):
+    """MinHash/LSH 중복 제거: 합성 선율 count개 (절반은 조옮김/템포 변경한 복사본)의 서명/묶음 시간과 검출률"""
+    from near_duplicates import NearDuplicateIndex
+    rng = np.random.default_rng(seed)
+    index = NearDuplicateIndex()
+    lines = []
+    for _ in range(count // 2):
+        size = int(rng.integers(40, 400))
+        track_start = np.zeros(size, dtype=bool)
+        track_start[0] = True
+        lines.append((np.cumsum(rng.integers(-5, 6, size)) + 60,
+                      np.cumsum(rng.choice([0.25, 0.5, 1.0], size)), track_start))
+    copies = [lines[i] for i in rng.integers(len(lines), size=count - len(lines))]
+    copies = [(pitches + rng.integers(-6, 7), onsets * 1.5, track_start) for pitches, onsets, track_start in copies]
+
+    print(f"\n=== MinHash 중복 제거 (파일 {count}개, 복사본 {len(copies)}개) ===")
+    start = time.perf_counter()
+    signatures = [index.signature(line) for line in lines + copies]
+    print(f"서명: {(time.perf_counter() - start) / count * 1e6:.0f}us/파일")
+    start = time.perf_counter()
+    dropped = sum(index.add(str(i), signature)[0] is not None for i, signature in enumerate(signatures))
+    print(f"묶음: {(time.perf_counter() - start) / count * 1e6:.0f}us/파일, 제외 {dropped}개")
+
+def benchmark_backends(midi_files, store_dir, copies=100, queries=200, k=3):
+    """
+    벡터 저장소 백엔드별 (FAISS / Chroma) 같은 코퍼스의 추가 처리량 (저장 포함), 시작 시간 (로드 + 첫 질의), 질의 지연
+    파일 특징을 copies번 복제하고 템포를 조금씩 바꿔 코퍼스 크기를 늘림
+    """
+    from midi_vectorizer import MIDIVectorizer
+    extractor = MIDIFeatureExtractor(extended=True)
+    features = []
+    for midi_file in midi_files:
+        try:
+            features.append((midi_file, extractor.extract_features(midi_file)))
+        except Exception as e:
+            print(f"Error processing {midi_file}: {str(e)}")
+    if not features:
+        return
+
+    print(f"\n=== 저장소 백엔드 (문서 {len(features) * copies}개, 질의 {queries}개, k={k}) ===")
+    query_texts = [str(f) for _, f in features]
+    query_texts = (query_texts * (queries // len(query_texts) + 1))[:queries]
+    for backend in ('faiss', 'chroma'):
+        vectorizer = MIDIVectorizer(backend=backend, motif_length=None, dedup_threshold=None)
+        docs = []
+        for copy in range(copies):
+            for midi_file, f in features:
+                tempo = dict(f.get('tempo') or {})
+                tempo['main_tempo'] = (tempo.get('main_tempo') or 120.0) + copy * 0.01
+                docs.append(vectorizer.create_document(dict(f, tempo=tempo), f"{midi_file}#{copy}"))
+        path = os.path.join(store_dir, backend)
+        shutil.rmtree(path, ignore_errors=True)
+
+        start = time.perf_counter()
+        vectorstore = vectorizer.build_vectorstore(docs, path=path)
+        vectorizer.save_vectorstore(vectorstore, path)
+        insert_time = time.perf_counter() - start
+        del vectorstore
+
+        loader = MIDIVectorizer(backend=backend, motif_length=None, dedup_threshold=None)
+        start = time.perf_counter()
+        vectorstore = loader.load_vectorstore(path)
+        load_time = time.perf_counter() - start
+        vectorstore.similarity_search(query_texts[0], k=k)
+        startup_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for text in query_texts:
+            vectorstore.similarity_search(text, k=k)
+        latency = (time.perf_counter() - start) / queries * 1000
+        print(f"{backend:7s} 추가: {len(docs) / insert_time:8.0f}문서/초, 로드: {load_time * 1000:7.1f}ms, "
+              f"로드 + 첫 질의: {startup_time * 1000:7.1f}ms, 질의: {latency:.3f}ms")
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    midi_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_dir, "data", "training")
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    midi_files = sorted(glob.glob(os.path.join(midi_dir, "*.mid")))
+    if not midi_files:
+        print(f"Error: No MIDI files found in {midi_dir}")
+        return
+
+    benchmark_engines(midi_files, repeat)
+    benchmark_batch(midi_files)
+    benchmark_groups(midi_files)
+    benchmark_chord_names(midi_files)
+    benchmark_embeddings(midi_files)
+    benchmark_ann()
+    benchmark_quantization()
+    benchmark_filter()
+    benchmark_rerank(midi_files)
+    benchmark_motif(midi_files)
+    benchmark_dedup()
+    benchmark_backends(midi_files, os.path.join(base_dir, "data", "cache", "benchmark_backends"))
+    benchmark_cache(midi_files, os.path.join(base_dir, "data", "cache", "benchmark"))
+
+if __name__ == "__main__":
+    main()
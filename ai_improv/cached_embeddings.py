@@ -0,0 +1,145 @@
+# cached_embeddings.py
+import os
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+from feature_cache import FeatureCache
+
+DEFAULT_EMBEDDING_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache", "embeddings")
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # 첫 재시도 대기 시간(초), 재시도마다 두 배
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    모델 기반 Embeddings를 감싸 배치 호출, 동시 요청 수 제한, 재시도와
+    (모델, 텍스트 해시) 키 디스크 캐시를 더합니다.
+    같은 텍스트를 다시 임베딩하면 모델을 호출하지 않습니다.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: FeatureCache = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_retries: int = DEFAULT_MAX_RETRIES, backoff: float = DEFAULT_BACKOFF):
+        """
+        Args:
+            embeddings: 실제 임베딩을 계산하는 Embeddings (예: OllamaEmbeddings)
+            model: 캐시 키에 들어가는 모델 이름 (모델을 바꾸면 캐시가 분리됨)
+            cache: 벡터 저장용 디스크 캐시 (생략하면 data/cache/embeddings)
+            batch_size: 한 번의 요청에 보내는 텍스트 수
+            max_concurrency: 동시에 진행하는 요청 수 상한
+            max_retries: 요청 실패 시 재시도 횟수
+            backoff: 첫 재시도 전 대기 시간(초)
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache if cache is not None else FeatureCache(DEFAULT_EMBEDDING_CACHE_DIR)
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.requests = 0  # 모델에 보낸 요청 수 (재시도 포함)
+        self.embedded_texts = 0  # 모델로 계산한 텍스트 수
+
+    def _lookup(self, texts: List[str]):
+        """텍스트별 캐시 키, 캐시에서 찾은 벡터 (키 -> 벡터), 모델로 계산할 텍스트 (키 -> 텍스트)"""
+        keys = [self.cache.make_key(text.encode("utf-8"), self.model) for text in texts]
+        vectors = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self.cache.get(key)
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+        return keys, vectors, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # 캐시에 없는 텍스트만 (중복 제거 후) 모델로 계산
+        keys, vectors, missing = self._lookup(texts)
+
+        if missing:
+            items = list(missing.items())
+            batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                for batch, batch_vectors in zip(batches, executor.map(self._embed_batch, batches)):
+                    for (key, _), vector in zip(batch, batch_vectors):
+                        self.cache.put(key, vector)
+                        vectors[key] = vector
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """embed_documents의 코루틴 버전 (모델의 비동기 호출 사용, 캐시는 같음)"""
+        keys, vectors, missing = self._lookup(texts)
+
+        if missing:
+            items = list(missing.items())
+            batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def embed(batch):
+                async with semaphore:
+                    return await self._aembed_batch(batch)
+
+            for batch, batch_vectors in zip(batches, await asyncio.gather(*(embed(batch) for batch in batches))):
+                for (key, _), vector in zip(batch, batch_vectors):
+                    self.cache.put(key, vector)
+                    vectors[key] = vector
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> Dict:
+        """캐시 적중/미스와 모델 요청 수"""
+        stats = self.cache.stats()
+        stats['requests'] = self.requests
+        stats['embedded_texts'] = self.embedded_texts
+        return stats
+
+    def _embed_batch(self, batch) -> List[List[float]]:
+        """배치 하나를 임베딩 (실패하면 지수 백오프로 재시도)"""
+        texts = [text for _, text in batch]
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+                self.embedded_texts += len(texts)
+                return vectors
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.1)
+                print(f"임베딩 요청 실패 ({attempt + 1}/{self.max_retries + 1}), {delay:.1f}초 후 재시도: {str(e)}")
+                time.sleep(delay)
+
+    async def _aembed_batch(self, batch) -> List[List[float]]:
+        """_embed_batch의 코루틴 버전"""
+        texts = [text for _, text in batch]
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            try:
+                vectors = await self.embeddings.aembed_documents(texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+                self.embedded_texts += len(texts)
+                return vectors
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.1)
+                print(f"임베딩 요청 실패 ({attempt + 1}/{self.max_retries + 1}), {delay:.1f}초 후 재시도: {str(e)}")
+                await asyncio.sleep(delay)
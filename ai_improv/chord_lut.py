@@ -0,0 +1,240 @@
+# chord_lut.py
+import os
+import json
+import random
+import importlib.metadata
+from functools import lru_cache
+from typing import Dict, List
+
+# 12비트 음높이 클래스 마스크(bit i = 음높이 클래스 i) -> [코드 이름, 근음 클래스, 성질]
+# 코드 이름이 실제 음 배치(베이스, 옥타브, 음정)에 따라 달라지는 마스크는 이름이 None이며,
+# 이 경우 music21 commonName으로 직접 계산합니다.
+# 두 음 코드는 [첫 음의 음높이 클래스][간격 + 127] -> 이름 표를 따로 둠
+DEFAULT_LUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chord_lut.json")
+LUT_SIZE = 4096
+MAX_INTERVAL = 127
+# 표를 만든 music21 버전과 설치된 버전이 다를 때 로드하면서 music21로 다시 계산해 비교할 항목 수
+SPOT_CHECK_SIZE = 24
+
+
+def pitch_class_mask(pitches) -> int:
+    """MIDI 음높이 목록 -> 12비트 음높이 클래스 마스크"""
+    mask = 0
+    for p in pitches:
+        mask |= 1 << (p % 12)
+    return mask
+
+
+@lru_cache(maxsize=None)
+def _music21_common_name(pitches: tuple) -> str:
+    """MIDI 음높이 목록으로 music21 코드 이름 계산 (같은 구성은 캐시)"""
+    return str(_make_chord(pitches).commonName)
+
+
+@lru_cache(maxsize=None)
+def _dyad_name(pitch_class: int, interval: int) -> str:
+    """두 음 코드 이름은 첫 음의 음높이 클래스와 두 음의 간격(반음)으로 정해짐"""
+    # 두 음 모두 MIDI 범위(0~127)에 들어가는 가장 낮은 옥타브에 배치
+    base = pitch_class + 12 * max(0, -((min(0, interval) + pitch_class) // 12))
+    return _music21_common_name((base, base + interval))
+
+
+@lru_cache(maxsize=None)
+def _music21_root_quality(mask: int):
+    """음높이 클래스 마스크의 근음 클래스와 성질 (build_chord_lut와 같은 배치로 계산)"""
+    c = _make_chord(tuple(60 + pc for pc in range(12) if mask >> pc & 1))
+    return c.root().pitchClass, c.quality
+
+
+def installed_music21_version():
+    """설치된 music21 버전 (music21을 import하지 않고 확인, 없으면 None)"""
+    try:
+        return importlib.metadata.version("music21")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def _compatible(data: Dict) -> bool:
+    """
+    다른 music21 버전으로 만든 표가 설치된 music21과 같은 결과를 내는지 표본 항목으로 확인
+    이름이 있는 마스크와 두 음 코드를 고르게 골라 build_chord_lut와 같은 방식으로 다시 계산해 비교
+    """
+    try:
+        entries, dyads = data['entries'], data.get('dyads')
+        named = [mask for mask, entry in enumerate(entries) if entry[0] is not None]
+        step = max(1, len(named) // SPOT_CHECK_SIZE)
+        for mask in named[::step]:
+            name, root, quality = entries[mask]
+            pitches = tuple(60 + pc for pc in range(12) if mask >> pc & 1)
+            if name != _music21_common_name(pitches) or [root, quality] != list(_music21_root_quality(mask)):
+                return False
+        if dyads is not None:
+            for pitch_class, interval in ((0, 7), (4, -3), (9, 12), (11, 1)):
+                if dyads[pitch_class][interval + MAX_INTERVAL] != _dyad_name(pitch_class, interval):
+                    return False
+    except (ImportError, KeyError, IndexError, TypeError, ValueError):
+        return False
+    return True
+
+
+def _make_chord(pitches):
+    from music21 import chord, pitch
+    # music21 MIDI 변환과 같은 철자(C#, E- 등)를 쓰도록 midi 값으로 음높이 생성
+    chord_pitches = []
+    for midi_pitch in pitches:
+        p = pitch.Pitch()
+        p.midi = midi_pitch
+        chord_pitches.append(p)
+    c = chord.Chord()
+    c.pitches = tuple(chord_pitches)
+    return c
+
+
+def run_length_encode(values: List[int]) -> Dict:
+    """연속으로 반복되는 값을 (값, 반복 횟수) 두 리스트로 압축"""
+    ids, counts = [], []
+    for value in values:
+        if ids and ids[-1] == value:
+            counts[-1] += 1
+        else:
+            ids.append(value)
+            counts.append(1)
+    return {'chord_ids': ids, 'run_lengths': counts}
+
+
+def run_length_decode(encoded: Dict) -> List[int]:
+    """run_length_encode 결과를 원래 값 목록으로 복원"""
+    values = []
+    for value, count in zip(encoded['chord_ids'], encoded['run_lengths']):
+        values.extend([value] * count)
+    return values
+
+
+class ChordLookupTable:
+    """
+    음높이 클래스 마스크 4096개에 대해 미리 계산한 코드 이름/근음/성질 표.
+    chord_id는 음높이 클래스 마스크(0~4095) 자체이므로 파일이 달라도 같은 구성은 같은 ID를 가집니다.
+    """
+
+    def __init__(self, lut_path: str = DEFAULT_LUT_PATH):
+        self.lut_path = lut_path
+        self.names = [None] * LUT_SIZE
+        self.roots = [None] * LUT_SIZE
+        self.qualities = [None] * LUT_SIZE
+        self.dyads = None
+        self.music21_version = None
+        self.fallbacks = 0  # 표에 이름이 없어 music21로 계산한 횟수
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.lut_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"코드 표를 불러오지 못했습니다 ({self.lut_path}): {str(e)}")
+            return
+        self.music21_version = data.get('music21_version')
+        installed = installed_music21_version()
+        if self.music21_version != installed and not _compatible(data):
+            # 코드 이름/근음/성질이 설치된 music21과 다르면 표를 쓰지 않고 music21로 계산
+            print(f"코드 표(music21 {self.music21_version})가 설치된 music21 {installed}의 결과와 다릅니다. "
+                  f"music21로 직접 계산합니다 (python chord_lut.py로 표를 다시 만드세요).")
+            return
+        for mask, (name, root, quality) in enumerate(data['entries']):
+            self.names[mask] = name
+            self.roots[mask] = root
+            self.qualities[mask] = quality
+        self.dyads = data.get('dyads')
+
+    def name(self, pitches) -> str:
+        """music21 Chord.commonName과 같은 코드 이름 (표에 있으면 O(1))"""
+        name = self.names[pitch_class_mask(pitches)]
+        if name is not None:
+            return name
+        if len(pitches) == 2:
+            if self.dyads is not None:
+                return self.dyads[pitches[0] % 12][pitches[1] - pitches[0] + MAX_INTERVAL]
+            return _dyad_name(pitches[0] % 12, pitches[1] - pitches[0])
+        self.fallbacks += 1
+        return _music21_common_name(tuple(pitches))
+
+    def identify(self, pitches) -> Dict:
+        """코드 ID(음높이 클래스 마스크), 이름, 근음 클래스, 성질"""
+        mask = pitch_class_mask(pitches)
+        root, quality = self.root_quality(mask)
+        return {
+            'chord_id': mask,
+            'name': self.name(pitches),
+            'root': root,
+            'quality': quality
+        }
+
+    def root_quality(self, mask: int):
+        """코드 ID(음높이 클래스 마스크)의 근음 클래스와 성질 (표를 쓰지 못하면 music21로 계산)"""
+        if self.roots[mask] is None and mask:
+            return _music21_root_quality(mask)
+        return self.roots[mask], self.qualities[mask]
+
+    def encode_progression(self, chord_pitches: List[tuple]) -> Dict:
+        """코드 진행을 코드 ID 런렝스 인코딩으로 압축"""
+        return run_length_encode([pitch_class_mask(pitches) for pitches in chord_pitches])
+
+
+@lru_cache(maxsize=None)
+def get_chord_lut(lut_path: str = DEFAULT_LUT_PATH) -> ChordLookupTable:
+    """프로세스당 한 번만 읽는 공유 코드 표"""
+    return ChordLookupTable(lut_path)
+
+
+def _sample_voicings(pcs: List[int], rng: random.Random) -> List[tuple]:
+    """같은 음높이 클래스 집합의 여러 배치 (베이스 전위, 옥타브 중복, 넓은 배치)"""
+    voicings = []
+    for i in range(len(pcs)):
+        rotated = pcs[i:] + pcs[:i]
+        close = []
+        base = 48 + rotated[0]
+        for pc in rotated:
+            p = base + (pc - rotated[0]) % 12
+            close.append(p)
+        voicings.append(tuple(close))
+        voicings.append(tuple(close + [close[0] + 12]))
+        voicings.append(tuple(reversed(close)))
+    for _ in range(4):
+        spread = [36 + pc + 12 * rng.randrange(4) for pc in pcs]
+        rng.shuffle(spread)
+        voicings.append(tuple(spread + [spread[0] + 24]))
+    return voicings
+
+
+def build_chord_lut(lut_path: str = DEFAULT_LUT_PATH, seed: int = 0):
+    """
+    music21로 4096개 마스크의 표를 만들어 저장 (music21 버전을 바꾸면 다시 실행)
+    음높이 클래스가 3개 미만이거나, 배치를 바꿨을 때 이름이 달라지는 마스크는 이름을 None으로 둠
+    """
+    import music21
+    rng = random.Random(seed)
+    entries = [[None, None, None]]
+    for mask in range(1, LUT_SIZE):
+        pcs = [pc for pc in range(12) if mask >> pc & 1]
+        root, quality = _music21_root_quality(mask)
+        name = None
+        if len(pcs) >= 3:
+            names = {str(_make_chord(voicing).commonName) for voicing in _sample_voicings(pcs, rng)}
+            if len(names) == 1:
+                name = names.pop()
+        entries.append([name, root, quality])
+
+    dyads = [[_dyad_name(pc, interval) for interval in range(-MAX_INTERVAL, MAX_INTERVAL + 1)]
+             for pc in range(12)]
+
+    os.makedirs(os.path.dirname(lut_path), exist_ok=True)
+    with open(lut_path, "w", encoding="utf-8") as f:
+        json.dump({'music21_version': music21.__version__, 'entries': entries, 'dyads': dyads},
+                  f, ensure_ascii=False)
+    named = sum(1 for entry in entries if entry[0] is not None)
+    print(f"코드 표 저장 완료: {lut_path} (이름 {named}/{LUT_SIZE}개)")
+
+
+if __name__ == "__main__":
+    # python chord_lut.py  -> data/chord_lut.json 다시 생성
+    build_chord_lut()
@@ -0,0 +1,151 @@
+# feature_cache.py
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache", "features")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+CACHE_SUFFIX = ".pkl"
+
+
+class FeatureCache:
+    """
+    MIDI 바이트 해시 + 추출기 버전을 키로 하는 디스크 특징 캐시.
+    용량(max_bytes)을 넘으면 가장 오래 사용하지 않은 항목부터 삭제합니다 (LRU).
+    LRU 인덱스와 통계는 잠금으로 보호하므로 한 인스턴스를 여러 스레드가 함께 써도 됩니다.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index = None  # 키 -> 파일 크기 (오래된 사용 순)
+        self._total_bytes = 0
+        # 인덱스/통계 잠금 (하위 클래스가 여러 호출을 묶을 수 있도록 재진입 가능)
+        self._lock = threading.RLock()
+
+    def make_key(self, midi_file, version: str) -> str:
+        """MIDI 파일(경로 또는 bytes) 내용과 추출기 버전으로 캐시 키 생성"""
+        digest = hashlib.sha256()
+        if isinstance(midi_file, (bytes, bytearray)):
+            digest.update(midi_file)
+        else:
+            with open(midi_file, "rb") as f:
+                digest.update(f.read())
+        digest.update(version.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str, count: bool = True):
+        """
+        캐시된 특징 반환 (없으면 None)
+        count=False면 이번 조회를 적중/미스로 세지 않음 (결과를 쓸 수 있는지 확인한 뒤 record()로 셈)
+        """
+        with self._lock:
+            index = self._load_index()
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    features = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                # 다른 프로세스가 지운 파일이면 인덱스에서도 뺌
+                self._total_bytes -= index.pop(key, 0)
+                if count:
+                    self.misses += 1
+                return None
+
+            # 사용 시각 갱신 (다른 프로세스와도 LRU 순서를 공유하도록 mtime 사용)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            if key not in index:
+                index[key] = os.path.getsize(path)
+                self._total_bytes += index[key]
+            index.move_to_end(key)
+            if count:
+                self.hits += 1
+            return features
+
+    def record(self, hit: bool):
+        """조회 한 번을 적중 또는 미스로 셈 (get(count=False)로 조회한 경우, 워커 프로세스의 조회 결과 합산)"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key: str, features: Dict):
+        """특징 저장 후 용량을 넘으면 오래된 항목 삭제"""
+        with self._lock:
+            index = self._load_index()
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(features, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"특징 캐시 저장 중 오류 발생: {str(e)}")
+                return
+
+            self._total_bytes -= index.pop(key, 0)
+            index[key] = os.path.getsize(path)
+            self._total_bytes += index[key]
+            self._evict()
+
+    def clear(self):
+        """캐시 파일 전체 삭제"""
+        with self._lock:
+            for key in list(self._load_index()):
+                self._remove(key)
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        """적중/미스 횟수와 현재 캐시 크기"""
+        with self._lock:
+            index = self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(index),
+                'size_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def _load_index(self) -> OrderedDict:
+        """처음 사용할 때 한 번만 디렉토리를 읽어 mtime 순 인덱스 구성"""
+        if self._index is not None:
+            return self._index
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(CACHE_SUFFIX)], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def _evict(self):
+        index = self._load_index()
+        while self._total_bytes > self.max_bytes and len(index) > 1:
+            self._remove(next(iter(index)))
+
+    def _remove(self, key: str):
+        self._total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
@@ -1,30 +1,36 @@
 import glob
 from midi_rag import MIDIRAGSystem
+from midi_sources import is_archive
 # python generate.py
 
 
-# MIDI RAG 시스템 초기화
-rag_system = MIDIRAGSystem()
+def main():
+    # MIDI RAG 시스템 초기화
+    rag_system = MIDIRAGSystem()
 
-# 모든 트레이닝 파일 로드
-training_files = glob.glob('data/training/*.mid')
-print(f"학습에 사용할 MIDI 파일 수: {len(training_files)}")
+    # 모든 트레이닝 파일 로드
+    training_files = glob.glob('data/training/*.mid')
+    # zip/tar 압축 파일은 풀지 않고 멤버를 스트리밍하여 학습
+    training_archives = [path for path in glob.glob('data/training/*') if is_archive(path)]
+    print(f"학습에 사용할 MIDI 파일 수: {len(training_files)} (압축 파일 {len(training_archives)}개 별도)")
 
-# 시스템 학습
-rag_system.train(training_files)
+    # 시스템 학습
+    rag_system.train(training_files + training_archives)
 
-# 입력 MIDI 선택
-input_midi = 'data/training/corazon_Jacob_Collier.mid'  # 테스트에 사용한 동일한 파일
+    # 입력 MIDI 선택
+    input_midi = 'data/training/corazon_Jacob_Collier.mid'  # 테스트에 사용한 동일한 파일
 
-# MIDI 생성 (JSON 형식)
-json_output = rag_system.generate(input_midi, output_format='json')
-rag_system.save_midi(json_output, 'data/output/output.json')
+    # MIDI 생성 (한 번 생성한 결과를 JSON/MIDI로 각각 저장)
+    result = rag_system.generate(input_midi)
+    rag_system.save_midi(result, 'data/output/output.json')
+    rag_system.save_midi(result, 'data/output/output.mid')
+    print("단계별 소요 시간: " + ", ".join(f"{step} {seconds:.2f}초" for step, seconds in result.timings.items()))
 
-# MIDI 생성 (MIDI 형식)
-midi_output = rag_system.generate(input_midi, output_format='midi')
-rag_system.save_midi(midi_output, 'data/output/output.mid')
+    print("MIDI 생성 완료!")
 
-print("MIDI 생성 완료!")
+# 프로세스 풀로 특징을 추출하므로 워커가 이 파일을 다시 import해도 실행되지 않도록 함
+if __name__ == "__main__":
+    main()
 
 # 잘되는거 맞아?
 # 지금 까지 진행상황 뭐 어느정도 나오는거 같은데 미디파일 생성이 안돼 
\ No newline at end of file
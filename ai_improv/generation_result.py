@@ -0,0 +1,234 @@
+# generation_result.py
+import io
+import json
+import time
+import asyncio
+from typing import Callable, Dict, List
+from note_stream import NoteStreamParser, note_messages
+
+# GenerationStream이 반환하는 이벤트 종류
+STREAM_OUTPUTS = ('notes', 'midi')
+_END = object()
+
+
+def render_midi(data: Dict) -> bytes:
+    """생성된 음표 데이터(JSON 딕셔너리)를 MIDI 파일 바이트로 변환 (120 BPM, 480 ticks/beat)"""
+    from mido import MidiFile, MidiTrack, Message, MetaMessage
+
+    mid = MidiFile()
+
+    # 템포 트랙 추가
+    tempo_track = MidiTrack()
+    mid.tracks.append(tempo_track)
+
+    # 템포 설정 (120 BPM)
+    tempo_track.append(MetaMessage('set_tempo', tempo=500000, time=0))
+
+    # 타임 시그니처 설정
+    time_signatures = data.get('time_signatures', ['4/4'])
+    if time_signatures and len(time_signatures) > 0:
+        time_sig = time_signatures[0].split('/')
+        if len(time_sig) == 2:
+            numerator, denominator = int(time_sig[0]), int(time_sig[1])
+            tempo_track.append(MetaMessage('time_signature',
+                                           numerator=numerator,
+                                           denominator=denominator,
+                                           clocks_per_click=24,
+                                           notated_32nd_notes_per_beat=8,
+                                           time=0))
+
+    # 키 시그니처 설정 (있는 경우)
+    key_signatures = data.get('key_signatures', [])
+    if key_signatures and len(key_signatures) > 0:
+        tempo_track.append(MetaMessage('key_signature', key=key_signatures[0], time=0))
+
+    def seconds_to_ticks(seconds):
+        """초 단위 시간을 MIDI 틱으로 변환"""
+        # 기본값: 480 ticks per quarter note, 120 BPM (500000 microseconds per beat)
+        return int(seconds * 480 * 120 / 60)
+
+    # 트랙 추가
+    for track_data in data.get('tracks', []):
+        track = MidiTrack()
+        mid.tracks.append(track)
+
+        # 악기 설정
+        instrument = track_data.get('instrument', 0)
+        track.append(Message('program_change', program=instrument, time=0))
+
+        # 노트 추가 (원본 데이터는 바꾸지 않고 시간 순으로 정렬)
+        notes = sorted(track_data.get('notes', []), key=lambda x: x.get('time', 0))
+
+        last_time = 0
+        for note in notes:
+            pitch = note.get('pitch', 60)  # 기본값: 중간 C
+            time_ticks = seconds_to_ticks(note.get('time', 0))
+            duration_ticks = seconds_to_ticks(note.get('duration', 1))
+            velocity = note.get('velocity', 64)
+
+            # 노트 온 (이전 이벤트로부터의 상대적 시간), 노트 오프 (duration_ticks 후)
+            track.append(Message('note_on', note=pitch, velocity=velocity, time=max(0, time_ticks - last_time)))
+            track.append(Message('note_off', note=pitch, velocity=0, time=duration_ticks))
+
+            # 마지막 이벤트 시간 업데이트
+            last_time = time_ticks + duration_ticks
+
+    # 메모리에 MIDI 파일 생성
+    buffer = io.BytesIO()
+    mid.save(file=buffer)
+    return buffer.getvalue()
+
+
+class GenerationResult:
+    """
+    generate() 한 번의 결과: LLM 응답, 해석한 음표 데이터, 검색된 유사 문서, 단계별 소요 시간.
+    JSON 문자열(json)과 MIDI 바이트(midi)는 처음 요청할 때 같은 음표 데이터로 만들고 재사용합니다.
+    """
+
+    def __init__(self, response: str, input_features: Dict, neighbors: List, timings: Dict,
+                 source: str = None, index: int = None, error: str = None):
+        self.response = response  # LLM 응답 (정제된 JSON 문자열, 정제에 실패하면 원본)
+        self.input_features = input_features
+        self.neighbors = neighbors  # 검색된 유사 Document 목록 (순위 순)
+        self.timings = timings  # 단계 -> 초 ('features', 'search', 'llm', 'total')
+        self.source = source  # 입력 MIDI 이름 (generate_many)
+        self.index = index  # 입력 순서 (generate_many)
+        self.error = error  # 특징 추출/LLM 호출 실패 메시지 (generate_many)
+        try:
+            self.data = json.loads(response)
+        except (TypeError, ValueError):
+            self.data = None  # 음표 데이터로 해석할 수 없는 응답
+        self._json = None
+        self._midi = None
+
+    @property
+    def ok(self) -> bool:
+        """오류 없이 응답을 음표 데이터로 해석했는지 여부"""
+        return self.error is None and isinstance(self.data, dict)
+
+    @property
+    def json(self) -> str:
+        """음표 데이터 JSON 문자열 (해석하지 못한 응답은 원문 그대로)"""
+        if self._json is None:
+            self._json = json.dumps(self.data, ensure_ascii=False, indent=2) if self.ok else str(self.response or '')
+        return self._json
+
+    @property
+    def midi(self) -> bytes:
+        """음표 데이터를 변환한 MIDI 파일 바이트"""
+        if self._midi is None:
+            if not self.ok:
+                raise ValueError(self.error or "생성 결과가 음표 데이터(JSON)가 아니어서 MIDI로 변환할 수 없습니다.")
+            self._midi = render_midi(self.data)
+        return self._midi
+
+    def neighbor_files(self) -> List[str]:
+        return [doc.metadata.get('filename', 'Unknown') for doc in self.neighbors]
+
+
+class GenerationStream:
+    """
+    generate_stream() 결과: 반복하면 LLM 응답을 받는 대로 완성된 음표(또는 MIDI 메시지)를 바로 반환합니다.
+    for/async for 중 하나로 한 번만 읽을 수 있고, 끝까지 읽으면 result에 generate()와 같은 GenerationResult가 생깁니다.
+    timings에는 LLM 요청부터 첫 응답 조각(first_token)과 첫 음표(first_note)까지의 시간이 추가됩니다.
+    """
+
+    def __init__(self, chunks, finish: Callable, input_features: Dict, neighbors: List, timings: Dict,
+                 start: float, output: str = 'notes', source: str = None):
+        """
+        Args:
+            chunks: LLM 응답 텍스트 조각 iterator (LLMAPI.stream_response / astream_response)
+            finish: 모은 응답을 정제하는 함수 (LLMAPI.finish_response)
+            start: 생성 시작 시각 (time.perf_counter, total 계산용)
+            output: 'notes'면 음표 딕셔너리 (note_stream.validate_note),
+                    'midi'면 새 트랙의 program_change와 음표마다 note_on/note_off mido 메시지 (time은 절대 초)
+        """
+        if output not in STREAM_OUTPUTS:
+            raise ValueError(f"지원하지 않는 스트리밍 출력: {output}")
+        self.chunks = chunks
+        self.finish = finish
+        self.input_features = input_features
+        self.neighbors = neighbors
+        self.timings = timings
+        self.start = start
+        self.output = output
+        self.source = source
+        self.parser = NoteStreamParser()
+        self.result = None  # 끝까지 읽으면 GenerationResult
+        self._programs = set()
+        self._events_iter = None  # async for로 읽는 중인 이벤트 iterator (aclose에서 닫음)
+
+    def __iter__(self):
+        step = time.perf_counter()
+        try:
+            for chunk in self.chunks:
+                yield from self._events(chunk, step)
+        finally:
+            getattr(self.chunks, 'close', lambda: None)()  # 중간에 멈추면 LLM 요청도 닫음
+        self._complete(step)
+
+    def __aiter__(self):
+        if self._events_iter is None:
+            self._events_iter = self._aiterate()
+        return self._events_iter
+
+    async def _aiterate(self):
+        # 응답 조각은 별도 태스크가 읽어 큐로 넘김: 중간에 멈추면 태스크를 취소해
+        # LLM 클라이언트 안쪽의 스트림까지 닫힘 (바깥 async generator의 aclose만으로는 닫히지 않음)
+        step = time.perf_counter()
+        chunks = asyncio.Queue()
+
+        async def pump():
+            try:
+                async for chunk in self.chunks:
+                    chunks.put_nowait(chunk)
+            except Exception as e:
+                chunks.put_nowait(e)
+            chunks.put_nowait(_END)
+
+        reader = asyncio.ensure_future(pump())
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is _END:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                for event in self._events(chunk, step):
+                    yield event
+        finally:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+        self._complete(step)
+
+    def close(self):
+        """for로 읽다가 멈출 때 남은 LLM 응답을 받지 않고 요청을 닫음"""
+        getattr(self.chunks, 'close', lambda: None)()
+
+    async def aclose(self):
+        """async for로 읽다가 멈출 때 남은 LLM 응답을 받지 않고 요청을 닫음 (break만으로는 바로 닫히지 않음)"""
+        if self._events_iter is not None:
+            await self._events_iter.aclose()
+
+    def _events(self, chunk: str, step: float):
+        self.timings.setdefault('first_token', time.perf_counter() - step)
+        for note in self.parser.feed(chunk):
+            self.timings.setdefault('first_note', time.perf_counter() - step)
+            if self.output == 'notes':
+                yield note
+                continue
+            if note['track'] not in self._programs:
+                from mido import Message
+                self._programs.add(note['track'])
+                yield Message('program_change', channel=note['track'] % 16, program=note['instrument'] % 128,
+                              time=note['time'])
+            yield from note_messages(note)
+
+    def _complete(self, step: float):
+        self.timings['llm'] = time.perf_counter() - step
+        self.timings['total'] = time.perf_counter() - self.start
+        self.result = GenerationResult(self.finish(self.parser.text), self.input_features, self.neighbors,
+                                       self.timings, source=self.source)
+        first_note = self.timings.get('first_note')
+        print(f"스트리밍 생성: 음표 {self.parser.notes}개 (해석 실패 {self.parser.rejected}개), "
+              f"첫 음표 {'-' if first_note is None else f'{first_note:.2f}초'}, 전체 {self.timings['llm']:.2f}초")
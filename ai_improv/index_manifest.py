@@ -0,0 +1,87 @@
+# index_manifest.py
+import os
+import json
+import hashlib
+from typing import Dict, Iterator, List
+from midi_sources import MIDISource, source_name, source_payload
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+
+def content_hash(source: MIDISource) -> str:
+    """MIDI 소스 내용의 sha256 (경로는 파일을 읽고, 버퍼는 bytes를 그대로 사용)"""
+    payload = source_payload(source)
+    digest = hashlib.sha256()
+    if isinstance(payload, (bytes, bytearray)):
+        digest.update(payload)
+    else:
+        with open(payload, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    """
+    저장된 벡터 저장소 옆에 두는 코퍼스 목록.
+    파일 이름 -> {내용 해시, 문서 ID 목록}을 기록해 다음 학습 때 바뀐 파일만 다시 색인합니다.
+    (구간 색인에서는 파일 하나가 여러 문서가 됨)
+    index_key(임베딩 종류, 추출기 버전 등)가 달라지면 기존 색인을 재사용하지 않습니다.
+    """
+
+    def __init__(self, index_key: str, files: Dict = None):
+        self.index_key = index_key
+        self.files = files or {}  # 이름 -> {'hash': ..., 'doc_ids': [...]}
+
+    @staticmethod
+    def path(index_dir: str) -> str:
+        return os.path.join(index_dir, MANIFEST_FILENAME)
+
+    @classmethod
+    def load(cls, index_dir: str, index_key: str):
+        """저장된 목록 로드 (없거나 index_key가 다르면 None)"""
+        try:
+            with open(cls.path(index_dir), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != MANIFEST_VERSION or data.get('index_key') != index_key:
+            print(f"색인 목록이 현재 설정과 달라 전체를 다시 색인합니다: {cls.path(index_dir)}")
+            return None
+        return cls(index_key, data.get('files'))
+
+    def save(self, index_dir: str):
+        """임시 파일에 쓴 뒤 교체 (중간에 실패해도 이전 목록 유지)"""
+        os.makedirs(index_dir, exist_ok=True)
+        path = self.path(index_dir)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'version': MANIFEST_VERSION, 'index_key': self.index_key, 'files': self.files},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+    def changed_sources(self, sources, seen: Dict) -> Iterator[MIDISource]:
+        """
+        새 파일이거나 내용이 바뀐 소스만 통과시키는 스트림
+
+        Args:
+            sources: MIDI 소스 iterable
+            seen: 이번 입력에서 본 이름 -> 내용 해시 (호출하는 쪽에서 채워진 결과 사용)
+        """
+        for source in sources:
+            name = source_name(source)
+            try:
+                digest = content_hash(source)
+            except OSError as e:
+                print(f"Error reading {name}: {str(e)}")
+                continue
+            seen[name] = digest
+            entry = self.files.get(name)
+            if entry is None or entry['hash'] != digest:
+                yield source
+
+    def stale_doc_ids(self, seen: Dict) -> List[str]:
+        """삭제되었거나 내용이 바뀐 파일의 기존 문서 ID"""
+        return [doc_id for name, entry in self.files.items()
+                if seen.get(name) != entry['hash'] for doc_id in entry['doc_ids']]
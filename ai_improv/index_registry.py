@@ -0,0 +1,167 @@
+# index_registry.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+# 동시에 메모리에 둘 저장소 크기 합의 기본 상한 (바이트)
+DEFAULT_MEMORY_BUDGET = 2 * 1024 ** 3
+# 저장소 디렉토리로 인식하는 파일 (FAISS / 이전 LangChain 형식 / Chroma)
+_STORE_MARKERS = ("index.faiss", "index.pkl", "chroma.sqlite3")
+
+
+class LoadedCorpus:
+    """레지스트리가 로드해 둔 코퍼스 하나 (벡터 저장소, 모티프 색인, 필터 보조 색인)"""
+
+    def __init__(self, name: str, path: str, vectorstore, motif_index, memory_bytes: int):
+        self.name = name
+        self.path = path
+        self.vectorstore = vectorstore
+        self.motif_index = motif_index
+        self.attribute_index = None  # 첫 필터 검색 때 생성
+        self.memory_bytes = memory_bytes
+
+
+class IndexRegistry:
+    """
+    코퍼스 이름 -> 저장된 벡터 저장소 디렉토리 목록.
+    저장소는 처음 사용할 때 로드하고, 로드된 저장소 크기 합이 memory_budget을 넘으면
+    가장 오래 사용하지 않은 저장소부터 내립니다 (LRU).
+    크기는 디스크의 색인 파일 크기로 추정합니다 (lazy 로드는 메타데이터를 SQLite에서 필요할 때만 읽으므로 제외).
+    """
+
+    def __init__(self, vectorizer_factory: Callable, memory_budget: int = DEFAULT_MEMORY_BUDGET, lazy: bool = True):
+        """
+        Args:
+            vectorizer_factory: 코퍼스마다 저장소를 로드할 MIDIVectorizer를 만드는 함수
+            memory_budget: 로드된 저장소 크기 합의 상한 (바이트)
+            lazy: 색인을 메모리 매핑하고 메타데이터는 필요할 때만 읽음 (MIDIVectorizer.load_vectorstore 참고)
+        """
+        self.vectorizer_factory = vectorizer_factory
+        self.memory_budget = memory_budget
+        self.lazy = lazy
+        self.paths = {}
+        self._loaded = OrderedDict()  # 이름 -> LoadedCorpus (마지막 사용 순서)
+        self._lock = threading.Lock()
+        self._load_locks = {}  # 이름 -> 로드 잠금 (같은 코퍼스를 동시에 두 번 로드하지 않도록)
+        self.metrics = {'hits': 0, 'loads': 0, 'load_seconds': 0.0, 'load_failures': 0,
+                        'evictions': 0, 'evicted_bytes': 0}
+
+    def register(self, name: str, path: str):
+        """코퍼스 등록 (이미 로드된 같은 이름은 내리고 다음 사용 때 새 경로에서 로드)"""
+        with self._lock:
+            self.paths[name] = path
+            self._loaded.pop(name, None)
+
+    def register_directory(self, root_dir: str) -> List[str]:
+        """root_dir 아래 저장소 디렉토리마다 디렉토리 이름으로 등록하고 등록한 이름 목록 반환"""
+        names = []
+        for entry in sorted(os.listdir(root_dir)):
+            path = os.path.join(root_dir, entry)
+            if os.path.isdir(path) and any(os.path.exists(os.path.join(path, marker)) for marker in _STORE_MARKERS):
+                self.register(entry, path)
+                names.append(entry)
+        return names
+
+    def names(self) -> List[str]:
+        return sorted(self.paths)
+
+    def get(self, name: str) -> LoadedCorpus:
+        """
+        코퍼스 저장소 반환 (로드되어 있지 않으면 로드 후 예산을 넘는 만큼 LRU 저장소를 내림)
+        로드는 코퍼스별 잠금만 잡고 진행하므로 느린 로드 중에도 다른 코퍼스 조회는 기다리지 않고,
+        같은 코퍼스를 동시에 요청하면 한 번만 로드합니다.
+        """
+        with self._lock:
+            corpus = self._hit(name)
+            if corpus is not None:
+                return corpus
+            if name not in self.paths:
+                raise ValueError(f"Unknown corpus: {name} (registered: {self.names()})")
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                # 기다리는 동안 다른 스레드가 로드했으면 그 저장소를 사용
+                corpus = self._hit(name)
+                if corpus is not None:
+                    return corpus
+                if name not in self.paths:
+                    raise ValueError(f"Unknown corpus: {name} (registered: {self.names()})")
+                path = self.paths[name]
+
+            start = time.perf_counter()
+            vectorizer = self.vectorizer_factory()
+            vectorstore = vectorizer.load_vectorstore(path, lazy=self.lazy)
+            elapsed = time.perf_counter() - start
+            if vectorstore is None:
+                with self._lock:
+                    self.metrics['load_failures'] += 1
+                raise ValueError(f"코퍼스 '{name}' 저장소를 로드하지 못했습니다: {path}")
+            corpus = LoadedCorpus(name, path, vectorstore, vectorizer.motif_index, self._estimate_bytes(path))
+            print(f"코퍼스 '{name}' 로드: {elapsed:.3f}초, 약 {corpus.memory_bytes / 1024 / 1024:.1f}MB")
+
+            with self._lock:
+                self.metrics['loads'] += 1
+                self.metrics['load_seconds'] += elapsed
+                # 로드 중에 다른 경로로 다시 등록되었으면 이번 결과는 보관하지 않음 (다음 사용 때 새 경로에서 로드)
+                if self.paths.get(name) == path:
+                    self._loaded[name] = corpus
+                    self._evict_over_budget(keep=name)
+            return corpus
+
+    def _hit(self, name: str):
+        """로드된 코퍼스면 최근 사용으로 표시하고 반환 (self._lock을 잡은 상태에서 호출)"""
+        corpus = self._loaded.get(name)
+        if corpus is not None:
+            self._loaded.move_to_end(name)
+            self.metrics['hits'] += 1
+        return corpus
+
+    def _estimate_bytes(self, path: str) -> int:
+        files = ["index.faiss", "motif.npz", "duplicates.npz"]
+        if not self.lazy:
+            files += ["metadata.sqlite", "index.pkl"]
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in files
+                   if os.path.exists(os.path.join(path, name)))
+        # Chroma HNSW 세그먼트 (하위 디렉토리, 첫 검색 때 메모리로 읽힘)
+        for entry in os.scandir(path):
+            if entry.is_dir():
+                size += sum(child.stat().st_size for child in os.scandir(entry.path) if child.is_file())
+        return size
+
+    def _evict_over_budget(self, keep: str):
+        while self.resident_bytes() > self.memory_budget and len(self._loaded) > 1:
+            name = next(iter(self._loaded))
+            if name == keep:
+                break
+            self._evict(name)
+        if self.resident_bytes() > self.memory_budget:
+            print(f"코퍼스 '{keep}' 하나만으로 메모리 예산({self.memory_budget / 1024 / 1024:.1f}MB)을 넘습니다.")
+
+    def _evict(self, name: str):
+        # 진행 중인 검색이 참조를 들고 있을 수 있으므로 연결을 직접 닫지 않고 참조만 놓음 (GC가 정리)
+        corpus = self._loaded.pop(name)
+        self.metrics['evictions'] += 1
+        self.metrics['evicted_bytes'] += corpus.memory_bytes
+        print(f"코퍼스 '{name}' 내림 (약 {corpus.memory_bytes / 1024 / 1024:.1f}MB)")
+
+    def evict(self, name: str):
+        """코퍼스를 메모리에서 내림 (등록은 유지)"""
+        with self._lock:
+            if name in self._loaded:
+                self._evict(name)
+
+    def resident_bytes(self) -> int:
+        return sum(corpus.memory_bytes for corpus in self._loaded.values())
+
+    def stats(self) -> Dict:
+        """로드/적중/내림 통계와 현재 로드된 코퍼스 (오래 사용하지 않은 순)"""
+        with self._lock:
+            stats = dict(self.metrics)
+            stats['loaded'] = list(self._loaded)
+            stats['resident_bytes'] = self.resident_bytes()
+            stats['memory_budget'] = self.memory_budget
+            stats['avg_load_seconds'] = stats['load_seconds'] / stats['loads'] if stats['loads'] else 0.0
+            return stats
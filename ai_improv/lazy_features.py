@@ -0,0 +1,48 @@
+# lazy_features.py
+from collections.abc import Mapping
+from typing import Callable, Dict, List
+
+
+class LazyFeatures(Mapping):
+    """
+    요청한 특징 그룹만 담는 지연 계산 특징 객체.
+    각 그룹은 처음 접근할 때 compute(name)으로 계산한 뒤 저장해 두고 다시 계산하지 않습니다.
+    dict와 같은 방식으로 읽을 수 있고, 직렬화(pickle/to_dict/str)하면 기존 특징 딕셔너리와 같은 모양이 됩니다.
+    """
+
+    def __init__(self, groups: List[str], compute: Callable[[str], object], initial: Dict = None):
+        self._groups = list(groups)
+        self._compute = compute
+        self._values = {name: initial[name] for name in self._groups if initial and name in initial}
+
+    def __getitem__(self, name):
+        if name not in self._groups:
+            raise KeyError(name)
+        if name not in self._values:
+            self._values[name] = self._compute(name)
+        return self._values[name]
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __contains__(self, name):
+        return name in self._groups
+
+    @property
+    def computed(self) -> List[str]:
+        """지금까지 계산(또는 캐시에서 로드)된 그룹 이름"""
+        return [name for name in self._groups if name in self._values]
+
+    def to_dict(self) -> Dict:
+        """모든 요청 그룹을 계산하여 일반 딕셔너리로 반환"""
+        return {name: self[name] for name in self._groups}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __reduce__(self):
+        # pickle(프로세스 풀 결과, 디스크 캐시)에는 계산을 마친 일반 딕셔너리로 저장
+        return (dict, (self.to_dict(),))
@@ -5,10 +5,39 @@ import re
 import ast
 import math
 import random
+import hashlib
+import httpx
+from response_cache import ResponseCache
+
+# agenerate_response가 한 이벤트 루프에서 동시에 열 수 있는 HTTP 연결 수 (httpx 기본값은 100)
+DEFAULT_MAX_CONNECTIONS = 1000
+# 응답 후 재사용하려고 열어 두는 연결 수
+# (httpcore는 요청이 오갈 때마다 유휴 연결 수의 제곱만큼 연결을 검사하므로 수백 개로 늘리면 CPU가 병목이 됨)
+DEFAULT_KEEPALIVE_CONNECTIONS = 20
+# 응답 캐시 키에 들어가는 OllamaLLM 생성 옵션 (바꾸면 캐시된 응답을 쓰지 않음)
+SAMPLING_PARAMS = ('temperature', 'top_k', 'top_p', 'seed', 'num_predict', 'num_ctx', 'repeat_penalty',
+                   'repeat_last_n', 'mirostat', 'mirostat_eta', 'mirostat_tau', 'tfs_z', 'stop', 'format', 'reasoning')
 
 class LLMAPI:
-    def __init__(self):
-        self.llm = OllamaLLM(model="llama3.2")
+    def __init__(self, model: str = "llama3.2", base_url: str = None,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS, cache: ResponseCache = None, use_cache: bool = False):
+        """
+        Args:
+            model: Ollama 모델 이름
+            base_url: Ollama 서버 주소 (생략하면 기본 주소)
+            max_connections: 비동기 호출의 동시 연결 상한 (넘는 요청은 연결이 빌 때까지 대기)
+            cache: 정제한 응답을 저장할 캐시 (넘기면 use_cache와 관계없이 사용)
+            use_cache: True면 기본 응답 캐시(data/cache/responses, TTL 7일) 사용
+                       (기본값 False: 같은 입력이어도 매번 새로 생성)
+        """
+        self.model = model
+        self.cache = cache if cache is not None else (ResponseCache() if use_cache else None)
+        options = dict(model=model, async_client_kwargs={
+            'limits': httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=min(max_connections, DEFAULT_KEEPALIVE_CONNECTIONS))})
+        if base_url:
+            options['base_url'] = base_url
+        self.llm = OllamaLLM(**options)
         self.prompt = PromptTemplate.from_template("""
         다음 MIDI 파일의 특징을 반영한 새로운 MIDI를 생성하세요:
         
@@ -45,6 +74,8 @@ class LLMAPI:
         반드시 위 JSON 형식으로만 응답하고, 다른 설명이나 코드는 포함하지 마세요.
         시간 값은 절대 수식으로 표현하지 말고 계산된 실제 숫자로만 작성하세요. (예: "time": 2.4 (O), "time": "0.6 + 1.8" (X))
         """)
+        # 템플릿을 고치면 캐시 키가 바뀌도록 템플릿 내용의 해시를 버전으로 사용
+        self.prompt_version = hashlib.sha256(self.prompt.template.encode("utf-8")).hexdigest()[:16]
     
     def clean_llm_response(self, response):
         """LLM 응답에서 JSON 부분만 추출하고 수식을 계산합니다."""
@@ -211,15 +242,98 @@ class LLMAPI:
             print(f"솔로 확장 중 오류 발생: {str(e)}")
             return json_response
     
-    def generate_response(self, input_features, similar_features):
-        """LLM을 사용하여 응답 생성하고 정제된 JSON 반환"""
+    def generate_response(self, input_features, similar_features, doc_ids=None, fresh: bool = False):
+        """
+        LLM을 사용하여 응답 생성하고 정제된 JSON 반환
+        
+        Args:
+            input_features: 프롬프트에 넣을 입력 특징 문자열
+            similar_features: 프롬프트에 넣을 유사 문서 내용
+            doc_ids: 검색된 문서의 안정적인 ID 목록 (응답 캐시 키, 저장소를 다시 만들어도 같아야 함.
+                     생략하면 similar_features 내용으로 구분)
+            fresh: True면 캐시된 응답을 쓰지 않고 새로 생성 (새 응답으로 캐시를 덮어씀)
+        """
+        key, cached = self._cache_lookup(input_features, similar_features, doc_ids, fresh)
+        if cached is not None:
+            return cached
         prompt_value = self.prompt.format(
             input_features=input_features,
             similar_features=similar_features
         )
         
         response = self.llm.invoke(prompt_value)
+        return self._cache_store(key, self.finish_response(response))
+    
+    async def agenerate_response(self, input_features, similar_features, doc_ids=None, fresh: bool = False):
+        """generate_response의 코루틴 버전 (모델 호출을 기다리는 동안 이벤트 루프를 막지 않고, 취소 가능)"""
+        key, cached = self._cache_lookup(input_features, similar_features, doc_ids, fresh)
+        if cached is not None:
+            return cached
+        prompt_value = self.prompt.format(
+            input_features=input_features,
+            similar_features=similar_features
+        )
+        
+        response = await self.llm.ainvoke(prompt_value)
+        return self._cache_store(key, self.finish_response(response))
+    
+    def stream_response(self, input_features, similar_features, doc_ids=None, fresh: bool = False):
+        """
+        LLM 응답을 생성되는 대로 텍스트 조각으로 반환 (인자는 generate_response와 같음)
         
+        Returns:
+            (텍스트 조각 iterator, 모은 응답을 정제해 캐시에 저장하는 함수)
+            캐시에 있으면 저장된 응답 전체를 한 조각으로 반환하고 정제 함수는 그대로 돌려줌
+        """
+        key, cached = self._cache_lookup(input_features, similar_features, doc_ids, fresh)
+        if cached is not None:
+            return iter([cached]), lambda response: response
+        prompt_value = self.prompt.format(
+            input_features=input_features,
+            similar_features=similar_features
+        )
+        return self.llm.stream(prompt_value), lambda response: self._cache_store(key, self.finish_response(response))
+    
+    def astream_response(self, input_features, similar_features, doc_ids=None, fresh: bool = False):
+        """stream_response의 비동기 버전 (텍스트 조각은 async for로 읽음)"""
+        key, cached = self._cache_lookup(input_features, similar_features, doc_ids, fresh)
+        if cached is not None:
+            async def replay():
+                yield cached
+            return replay(), lambda response: response
+        prompt_value = self.prompt.format(
+            input_features=input_features,
+            similar_features=similar_features
+        )
+        return self.llm.astream(prompt_value), lambda response: self._cache_store(key, self.finish_response(response))
+    
+    def _cache_lookup(self, input_features, similar_features, doc_ids, fresh: bool):
+        """응답 캐시 키와 캐시된 응답 반환 (캐시를 쓰지 않으면 키가 None, fresh거나 없으면 응답이 None)"""
+        if self.cache is None:
+            return None, None
+        if doc_ids is None:
+            doc_ids = [hashlib.sha256(str(similar_features).encode("utf-8")).hexdigest()]
+        params = {name: getattr(self.llm, name, None) for name in SAMPLING_PARAMS}
+        key = self.cache.response_key(str(input_features), doc_ids, self.prompt_version, self.model,
+                                      {name: value for name, value in params.items() if value is not None})
+        return key, None if fresh else self.cache.get(key)
+    
+    def _cache_store(self, key, response):
+        # 음표 데이터로 정제된 응답만 저장 (정제에 실패한 원본 응답은 다음 요청 때 다시 생성)
+        if key is not None:
+            try:
+                if isinstance(json.loads(response), dict):
+                    self.cache.put(key, response)
+            except (TypeError, ValueError):
+                pass
+        return response
+    
+    def cache_stats(self):
+        """응답 캐시 적중/미스/만료 통계 (캐시를 쓰지 않으면 빈 딕셔너리)"""
+        return self.cache.stats() if self.cache is not None else {}
+    
+    def finish_response(self, response):
+        """LLM 응답을 정제하고 솔로라인을 확장한 JSON 반환 (실패하면 원본 응답)"""
         try:
             # 응답에서 JSON 추출 및 정제
             cleaned_json = self.clean_llm_response(response)
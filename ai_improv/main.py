@@ -1,21 +1,22 @@
 from midi_rag import MIDIRAGSystem
 import glob
+from midi_sources import is_archive
 
 def main():
     # RAG 시스템 초기화
     rag_system = MIDIRAGSystem()
     
-    # 학습용 MIDI 파일들 로드
+    # 학습용 MIDI 파일들 로드 (zip/tar 압축 파일은 풀지 않고 멤버를 스트리밍)
     training_midis = glob.glob("data/training/*.mid")
-    rag_system.train(training_midis)
+    training_archives = [path for path in glob.glob("data/training/*") if is_archive(path)]
+    rag_system.train(training_midis + training_archives)
     
     # 새로운 MIDI 생성
     input_midi = "data/input/example.mid"
-    output_midi = rag_system.generate(input_midi)
+    result = rag_system.generate(input_midi)
     
     # MIDI 파일 저장
-    with open("data/output/generated.mid", "wb") as f:
-        f.write(output_midi)
+    rag_system.save_midi(result, "data/output/generated.mid")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,189 @@
+# metadata_filter.py
+import sqlite3
+from typing import Dict, List, Tuple
+import numpy as np
+import faiss
+
+# 필터 조건
+#  범위 조건 (최솟값, 최댓값), None은 열린 구간: 'main_tempo', 'pitch_low', 'pitch_high'
+#  일치 조건 (값 하나 또는 목록 중 하나라도 포함): 'time_signature', 'key_signature', 'instrument'
+RANGE_FIELDS = ('main_tempo', 'pitch_low', 'pitch_high')
+TAG_FIELDS = {
+    'time_signature': 'time_signatures',
+    'key_signature': 'key_signatures',
+    'instrument': 'instruments',
+}
+
+# 전수 검색(flat, 양자화 flat, pq)/HNSW 색인에서 후보가 전체의 이 비율 이하면 후보 벡터만 직접 비교 (넘으면 색인 검색 + 선택자)
+GATHER_RATIO = 0.1
+# 후보가 많을 때 (k / 후보 비율) x OVERFETCH개를 검색한 뒤 후보만 남김
+OVERFETCH = 4
+
+ATTRIBUTE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attributes (
+    position INTEGER PRIMARY KEY,
+    main_tempo REAL,
+    pitch_low INTEGER,
+    pitch_high INTEGER
+);
+CREATE TABLE IF NOT EXISTS tags (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tags_value ON tags (field, value, position);
+"""
+
+
+def feature_attributes(features: Dict) -> Tuple[tuple, List[tuple]]:
+    """특징 딕셔너리 -> ((템포, 최저음, 최고음), [(필드, 값), ...])"""
+    tempo = (features.get('tempo') or {}).get('main_tempo')
+    pitch_range = (features.get('melody') or {}).get('pitch_range') or (None, None)
+    tags = []
+    for field, key in TAG_FIELDS.items():
+        for value in dict.fromkeys(features.get(key) or []):
+            tags.append((field, str(value)))
+    return (tempo, pitch_range[0], pitch_range[1]), tags
+
+
+def write_attributes(conn: sqlite3.Connection, docstore, index_to_docstore_id: Dict):
+    """색인 위치별 필터 속성을 SQLite에 저장"""
+    conn.executescript(ATTRIBUTE_SCHEMA)
+    attributes, tags = [], []
+    for position, doc_id in index_to_docstore_id.items():
+        doc = docstore.search(doc_id)
+        if isinstance(doc, str):
+            continue
+        values, doc_tags = feature_attributes(doc.metadata.get('features') or {})
+        attributes.append((int(position),) + tuple(values))
+        tags.extend((field, value, int(position)) for field, value in doc_tags)
+    conn.executemany("INSERT INTO attributes VALUES (?, ?, ?, ?)", attributes)
+    conn.executemany("INSERT INTO tags VALUES (?, ?, ?)", tags)
+
+
+class AttributeIndex:
+    """
+    템포/박자/조표/악기/음역 조건으로 후보 색인 위치를 찾는 보조 색인.
+    SQLite 속성 표를 처음 한 번 NumPy 열로 읽어 두고 범위 조건은 벡터 연산으로,
+    일치 조건은 값별 위치 목록(SQLite 인덱스로 조회 후 캐시)으로 계산합니다.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        rows = conn.execute(
+            "SELECT position, main_tempo, pitch_low, pitch_high FROM attributes ORDER BY position").fetchall()
+        size = rows[-1][0] + 1 if rows else 0
+        # 값이 없는 위치는 NaN (어떤 범위 조건도 만족하지 않음)
+        self.size = size
+        self.columns = {field: np.full(size, np.nan) for field in RANGE_FIELDS}
+        if rows:
+            table = np.array(rows, dtype=float)
+            positions = table[:, 0].astype(np.int64)
+            for column, field in enumerate(RANGE_FIELDS, start=1):
+                self.columns[field][positions] = table[:, column]
+        self._postings = {}  # (필드, 값) -> 위치 배열
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> 'AttributeIndex':
+        """
+        저장소의 보조 색인 (SQLite로 로드한 저장소는 파일의 속성 표를 그대로 사용하고,
+        메모리 저장소나 속성 표가 없는 이전 형식은 메모리 SQLite에 새로 만듦)
+        """
+        conn = getattr(vectorstore.docstore, 'conn', None)
+        if conn is not None and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attributes'").fetchone():
+            return cls(conn)
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        write_attributes(conn, vectorstore.docstore, vectorstore.index_to_docstore_id)
+        return cls(conn)
+
+    def _posting(self, field: str, value: str) -> np.ndarray:
+        key = (field, value)
+        if key not in self._postings:
+            rows = self.conn.execute("SELECT position FROM tags WHERE field = ? AND value = ?", key).fetchall()
+            self._postings[key] = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        return self._postings[key]
+
+    def candidates(self, filters: Dict) -> np.ndarray:
+        """조건을 모두 만족하는 색인 위치의 불리언 마스크 (실제 조건이 하나도 없으면 None)"""
+        mask = None
+        for field, condition in filters.items():
+            if field in RANGE_FIELDS:
+                low, high = condition
+                if low is None and high is None:
+                    continue
+                column = self.columns[field]
+                with np.errstate(invalid='ignore'):
+                    selected = ~np.isnan(column)
+                    if low is not None:
+                        selected &= column >= low
+                    if high is not None:
+                        selected &= column <= high
+            elif field in TAG_FIELDS:
+                values = [condition] if isinstance(condition, str) else list(condition)
+                selected = np.zeros(self.size, dtype=bool)
+                for value in values:
+                    selected[self._posting(field, str(value))] = True
+            else:
+                raise ValueError(f"Unknown filter field: {field} (expected one of {RANGE_FIELDS + tuple(TAG_FIELDS)})")
+            mask = selected if mask is None else mask & selected
+        return mask
+
+
+def filtered_search(vectorstore, embedding: List[float], k: int, mask: np.ndarray) -> List[tuple]:
+    """
+    후보 마스크(AttributeIndex.candidates)가 True인 위치 안에서만 k개 최근접 문서 검색 -> [(Document, 거리), ...]
+    flat(양자화 포함)/pq/HNSW 색인: 후보가 적으면 후보 벡터만 꺼내 직접 거리 계산
+    (전수 검색 색인은 후보가 많으면 더 가져온 뒤 거름)
+    그 외 색인 (또는 더 가져와도 k개가 안 될 때): faiss 비트맵 선택자로 후보가 아닌 벡터를 건너뜀
+    """
+    index = vectorstore.index
+    query = np.asarray(embedding, dtype=np.float32)[None, :]
+    # 속성 표에 없는 위치(마지막 문서들에 속성이 없는 경우 등)는 후보가 아님
+    if len(mask) < index.ntotal:
+        mask = np.concatenate([mask, np.zeros(index.ntotal - len(mask), dtype=bool)])
+    mask = mask[:index.ntotal]
+    count = int(np.count_nonzero(mask))
+    k = min(k, count)
+    if k == 0:
+        return []
+
+    found = None
+    # HNSW는 후보가 적으면 그래프 탐색이 후보에 닿지 못하므로 flat처럼 후보 벡터를 직접 비교
+    # (양자화 flat/pq는 복원한 벡터와의 거리가 색인 검색 거리와 같음)
+    if isinstance(index, (faiss.IndexFlatCodes, faiss.IndexHNSW)) and count <= GATHER_RATIO * index.ntotal:
+        positions = np.flatnonzero(mask)
+        vectors = index.reconstruct_batch(positions)
+        distances = ((vectors - query) ** 2).sum(axis=1)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind='stable')]
+        found, scores = positions[top], distances[top]
+    else:
+        if isinstance(index, faiss.IndexFlatCodes):
+            fetch = min(index.ntotal, int(np.ceil(k * OVERFETCH * index.ntotal / count)))
+            scores, found = index.search(query, fetch)
+            keep = found[0] >= 0
+            keep[keep] = mask[found[0][keep]]
+            scores, found = scores[0][keep][:k], found[0][keep][:k]
+            if len(found) < k:
+                found = None
+        if found is None:
+            bitmap = np.packbits(mask, bitorder='little')
+            selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+            if isinstance(index, faiss.IndexIVF):
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+            elif isinstance(index, faiss.IndexHNSW):
+                params = faiss.SearchParametersHNSW(sel=selector, efSearch=max(index.hnsw.efSearch, k))
+            else:
+                params = faiss.SearchParameters(sel=selector)
+            scores, found = index.search(query, k, params=params)
+            scores, found = scores[0], found[0]
+
+    results = []
+    for position, score in zip(found, scores):
+        if position < 0:
+            continue
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(position)])
+        if not isinstance(doc, str):
+            results.append((doc, float(score)))
+    return results
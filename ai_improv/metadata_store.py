@@ -0,0 +1,198 @@
+# metadata_store.py
+import os
+import json
+import zlib
+import sqlite3
+from urllib.request import pathname2url
+from collections.abc import Mapping
+from typing import Dict, List, Union
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from metadata_filter import write_attributes
+from lazy_features import LazyFeatures
+
+METADATA_FILENAME = "metadata.sqlite"
+# 검색 필터/결과 표시에 쓰지 않는 긴 특징 그룹 (전체 코드 진행, profile 배열, 코드 ID 진행)
+# documents.metadata에는 넣지 않고 features 표에 따로 저장해 재정렬/재임베딩할 때만 읽음
+DEFERRED_GROUPS = ('harmony', 'profile', 'progression')
+READ_ONLY_MESSAGE = "읽기 전용 문서 저장소입니다. 수정하려면 lazy=False로 로드하세요."
+
+_SCHEMA = """
+CREATE TABLE documents (
+    doc_id TEXT PRIMARY KEY,
+    page_content BLOB NOT NULL,
+    metadata BLOB NOT NULL
+);
+CREATE TABLE positions (
+    position INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL
+);
+CREATE TABLE features (
+    doc_id TEXT PRIMARY KEY,
+    groups TEXT NOT NULL,
+    features BLOB NOT NULL
+);
+"""
+
+
+def _pack(value) -> bytes:
+    """JSON + zlib 압축 (특징 딕셔너리의 긴 코드 진행 목록도 작게 저장)"""
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode("utf-8"))
+
+
+def _unpack(blob: bytes):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def split_metadata(metadata: Dict):
+    """
+    메타데이터 -> (documents 표에 넣을 메타데이터, 특징 그룹 이름 순서, features 표에 넣을 긴 그룹)
+    특징이 없거나 긴 그룹이 없으면 (메타데이터, None, None)
+    """
+    features = metadata.get('features')
+    if not isinstance(features, Mapping):
+        return metadata, None, None
+    deferred = {name: features[name] for name in DEFERRED_GROUPS if name in features}
+    if not deferred:
+        return metadata, None, None
+    slim = dict(metadata)
+    slim['features'] = {name: features[name] for name in features if name not in deferred}
+    return slim, list(features), deferred
+
+
+def _join_features(metadata: Dict, groups: List[str], deferred: Dict) -> Dict:
+    """split_metadata의 역변환 (특징 그룹을 원래 순서로)"""
+    features = metadata['features']
+    metadata['features'] = {name: features[name] if name in features else deferred[name] for name in groups}
+    return metadata
+
+
+def write_metadata(path: str, docstore, index_to_docstore_id: Dict):
+    """
+    문서 저장소와 색인 위치 -> 문서 ID 표를 SQLite 파일로 저장
+    임시 파일에 쓴 뒤 교체하므로 저장 중 실패해도 이전 파일이 남습니다.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.executemany(
+            "INSERT INTO positions (position, doc_id) VALUES (?, ?)",
+            ((int(position), doc_id) for position, doc_id in index_to_docstore_id.items())
+        )
+        rows = []
+        feature_rows = []
+        for doc_id in index_to_docstore_id.values():
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                metadata, groups, deferred = split_metadata(doc.metadata)
+                rows.append((doc_id, zlib.compress(doc.page_content.encode("utf-8")), _pack(metadata)))
+                if deferred:
+                    feature_rows.append((doc_id, json.dumps(groups, ensure_ascii=False), _pack(deferred)))
+        conn.executemany("INSERT INTO documents (doc_id, page_content, metadata) VALUES (?, ?, ?)", rows)
+        conn.executemany("INSERT INTO features (doc_id, groups, features) VALUES (?, ?, ?)", feature_rows)
+        # 벡터 검색 전 후보를 줄이는 템포/박자/조표/악기/음역 보조 색인
+        write_attributes(conn, docstore, index_to_docstore_id)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+class SQLiteDocstore(Docstore):
+    """
+    SQLite 파일에서 문서를 필요할 때만 읽는 읽기 전용 문서 저장소.
+    검색 결과 상위 k개의 메타데이터만 읽으므로 로드 시간/메모리가 코퍼스 크기와 무관합니다.
+    긴 특징 그룹(DEFERRED_GROUPS)은 metadata['features']에서 처음 접근할 때 features 표에서 읽습니다.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        # features 표가 없는 이전 형식 파일은 documents.metadata에 모든 특징이 있음
+        self.deferred = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'features'").fetchone() is not None
+
+    def search(self, search: str) -> Union[str, Document]:
+        if self.deferred:
+            query = ("SELECT d.page_content, d.metadata, f.groups FROM documents d "
+                     "LEFT JOIN features f ON f.doc_id = d.doc_id WHERE d.doc_id = ?")
+        else:
+            query = "SELECT page_content, metadata, NULL FROM documents WHERE doc_id = ?"
+        row = self.conn.execute(query, (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        metadata = _unpack(row[1])
+        if row[2] is not None:
+            metadata['features'] = LazyFeatures(json.loads(row[2]), self._deferred_loader(search),
+                                                initial=metadata['features'])
+        return Document(page_content=zlib.decompress(row[0]).decode("utf-8"), metadata=metadata, id=search)
+
+    def _deferred_loader(self, doc_id: str):
+        """문서 하나의 긴 특징 그룹을 처음 요청할 때 한 번만 읽는 함수"""
+        loaded = {}
+
+        def load(name):
+            if not loaded:
+                row = self.conn.execute("SELECT features FROM features WHERE doc_id = ?", (doc_id,)).fetchone()
+                loaded.update(_unpack(row[0]))
+            return loaded[name]
+
+        return load
+
+    def add(self, texts: Dict[str, Document]):
+        raise TypeError(READ_ONLY_MESSAGE)
+
+    def delete(self, ids):
+        raise TypeError(READ_ONLY_MESSAGE)
+
+
+class SQLiteIndexMap(Mapping):
+    """FAISS 색인 위치 -> 문서 ID 표 (SQLite에서 필요할 때만 조회, 읽기 전용)"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._len = conn.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def __getitem__(self, position):
+        row = self.conn.execute("SELECT doc_id FROM positions WHERE position = ?", (int(position),)).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for (position,) in self.conn.execute("SELECT position FROM positions ORDER BY position"):
+            yield position
+
+
+def open_metadata(path: str):
+    """SQLite 메타데이터 파일을 읽기 전용으로 열어 (문서 저장소, 위치 표) 반환"""
+    uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    return SQLiteDocstore(conn), SQLiteIndexMap(conn)
+
+
+def read_metadata(path: str):
+    """SQLite 메타데이터 파일 전체를 메모리로 읽어 (문서 딕셔너리, 위치 표) 반환 (증분 갱신용)"""
+    docstore, index_map = open_metadata(path)
+    try:
+        deferred = {}
+        if docstore.deferred:
+            for doc_id, groups, features in docstore.conn.execute("SELECT doc_id, groups, features FROM features"):
+                deferred[doc_id] = (json.loads(groups), _unpack(features))
+        docs = {}
+        for doc_id, page_content, metadata in docstore.conn.execute(
+                "SELECT doc_id, page_content, metadata FROM documents"):
+            metadata = _unpack(metadata)
+            if doc_id in deferred:
+                metadata = _join_features(metadata, *deferred[doc_id])
+            docs[doc_id] = Document(page_content=zlib.decompress(page_content).decode("utf-8"),
+                                    metadata=metadata, id=doc_id)
+        positions = dict(docstore.conn.execute("SELECT position, doc_id FROM positions ORDER BY position"))
+    finally:
+        docstore.conn.close()
+    return docs, positions
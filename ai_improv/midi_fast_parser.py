@@ -0,0 +1,540 @@
+# midi_fast_parser.py
+import math
+from fractions import Fraction
+from functools import lru_cache
+from typing import Dict, List
+import mido
+
+# music21 기본값과 동일하게 맞춤 (defaults.quantizationQuarterLengthDivisors)
+QUARTER_LENGTH_DIVISORS = (4, 3)
+DENOM_LIMIT = 65535
+PERCUSSION_CHANNEL = 9  # mido는 0부터 시작 (music21의 10번 채널)
+
+# mido 조표 이름 -> 샵(+)/플랫(-) 개수
+MAJOR_KEY_SHARPS = {
+    'Cb': -7, 'Gb': -6, 'Db': -5, 'Ab': -4, 'Eb': -3, 'Bb': -2, 'F': -1, 'C': 0,
+    'G': 1, 'D': 2, 'A': 3, 'E': 4, 'B': 5, 'F#': 6, 'C#': 7,
+}
+MINOR_KEY_SHARPS = {
+    'Ab': -7, 'Eb': -6, 'Bb': -5, 'F': -4, 'C': -3, 'G': -2, 'D': -1, 'A': 0,
+    'E': 1, 'B': 2, 'F#': 3, 'C#': 4, 'G#': 5, 'D#': 6, 'A#': 7,
+}
+
+
+class MIDIElement:
+    """노트/코드/쉼표 하나를 표현하는 가벼운 객체"""
+    __slots__ = ('offset', 'ql', 'kind', 'pitches', 'grace', 'order', 'velocities', 'channels')
+
+    def __init__(self, offset, ql, kind, pitches=(), grace=False, order=0, velocities=(), channels=()):
+        self.offset = offset
+        self.ql = ql
+        self.kind = kind  # 'note', 'chord', 'unpitched', 'percussion_chord', 'rest'
+        self.pitches = pitches
+        self.grace = grace
+        self.order = order
+        self.velocities = velocities  # 구성음별 세기 (pitches와 같은 순서)
+        self.channels = channels      # 구성음별 MIDI 채널
+
+    @property
+    def end(self):
+        return self.offset + self.ql
+
+    def copy(self, offset, ql):
+        return MIDIElement(offset, ql, self.kind, self.pitches, self.grace, self.order,
+                           self.velocities, self.channels)
+
+
+class _Voice(list):
+    """
+    성부(music21 Voice) 요소 리스트.
+    stale_high: music21이 캐시해 둔 분할 전 highestTime (삽입이 일어나면 None으로 초기화)
+    """
+    stale_high = None
+
+    def insert_element(self, index, element):
+        self.insert(index, element)
+        self.stale_high = None
+
+    @property
+    def highest_time(self):
+        if self.stale_high is not None:
+            return self.stale_high
+        return max([e.end for e in self] + [Fraction(0)])
+
+
+class _Measure:
+    __slots__ = ('offset', 'bar', 'elements', 'markers', 'voices')
+
+    def __init__(self, offset, bar):
+        self.offset = offset
+        self.bar = bar
+        self.elements = []  # 측정 단위(마디) 수준의 노트/쉼표
+        self.markers = []   # 길이가 0인 메타 요소의 마디 내 오프셋
+        self.voices = []    # 성부별 요소 리스트
+
+    @property
+    def has_voices(self):
+        return bool(self.voices)
+
+
+@lru_cache(maxsize=None)
+def _key_name(sharps: int, mode: str) -> str:
+    from music21 import key
+    return str(key.KeySignature(sharps).asKey(mode))
+
+
+@lru_cache(maxsize=None)
+def _program_instrument(program: int, percussion: bool):
+    from music21 import instrument
+    if percussion:
+        inst = instrument.UnpitchedPercussion()
+    else:
+        inst = instrument.instrumentFromMidiProgram(program)
+    return inst.__class__.__name__, inst.instrumentName
+
+
+@lru_cache(maxsize=None)
+def _named_instrument(name: str):
+    from music21 import instrument
+    try:
+        inst = instrument.fromString(name)
+    except instrument.InstrumentException:
+        inst = instrument.Instrument()
+    return inst.__class__.__name__, inst.instrumentName
+
+
+def _nearest_multiple(n: float, unit: float):
+    """music21 common.nearestMultiple과 같은 방식으로 (배수, 오차) 계산"""
+    mult = math.floor(n / unit)
+    half_unit = unit / 2.0
+    match_low = unit * mult
+    if match_low <= n <= (match_low + half_unit):
+        return mult, round(n - match_low, 7)
+    return mult + 1, round(unit * (mult + 1) - n, 7)
+
+
+def _op_frac_float(value: float) -> float:
+    numerator, denominator = value.as_integer_ratio()
+    if denominator > DENOM_LIMIT:
+        return float(Fraction(numerator, denominator).limit_denominator(DENOM_LIMIT))
+    return value
+
+
+def _best_match(target: float, zero_allowed=True, gap_to_fill=0.0) -> Fraction:
+    """music21 Stream.quantize의 bestMatch와 같은 기준으로 가장 가까운 격자값 선택"""
+    found = []
+    for div in QUARTER_LENGTH_DIVISORS:
+        tick = 1 / div
+        mult, error = _nearest_multiple(target, tick)
+        match = tick * mult
+        if not zero_allowed and mult == 0:
+            mult = 1
+            match = tick
+            error = abs(round(target - match, 7))
+        if gap_to_fill % tick == 0:
+            remaining_gap = 0.0
+        else:
+            remaining_gap = max(gap_to_fill - match, 0.0)
+        found.append((remaining_gap, error, tick, match, div, mult))
+    best = min(found)
+    return Fraction(best[5], best[4])
+
+
+class FastMIDIParser:
+    """
+    music21.converter.parse를 거치지 않고 mido 메시지를 한 번만 순회하여
+    music21이 만드는 악보 구조(양자화, 코드 묶음, 마디/붙임줄/쉼표)를 재현합니다.
+    """
+
+    def __init__(self, chunk_divisor: int = max(QUARTER_LENGTH_DIVISORS)):
+        self.chunk_divisor = chunk_divisor
+
+    def parse(self, midi_file) -> Dict:
+        """MIDI 파일을 파싱하여 파트별 요소와 메타 정보를 반환"""
+        if isinstance(midi_file, mido.MidiFile):
+            mid = midi_file
+        else:
+            mid = mido.MidiFile(midi_file, clip=True)
+        tpq = mid.ticks_per_beat
+
+        conductor = {'tempos': [], 'keys': [], 'time_signatures': []}
+        parts = []
+        for track in mid.tracks:
+            events = []
+            tick = 0
+            has_notes = False
+            for msg in track:
+                tick += msg.time
+                events.append((tick, msg))
+                if msg.type == 'note_on' and msg.velocity > 0:
+                    has_notes = True
+
+            metas = self._meta_events(events, tpq)
+            if not has_notes:
+                # 노트가 없는 트랙(컨덕터 트랙)은 공통 메타 정보로만 사용
+                for name in conductor:
+                    conductor[name].extend(metas[name])
+                continue
+            parts.append(self._build_part(events, metas, tpq, conductor))
+
+        return {'ticks_per_beat': tpq, 'parts': parts}
+
+    def _meta_events(self, events, tpq) -> Dict:
+        """템포/조표/박자표/악기 메타 이벤트 추출 (오프셋은 양자화된 값)"""
+        metas = {'tempos': [], 'keys': [], 'time_signatures': [], 'instruments': []}
+        for tick, msg in events:
+            offset = _best_match(tick / tpq)
+            if msg.type == 'set_tempo':
+                metas['tempos'].append((offset, round(60_000_000 / msg.tempo, 2)))
+            elif msg.type == 'key_signature':
+                metas['keys'].append((offset, self._key_signature_name(msg.key)))
+            elif msg.type == 'time_signature':
+                metas['time_signatures'].append((offset, (msg.numerator, msg.denominator)))
+            elif msg.type in ('track_name', 'instrument_name'):
+                metas['instruments'].append((Fraction(tick, tpq), self._name_instrument(msg)))
+            elif msg.type == 'program_change':
+                cls, instrument_name = _program_instrument(
+                    msg.program, msg.channel == PERCUSSION_CHANNEL)
+                metas['instruments'].append((Fraction(tick, tpq), [cls, None, instrument_name]))
+        metas['instruments'] = self._deduplicate_instruments(metas['instruments'])
+        return metas
+
+    def _key_signature_name(self, key_name: str) -> str:
+        if key_name.endswith('m'):
+            return _key_name(MINOR_KEY_SHARPS[key_name[:-1]], 'minor')
+        return _key_name(MAJOR_KEY_SHARPS[key_name], 'major')
+
+    def _name_instrument(self, msg):
+        try:
+            decoded = msg.name.encode('latin-1').decode('utf-8').split('\x00')[0].strip()
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            return ['Instrument', None, None]
+        cls, instrument_name = _named_instrument(decoded)
+        lowered = decoded.lower()
+        if (not decoded or lowered in ('instrument', 'inst')
+                or lowered.replace('instrument ', '').isdigit()
+                or lowered.replace('inst ', '').isdigit()):
+            return [cls, None, instrument_name]
+        if msg.type == 'track_name':
+            return [cls, decoded, instrument_name]
+        return [cls, None, decoded]
+
+    def _deduplicate_instruments(self, instruments):
+        """music21 instrument.deduplicate와 같은 규칙으로 같은 오프셋의 악기 정리"""
+        by_offset = {}
+        for offset, inst in instruments:
+            by_offset.setdefault(offset, []).append(inst)
+
+        result = []
+        for offset in sorted(by_offset):
+            group = by_offset[offset]
+            if len(group) > 1:
+                part_names = {inst[1] for inst in group if inst[1] is not None}
+                inst_names = {inst[2] for inst in group if inst[2] is not None}
+                if len(part_names) <= 1 and len(inst_names) <= 1:
+                    part_name = next(iter(part_names), None)
+                    inst_name = next(iter(inst_names), None)
+                    if len({inst[0] for inst in group}) == 1:
+                        group = [[group[0][0], part_name, inst_name]]
+                    else:
+                        group = [[inst[0], part_name, inst_name]
+                                 for inst in group if inst[0] != 'Instrument']
+            for inst in group:
+                result.append((_best_match(float(offset)), inst))
+        return result
+
+    def _pair_notes(self, events):
+        """노트 온/오프 이벤트를 (on_tick, off_tick, pitch, channel, velocity) 로 짝지음"""
+        notes = []
+        awaiting = {}
+        for tick, msg in reversed(events):
+            if msg.type == 'note_off' or (msg.type == 'note_on' and msg.velocity == 0):
+                awaiting[msg.note, msg.channel] = tick
+            elif msg.type == 'note_on':
+                off_tick = awaiting.get((msg.note, msg.channel))
+                if off_tick is not None:
+                    notes.append((tick, off_tick, msg.note, msg.channel, msg.velocity))
+        notes.reverse()
+        return notes
+
+    def _group_chords(self, notes, tpq):
+        """시작 시간이 가까운 노트를 코드로 묶음 (music21 midiTrackToStream과 동일)"""
+        tolerance = tpq / self.chunk_divisor
+        gathered = [False] * len(notes)
+        elements = []
+        voices_required = False
+        for i, (tick_start, tick_off, _, _, _) in enumerate(notes):
+            if gathered[i]:
+                continue
+            chord_sub = [notes[i]]
+            for j in range(i + 1, len(notes)):
+                if abs(notes[j][0] - tick_start) >= tolerance:
+                    break
+                if abs(notes[j][1] - tick_off) > tolerance:
+                    voices_required = True
+                    continue
+                chord_sub.append(notes[j])
+                gathered[j] = True
+
+            last_on, last_off = chord_sub[-1][0], chord_sub[-1][1]
+            ql = Fraction(last_off - last_on, tpq)
+            percussion = any(n[3] == PERCUSSION_CHANNEL for n in chord_sub)
+            if len(chord_sub) > 1:
+                kind = 'percussion_chord' if percussion else 'chord'
+            else:
+                kind = 'unpitched' if percussion else 'note'
+            pitches = tuple(n[2] for n in chord_sub)
+            elements.append(MIDIElement(Fraction(tick_start, tpq), ql, kind, pitches,
+                                        grace=(ql == 0), order=len(elements),
+                                        velocities=tuple(n[4] for n in chord_sub),
+                                        channels=tuple(n[3] for n in chord_sub)))
+        return elements, voices_required
+
+    def _quantize(self, elements, markers):
+        """music21 Stream.quantize(processOffsets, processDurations) 재현"""
+        items = [(e.offset, 0, e) for e in elements] + [(m, 0, None) for m in markers]
+        items.sort(key=lambda item: item[0])
+        quantized_offsets = [_best_match(float(offset)) for offset, _, _ in items]
+
+        for i, (_, _, e) in enumerate(items):
+            if e is None:
+                continue
+            o = quantized_offsets[i]
+            zero_allowed = e.grace
+            look_ahead = None
+            for j in range(i + 1, len(items)):
+                if quantized_offsets[j] > o:
+                    look_ahead = quantized_offsets[j]
+                    break
+            if look_ahead is not None:
+                gap = _op_frac_float(float(look_ahead) - float(o))
+                e.ql = _best_match(float(e.ql), zero_allowed, gap)
+            else:
+                e.ql = _best_match(float(e.ql), zero_allowed)
+            e.offset = o
+        elements.sort(key=lambda e: (e.offset, not e.grace, e.order))
+
+    def _build_part(self, events, metas, tpq, conductor) -> Dict:
+        notes = self._pair_notes(events)
+        elements, voices_required = self._group_chords(notes, tpq)
+
+        marker_ticks = [Fraction(tick, tpq) for tick, msg in events
+                        if msg.type in ('set_tempo', 'key_signature', 'time_signature',
+                                        'track_name', 'instrument_name', 'program_change')]
+        self._quantize(elements, marker_ticks)
+
+        tempos = metas['tempos'] + conductor['tempos']
+        keys = metas['keys'] + conductor['keys']
+        if conductor['time_signatures']:
+            meter = list(conductor['time_signatures'])
+        else:
+            meter = list(metas['time_signatures'])
+        if not any(offset == 0 for offset, _ in meter):
+            meter.insert(0, (Fraction(0), (4, 4)))
+        meter.sort(key=lambda item: item[0])
+
+        markers = sorted({offset for offset, _ in tempos + keys + metas['instruments']})
+        measures = self._make_measures(elements, markers, meter)
+        if voices_required:
+            for m in measures:
+                self._make_voices(m)
+        self._make_ties(measures)
+        self._make_rests(measures)
+
+        # music21 flatten() 순서: 오프셋, 꾸밈음 우선, 성부(Voice) 내용이 마디 수준 요소보다 먼저
+        flat = []
+        for m in measures:
+            for v_index, voice in enumerate(m.voices):
+                for e in voice:
+                    flat.append((m.offset + e.offset, v_index, e))
+            for e in m.elements:
+                flat.append((m.offset + e.offset, len(m.voices), e))
+        flat.sort(key=lambda item: (item[0], not item[2].grace, item[1]))
+
+        return {
+            'elements': [(offset, e) for offset, _, e in flat],
+            'tempos': tempos,
+            'keys': keys,
+            'time_signatures': [(offset, f"{num}/{den}") for offset, (num, den) in meter],
+            'instruments': [inst[2] for _, inst in metas['instruments']],
+        }
+
+    def _make_measures(self, elements, markers, meter) -> List[_Measure]:
+        highest_time = max([e.end for e in elements] + [Fraction(0)])
+        highest_offset = max([e.offset for e in elements] + list(markers) + [Fraction(0)])
+
+        measures = []
+        offset = Fraction(0)
+        meter_index = 0
+        while not measures or offset < highest_time or offset <= highest_offset:
+            while meter_index + 1 < len(meter) and meter[meter_index + 1][0] <= offset:
+                meter_index += 1
+            num, den = meter[meter_index][1]
+            bar = Fraction(4 * num, den)
+            measures.append(_Measure(offset, bar))
+            offset += bar
+
+        m_index = 0
+        for e in elements:
+            while m_index + 1 < len(measures) and measures[m_index + 1].offset <= e.offset:
+                m_index += 1
+            m = measures[m_index]
+            e.offset -= m.offset
+            m.elements.append(e)
+        m_index = 0
+        for marker in markers:
+            while m_index + 1 < len(measures) and measures[m_index + 1].offset <= marker:
+                m_index += 1
+            measures[m_index].markers.append(marker - measures[m_index].offset)
+        return measures
+
+    def _overlap_group_sizes(self, elements) -> List[int]:
+        """music21 Stream.getOverlaps() 의 그룹별 크기"""
+        spans = sorted((e.offset, e.end, i) for i, e in enumerate(elements))
+        overlap_map = [[] for _ in elements]
+        for i, src in enumerate(spans):
+            for j in range(i + 1, len(spans)):
+                dst = spans[j]
+                if sorted([src[:2], dst[:2]])[1][0] < sorted([src[:2], dst[:2]])[0][1]:
+                    overlap_map[src[2]].append(dst[2])
+                    overlap_map[dst[2]].append(src[2])
+                else:
+                    break
+
+        post = {}
+        stored = {}
+        for src_index, indices in enumerate(overlap_map):
+            if not indices:
+                continue
+            src_offset = elements[src_index].offset
+            dst_offset = None
+            for j in sorted(indices):
+                if j in stored:
+                    dst_offset = stored[j]
+                    continue
+                if dst_offset is None:
+                    dst_offset = src_offset
+                post.setdefault(dst_offset, []).append(j)
+                stored[j] = dst_offset
+            if src_index not in stored:
+                if dst_offset is None:
+                    dst_offset = src_offset
+                post.setdefault(dst_offset, []).append(src_index)
+                stored[src_index] = dst_offset
+        return [len(group) for group in post.values()]
+
+    def _make_voices(self, m: _Measure):
+        notes = m.elements
+        max_voice_count = max(self._overlap_group_sizes(notes) + [1])
+        if max_voice_count == 1:
+            return
+        voices = [_Voice() for _ in range(max_voice_count)]
+        highest = [Fraction(0)] * max_voice_count
+        for e in notes:
+            for v in range(max_voice_count):
+                if highest[v] <= e.offset:
+                    voices[v].insert_element(len(voices[v]), e)
+                    highest[v] = max(highest[v], e.end)
+                    break
+                # 조회만 되고 삽입되지 않은 성부는 이 시점의 highestTime이 캐시에 남음
+                voices[v].stale_high = highest[v]
+        m.elements = []
+        m.voices = [v for v in voices if v]
+
+    def _make_ties(self, measures: List[_Measure]):
+        """마디 경계를 넘는 노트를 분할하여 다음 마디로 넘김 (music21 makeTies)"""
+        i = 0
+        while i < len(measures):
+            m = measures[i]
+            if i + 1 < len(measures):
+                m_next = measures[i + 1]
+            else:
+                m_next = _Measure(m.offset + m.bar, m.bar)
+            added = False
+            next_has_voices = m_next.has_voices
+            bundle = m.voices if m.has_voices else [m.elements]
+            for component in bundle:
+                for e in list(component):
+                    overshot = e.end - m.bar
+                    if overshot <= 0 or e.offset >= m.bar:
+                        continue
+                    remain = e.copy(Fraction(0), overshot)
+                    e.ql = m.bar - e.offset
+                    if isinstance(component, _Voice) and e.kind in ('note', 'unpitched'):
+                        # music21에서 단일 노트의 길이 변경만 성부 캐시를 비움 (코드는 비우지 않음)
+                        component.stale_high = None
+                    if next_has_voices:
+                        dst = m_next.elements if m.has_voices else m_next.voices[0]
+                    elif m.has_voices:
+                        if not m_next.voices:
+                            m_next.voices = [_Voice(m_next.elements)]
+                            m_next.elements = []
+                        dst = m_next.voices[0]
+                    else:
+                        dst = m_next.elements
+                    if isinstance(dst, _Voice):
+                        dst.insert_element(self._insert_index(dst, remain), remain)
+                    else:
+                        # 마디에 직접 삽입할 때 music21은 마디 highestTime을 조회하며 성부 값을 캐시함
+                        for v in m_next.voices:
+                            v.stale_high = v.highest_time
+                        dst.insert(self._insert_index(dst, remain), remain)
+                    if i + 1 >= len(measures) and not added:
+                        measures.append(m_next)
+                        added = True
+            i += 1
+
+        for m in measures:
+            non_empty = [v for v in m.voices if v]
+            if len(non_empty) == 1:
+                m.elements = sorted(m.elements + non_empty[0],
+                                    key=lambda e: (e.offset, not e.grace))
+                non_empty = []
+            m.voices = non_empty
+
+    def _insert_index(self, component, element):
+        for index, e in enumerate(component):
+            if e.offset > element.offset:
+                return index
+        return len(component)
+
+    def _fill_rests(self, component, bar, markers=(), high=None):
+        """music21 makeRests(fillGaps=True, timeRangeFromBarDuration=True) 재현"""
+        spans = sorted([(e.offset, e.ql) for e in component] + [(o, 0) for o in markers])
+        rests = []
+        low = min([o for o, _ in spans] + [Fraction(0)]) if spans else Fraction(0)
+        if high is None:
+            high = max([o + d for o, d in spans] + [Fraction(0)])
+        if low > 0:
+            rests.append((Fraction(0), low))
+            spans.insert(0, (Fraction(0), low))
+        if bar - high > 0:
+            rests.append((high, bar - high))
+            spans.append((high, bar - high))
+        highest_end = Fraction(0)
+        for offset, ql in spans:
+            if offset > highest_end:
+                rests.append((highest_end, offset - highest_end))
+            highest_end = max(highest_end, offset + ql)
+        return [MIDIElement(offset, ql, 'rest') for offset, ql in rests]
+
+    def _make_rests(self, measures: List[_Measure]):
+        for m in measures:
+            voice_spans = []
+            for v in m.voices:
+                rests = self._fill_rests(v, m.bar, high=v.highest_time)
+                if rests:
+                    v.extend(rests)
+                    v.sort(key=lambda e: e.offset)
+                    v.stale_high = None
+                voice_spans.append(MIDIElement(Fraction(0), v.highest_time, 'voice'))
+            rests = self._fill_rests(m.elements + voice_spans, m.bar, m.markers)
+            m.elements.extend(rests)
+            m.elements.sort(key=lambda e: e.offset)
+
+        # music21은 쉼표를 채운 뒤 각 마디의 실제 길이(highestTime)를 누적하여 마디 오프셋을 다시 잡음
+        accumulated = Fraction(0)
+        for m in measures:
+            m.offset = accumulated
+            ends = [e.end for e in m.elements] + [v.highest_time for v in m.voices]
+            accumulated += max(ends + list(m.markers) + [Fraction(0)])
@@ -1,114 +1,564 @@
+import io
+import os
+import time
+import asyncio
+import signal
+import threading
 import mido
 import music21
-from typing import Dict, List
+from typing import Dict, List, Iterator
 import numpy as np
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from midi_fast_parser import FastMIDIParser
+from feature_cache import FeatureCache
+from note_table import NoteTable, KIND_NOTE, KIND_CHORD, KIND_REST
+from lazy_features import LazyFeatures
+from chord_lut import get_chord_lut, run_length_encode
+from midi_sources import MIDISource, source_name, source_payload
+
+# 사용 가능한 특징 추출 엔진
+# - 'music21': music21.converter.parse 기반 (기준 구현)
+# - 'mido': mido 메시지를 한 번만 순회하는 빠른 구현 (music21과 같은 특징 딕셔너리 생성)
+ENGINES = ('music21', 'mido')
+
+# 특징 그룹 (extract_features 결과 딕셔너리의 키 순서)
+FEATURE_GROUPS = ('tempo', 'harmony', 'rhythm', 'melody', 'key_signatures', 'time_signatures', 'instruments')
+# 수치 임베딩/재정렬용 확장 그룹: 기본 결과에는 없고 extended=True이거나 groups로 요청할 때만 계산
+# - 'profile': 음높이 클래스/음정 분포, 선율 윤곽, 음정 n-gram
+# - 'progression': 코드 ID(음높이 클래스 마스크) 진행의 런렝스 인코딩
+EXTENDED_GROUPS = ('profile', 'progression')
+
+# 특징 딕셔너리 구성이 바뀌면 올려서 이전 캐시를 무효화
+EXTRACTOR_VERSION = "5"
+
+# profile 그룹: 선율 윤곽 길이, 음정 n-gram 길이와 음정 범위 (옥타브 이상은 ±12로 묶음)
+CONTOUR_LENGTH = 32
+INTERVAL_NGRAM = 3
+MAX_INTERVAL_STEP = 12
+
+# 구간 색인 기본값: 4마디 구간을 2마디씩 겹치며 자름
+DEFAULT_WINDOW_BARS = 4
+DEFAULT_HOP_BARS = 2
+
+# extract_features_batch 파일당 기본 제한 시간 (초)
+DEFAULT_FILE_TIMEOUT = 60
+
+
+def interval_ngram_ids(signed_steps: np.ndarray, valid: np.ndarray, n: int = INTERVAL_NGRAM) -> np.ndarray:
+    """
+    연속한 음정 n개를 정수 ID 하나로 묶은 n-gram 집합 (정렬된 고유 ID)
+    valid[i]가 False인 음정(트랙 경계)을 포함하는 n-gram은 제외
+    """
+    if len(signed_steps) < n:
+        return np.zeros(0, dtype=np.int64)
+    base = 2 * MAX_INTERVAL_STEP + 1
+    windows = np.lib.stride_tricks.sliding_window_view(signed_steps + MAX_INTERVAL_STEP, n)
+    ok = np.lib.stride_tricks.sliding_window_view(valid, n).all(axis=1)
+    ids = windows[ok] @ (base ** np.arange(n - 1, -1, -1))
+    return np.unique(ids)
+
+
+def prompt_features(features: Dict) -> str:
+    """LLM 프롬프트에 넣을 특징 문자열 (확장 그룹의 긴 수치 배열은 빼고 기본 그룹만)"""
+    return str({name: features[name] for name in FEATURE_GROUPS if name in features})
+
+
+class FeatureExtractionTimeout(Exception):
+    """파일 하나의 특징 추출이 제한 시간을 넘김"""
+
+
+@contextmanager
+def _time_limit(seconds):
+    """SIGALRM으로 제한 시간 적용 (POSIX 메인 스레드에서만 동작, 그 외에는 사후 확인만 함)"""
+    if not seconds or not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _raise_timeout(signum, frame):
+        raise FeatureExtractionTimeout(f"{seconds}초 제한 시간 초과")
+
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+# 프로세스 풀 워커마다 한 번 만드는 추출기
+_worker_extractor = None
+
+
+def _init_worker(engine, cache_dir, max_bytes, extended=False):
+    global _worker_extractor
+    cache = FeatureCache(cache_dir, max_bytes) if cache_dir else None
+    _worker_extractor = MIDIFeatureExtractor(engine, cache=cache, use_cache=cache is not None, extended=extended)
+
+
+def _extract_worker(source, engine, timeout, segments, melody_lines):
+    return _worker_extractor._extract_record(source, engine, timeout, segments, melody_lines)
+
 
 class MIDIFeatureExtractor:
-    def __init__(self):
+    def __init__(self, engine: str = 'music21', cache: FeatureCache = None, use_cache: bool = True,
+                 extended: bool = False):
+        """
+        Args:
+            engine: 기본 특징 추출 엔진 ('music21' 또는 'mido')
+            cache: 사용할 특징 캐시 (생략하면 기본 디스크 캐시)
+            use_cache: False이면 캐시를 사용하지 않음
+            extended: True면 특징 딕셔너리에 확장 그룹(EXTENDED_GROUPS)도 포함 (벡터화/재정렬용)
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"지원하지 않는 특징 추출 엔진: {engine}")
         self.features = {}
+        self.engine = engine
+        self.extended = extended
+        self.groups = FEATURE_GROUPS + EXTENDED_GROUPS if extended else FEATURE_GROUPS
+        self.fast_parser = FastMIDIParser()
+        self.cache = (cache or FeatureCache()) if use_cache else None
+        self._pool = None  # aextract_features가 executor 없이 호출될 때 쓰는 프로세스 풀 (처음 사용할 때 생성)
     
-    def extract_features(self, midi_file: str) -> Dict:
+    def extract_features(self, midi_file: MIDISource, engine: str = None, groups: List[str] = None) -> Dict:
+        """
+        MIDI 파일에서 특징 추출
+        
+        Args:
+            midi_file: MIDI 파일 경로, MIDI bytes 또는 (이름, bytes)
+            engine: 사용할 추출 엔진 ('music21' 또는 'mido'). 생략하면 인스턴스 설정을 따름
+            groups: 필요한 특징 그룹 (FEATURE_GROUPS/EXTENDED_GROUPS 중 일부). 지정하면 각 그룹을 처음 접근할 때
+                    계산하는 LazyFeatures를 반환하고, 생략하면 기본 그룹(extended면 확장 그룹 포함)을 담은 딕셔너리를 반환
+        """
+        engine = engine or self.engine
+        if engine not in ENGINES:
+            raise ValueError(f"지원하지 않는 특징 추출 엔진: {engine}")
+        if groups is not None:
+            unknown = [name for name in groups if name not in FEATURE_GROUPS + EXTENDED_GROUPS]
+            if unknown:
+                raise ValueError(f"알 수 없는 특징 그룹: {unknown}")
+        
         try:
-            score = music21.converter.parse(midi_file)
-            flattened_score = score.flatten()
-            
-            features = {
-                'tempo': self._extract_tempo(flattened_score),
-                'harmony': self._extract_harmony(flattened_score),
-                'rhythm': self._extract_rhythm(flattened_score),
-                'melody': self._extract_melody(flattened_score),
-                'key_signatures': self._extract_key_signatures(flattened_score),
-                'time_signatures': self._extract_time_signatures(flattened_score),
-                'instruments': self._extract_instruments(flattened_score)
-            }
-            
-            return features
+            cache_key, cached = self._cache_lookup(midi_file, engine)
+            wanted = groups if groups is not None else self.groups
+            if cached is not None and all(name in cached for name in wanted):
+                self.cache.record(hit=True)
+                return self._cached_result(cached, groups)
+            table = self.extract_note_table(midi_file, engine)
+            if cache_key is not None:
+                self.cache.record(hit=False)
+            if cached is not None:
+                # 캐시된 딕셔너리에 없는 그룹만 계산해 합친 뒤 다시 저장 (다음 요청부터는 적중)
+                missing = [name for name in wanted if name not in cached]
+                computed = self.features_from_table(table, missing)
+                features = dict(cached, **{name: computed[name] for name in missing})
+                self._cache_store(cache_key, features)
+                return self._cached_result(features, groups)
+            if groups is not None:
+                # 파싱은 지금 하고 (실패를 바로 알리기 위해) 그룹 계산만 미룸
+                return self.features_from_table(table, groups)
+            features = self.features_from_table(table)
         except Exception as e:
-            print(f"Error extracting features from {midi_file}: {str(e)}")
+            print(f"Error extracting features from {source_name(midi_file)}: {str(e)}")
             return {}
+        
+        self._cache_store(cache_key, features)
+        return features
+    
+    def _cached_result(self, cached: Dict, groups: List[str] = None):
+        """캐시된 딕셔너리를 extract_features 반환 형식으로 (다른 요청으로 늘어난 그룹은 기본 결과에서 뺌)"""
+        if groups is not None:
+            return LazyFeatures(groups, cached.__getitem__, initial=cached)
+        if list(cached) == list(self.groups):
+            return cached
+        return {name: cached[name] for name in self.groups}
+    
+    def extract_features_batch(self, midi_files, workers: int = None,
+                               timeout: float = DEFAULT_FILE_TIMEOUT, engine: str = None,
+                               segments: tuple = None, melody_lines: bool = False) -> Iterator[Dict]:
+        """
+        여러 MIDI 파일의 특징을 프로세스 풀로 병렬 추출하여 끝난 순서대로 반환
+        
+        Args:
+            midi_files: MIDI 소스(경로 또는 (이름, bytes))의 iterable. 제너레이터도 받으며
+                        동시에 처리 중인 항목은 워커 수의 2배로 제한하여 메모리 사용량을 일정하게 유지
+            workers: 워커 프로세스 수 (생략하면 CPU 수, 1이면 현재 프로세스에서 순차 처리)
+            timeout: 파일 하나당 제한 시간 (초, None이면 제한 없음)
+            engine: 사용할 추출 엔진. 생략하면 인스턴스 설정을 따름
+            segments: (구간 마디 수, 이동 마디 수). 지정하면 features 대신 extract_segments()와 같은
+                      구간 목록을 반환
+            melody_lines: True면 같은 해석 결과로 NoteTable.melody_line()도 계산해 'melody_line'에 담음
+                          (모티프 색인용)
+        
+        Yields:
+            Dict: {'index', 'file', 'ok', 'features', 'melody_line', 'error_type', 'error', 'elapsed', 'cache_hit'}
+                  index는 입력 순서, 실패한 파일은 ok=False와 오류 종류/메시지를 담아 반환
+                  워커 프로세스가 비정상 종료되면 그때 처리 중이던 파일들은 실패(BrokenProcessPool)로 반환하고
+                  새 풀에서 나머지 파일을 계속 처리
+        """
+        engine = engine or self.engine
+        if engine not in ENGINES:
+            raise ValueError(f"지원하지 않는 특징 추출 엔진: {engine}")
+        
+        workers = workers or os.cpu_count() or 1
+        if hasattr(midi_files, '__len__'):
+            workers = min(workers, len(midi_files))
+        if workers <= 1:
+            for index, source in enumerate(midi_files):
+                record = self._extract_record(source, engine, timeout, segments, melody_lines)
+                record['index'] = index
+                yield record
+            return
+        
+        executor = self.worker_pool(workers, engine)
+        pending = enumerate(midi_files)
+        in_flight = {}
+        
+        def submit_next():
+            nonlocal executor
+            for index, source in pending:
+                try:
+                    future = executor.submit(_extract_worker, source, engine, timeout, segments, melody_lines)
+                except BrokenProcessPool:
+                    # 워커가 비정상 종료되면 풀 전체를 쓸 수 없으므로 새 풀로 바꿔 나머지 파일을 계속 처리
+                    # (그때 처리 중이던 파일들은 실패 레코드로 반환됨)
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    executor = self.worker_pool(workers, engine)
+                    future = executor.submit(_extract_worker, source, engine, timeout, segments, melody_lines)
+                in_flight[future] = (index, source_name(source))
+                return True
+            return False
+        
+        try:
+            while len(in_flight) < workers * 2 and submit_next():
+                pass
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, name = in_flight.pop(future)
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        # 워커 프로세스가 비정상 종료된 경우(BrokenProcessPool) 등
+                        record = self._failure_record(name, e, 0.0)
+                    record['index'] = index
+                    if self.cache is not None and record['ok']:
+                        # 워커의 캐시 통계를 현재 프로세스 카운터에 반영
+                        # (실패/시간 초과한 파일은 적중률을 왜곡하지 않도록 세지 않음)
+                        self.cache.record(record['cache_hit'])
+                    submit_next()
+                    yield record
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def worker_pool(self, workers: int = None, engine: str = None) -> ProcessPoolExecutor:
+        """이 추출기의 엔진/캐시 설정으로 워커를 초기화한 프로세스 풀 (aextract_features 등에 전달)"""
+        engine = engine or self.engine
+        cache_args = (self.cache.cache_dir, self.cache.max_bytes) if self.cache is not None else (None, None)
+        return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker,
+                                   initargs=(engine,) + cache_args + (self.extended,))
+    
+    async def aextract_features(self, midi_file: MIDISource, executor: ProcessPoolExecutor = None,
+                                timeout: float = DEFAULT_FILE_TIMEOUT) -> Dict:
+        """
+        extract_features의 코루틴 버전: 해석/특징 계산을 프로세스 풀에서 실행해 이벤트 루프를 막지 않음
+        제한 시간은 워커 프로세스의 메인 스레드에서 SIGALRM으로 적용 (스레드 풀에서는 적용할 수 없음)
+        
+        Args:
+            midi_file: MIDI 파일 경로, MIDI bytes 또는 (이름, bytes)
+            executor: worker_pool()로 만든 프로세스 풀 (생략하면 처음 호출할 때 만든 이 추출기의 풀, close()로 종료)
+            timeout: 파일 하나당 제한 시간 (초)
+        """
+        loop = asyncio.get_running_loop()
+        if executor is None:
+            if self._pool is None:
+                self._pool = self.worker_pool()
+            executor = self._pool
+        record = await loop.run_in_executor(executor, _extract_worker, midi_file, self.engine, timeout, None, False)
+        if not record['ok']:
+            raise ValueError(f"{record['file']}: {record['error_type']}: {record['error']}")
+        if self.cache is not None:
+            self.cache.record(record['cache_hit'])
+        return record['features']
+    
+    def close(self):
+        """aextract_features가 만든 프로세스 풀 종료"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
     
-    def _extract_tempo(self, score):
+    def cache_stats(self) -> Dict:
+        """특징 캐시 적중/미스 통계 (캐시를 쓰지 않으면 빈 딕셔너리)"""
+        return self.cache.stats() if self.cache is not None else {}
+    
+    def _cache_lookup(self, midi_file: MIDISource, engine: str, segments: tuple = None, melody_lines: bool = False):
+        """
+        (캐시 키, 캐시된 특징) 반환. 캐시를 쓰지 않으면 (None, None)
+        조회는 적중/미스로 세지 않으므로 결과를 쓸지 정한 뒤 self.cache.record()로 셈
+        """
+        if self.cache is None:
+            return None, None
+        version = f"{EXTRACTOR_VERSION}:{engine}"
+        if self.extended:
+            version += ":extended"
+        if segments:
+            version += ":segments:{}x{}".format(*segments)
+        if melody_lines:
+            # 특징과 선율선을 {'features', 'melody_line'}로 함께 저장
+            version += ":melody"
+        cache_key = self.cache.make_key(source_payload(midi_file), version)
+        return cache_key, self.cache.get(cache_key, count=False)
+    
+    def _cache_store(self, cache_key: str, features: Dict):
+        if cache_key is not None and features:
+            self.cache.put(cache_key, features)
+    
+    def _extract_record(self, source: MIDISource, engine: str, timeout: float, segments: tuple = None,
+                        melody_lines: bool = False) -> Dict:
+        """파일 하나를 제한 시간 안에 추출하여 결과 레코드로 반환 (예외를 삼키지 않고 기록)"""
+        midi_file = source_name(source)
+        start = time.perf_counter()
+        cache_key = None
+        try:
+            cache_key, cached = self._cache_lookup(source, engine, segments, melody_lines)
+            if cached is not None:
+                self.cache.record(hit=True)
+                if melody_lines:
+                    return self._success_record(midi_file, cached['features'], time.perf_counter() - start, True,
+                                                cached['melody_line'])
+                return self._success_record(midi_file, cached, time.perf_counter() - start, True)
+            with _time_limit(timeout):
+                table = self.extract_note_table(source, engine)
+                if segments:
+                    features = self.segments_from_table(table, *segments)
+                else:
+                    features = self.features_from_table(table)
+                melody_line = table.melody_line() if melody_lines else None
+            elapsed = time.perf_counter() - start
+            # 알람이 내부 except에 삼켜졌을 수 있으므로 시간을 다시 확인 (이 경우 캐시하지 않음)
+            if timeout and elapsed > timeout:
+                raise FeatureExtractionTimeout(f"{timeout}초 제한 시간 초과 ({elapsed:.1f}초)")
+        except Exception as e:
+            # 실패한 파일의 조회는 캐시 미스로 세지 않음
+            return self._failure_record(midi_file, e, time.perf_counter() - start)
+        
+        if cache_key is not None:
+            self.cache.record(hit=False)
+        if melody_lines:
+            if features:
+                self._cache_store(cache_key, {'features': features, 'melody_line': melody_line})
+        else:
+            self._cache_store(cache_key, features)
+        return self._success_record(midi_file, features, elapsed, False, melody_line)
+    
+    def _success_record(self, midi_file, features, elapsed, cache_hit, melody_line=None) -> Dict:
+        return {
+            'file': midi_file,
+            'ok': True,
+            'features': features,
+            'melody_line': melody_line,
+            'error_type': None,
+            'error': None,
+            'elapsed': elapsed,
+            'cache_hit': cache_hit
+        }
+    
+    def _failure_record(self, midi_file, error, elapsed) -> Dict:
+        return {
+            'file': midi_file,
+            'ok': False,
+            'features': None,
+            'melody_line': None,
+            'error_type': type(error).__name__,
+            'error': str(error),
+            'elapsed': elapsed,
+            'cache_hit': False
+        }
+    
+    def extract_note_table(self, midi_file: MIDISource, engine: str = None) -> NoteTable:
+        """
+        MIDI 파일을 한 번 해석하여 노트 테이블 반환 (다른 단계에서 다시 파싱하지 않고 재사용)
+        
+        Args:
+            midi_file: MIDI 파일 경로, MIDI bytes 또는 (이름, bytes)
+            engine: 사용할 추출 엔진. 생략하면 인스턴스 설정을 따름
+        """
+        engine = engine or self.engine
+        if engine not in ENGINES:
+            raise ValueError(f"지원하지 않는 특징 추출 엔진: {engine}")
+        payload = source_payload(midi_file)
+        if isinstance(payload, (bytes, bytearray)):
+            # 메모리 버퍼는 임시 파일 없이 바로 파싱
+            if engine == 'mido':
+                return NoteTable.from_parsed(self.fast_parser.parse(mido.MidiFile(file=io.BytesIO(payload), clip=True)))
+            return NoteTable.from_score(music21.converter.parseData(bytes(payload), format='midi'))
+        if engine == 'mido':
+            return NoteTable.from_parsed(self.fast_parser.parse(payload))
+        return NoteTable.from_score(music21.converter.parse(payload))
+    
+    def features_from_table(self, table: NoteTable, groups: List[str] = None) -> Dict:
+        """
+        노트 테이블에서 특징 계산
+        
+        Args:
+            table: extract_note_table() 결과
+            groups: 필요한 특징 그룹. 지정하면 LazyFeatures, 생략하면 기본 그룹(extended면 확장 그룹 포함)을 담은 딕셔너리
+        """
+        if groups is not None:
+            return LazyFeatures(groups, lambda name: self._extract_group(table, name))
+        return {name: self._extract_group(table, name) for name in self.groups}
+    
+    def extract_segments(self, midi_file: MIDISource, window_bars: int = DEFAULT_WINDOW_BARS,
+                         hop_bars: int = DEFAULT_HOP_BARS, engine: str = None) -> List[Dict]:
+        """
+        MIDI 파일을 겹치는 마디 구간으로 나눠 구간별 특징 추출 (파일은 한 번만 해석)
+        
+        Args:
+            midi_file: MIDI 파일 경로, MIDI bytes 또는 (이름, bytes)
+            window_bars: 구간 길이 (마디)
+            hop_bars: 다음 구간까지의 간격 (마디)
+            engine: 사용할 추출 엔진. 생략하면 인스턴스 설정을 따름
+        
+        Returns:
+            List[Dict]: [{'bar_start', 'bar_end', 'onset', 'features'}, ...] (소리 나는 음이 없는 구간은 제외)
+        """
+        engine = engine or self.engine
+        segments = (window_bars, hop_bars)
+        try:
+            cache_key, cached = self._cache_lookup(midi_file, engine, segments)
+            if cached is not None:
+                return cached
+            result = self.segments_from_table(self.extract_note_table(midi_file, engine), *segments)
+        except Exception as e:
+            print(f"Error extracting segments from {source_name(midi_file)}: {str(e)}")
+            return []
+        self._cache_store(cache_key, result)
+        return result
+    
+    def segments_from_table(self, table: NoteTable, window_bars: int = DEFAULT_WINDOW_BARS,
+                            hop_bars: int = DEFAULT_HOP_BARS) -> List[Dict]:
+        """노트 테이블을 마디 구간으로 잘라 구간별 특징 계산"""
+        if window_bars < 1 or hop_bars < 1:
+            raise ValueError(f"window_bars와 hop_bars는 1 이상이어야 합니다: {window_bars}, {hop_bars}")
+        segments = []
+        for bar_start, bar_end, start, end in table.bar_windows(window_bars, hop_bars):
+            window = table.window(start, end)
+            if not np.any(window.notes['kind'] != KIND_REST):
+                continue
+            segments.append({
+                'bar_start': bar_start,
+                'bar_end': bar_end,
+                'onset': start,
+                'features': self.features_from_table(window)
+            })
+        return segments
+    
+    def _extract_group(self, table: NoteTable, name: str):
+        """특징 그룹 하나 계산"""
+        if name == 'tempo':
+            return self._extract_tempo(table)
+        if name == 'harmony':
+            return self._extract_harmony(table)
+        if name == 'rhythm':
+            return self._extract_rhythm(table)
+        if name == 'melody':
+            return self._extract_melody(table)
+        if name == 'key_signatures':
+            return list(table.key_signatures)
+        if name == 'time_signatures':
+            return list(table.time_signatures)
+        if name == 'instruments':
+            return list(table.instruments)
+        if name == 'profile':
+            return self._extract_profile(table)
+        if name == 'progression':
+            return run_length_encode(table.chord_masks())
+        raise ValueError(f"알 수 없는 특징 그룹: {name}")
+    
+    def _extract_tempo(self, table: NoteTable):
         """템포 관련 특징 추출"""
-        tempos = []
-        for el in score.getElementsByClass('MetronomeMark'):
-            tempos.append(el.number)
+        tempos = np.asarray(table.tempos, dtype=float)
         
         return {
-            'main_tempo': float(np.mean(tempos)) if tempos else None,
+            'main_tempo': float(tempos.mean()) if len(tempos) else None,
             'tempo_changes': len(tempos)
         }
     
-    def _extract_harmony(self, score):
+    def _extract_harmony(self, table: NoteTable):
         """화성 관련 특징 추출"""
-        try:
-            chords = score.getElementsByClass('Chord')
-            chord_progression = []
-            for chord in chords:
-                chord_progression.append(str(chord.commonName))
-            
-            return {
-                'chord_progression': chord_progression,
-                'unique_chords': len(set(chord_progression))
-            }
-        except:
-            return {'chord_progression': [], 'unique_chords': 0}
-
-    def _extract_rhythm(self, score):
+        lut = get_chord_lut()
+        chord_ids = table.chord_masks()
+        # 음높이 클래스 마스크로 표를 바로 찾고, 배치에 따라 이름이 달라지는 코드만 음 목록으로 계산
+        chord_progression = [lut.names[chord_id] or lut.name(pitches)
+                             for chord_id, pitches in zip(chord_ids, table.chord_pitches())]
+        
+        return {
+            'chord_progression': chord_progression,
+            'unique_chords': len(set(chord_progression))
+        }
+
+    def _extract_rhythm(self, table: NoteTable):
         """리듬 관련 특징 추출"""
-        try:
-            notes = score.notesAndRests
-            durations = [float(note.quarterLength) for note in notes]
-            
-            return {
-                'avg_note_duration': float(np.mean(durations)) if durations else 0,
-                'rhythmic_density': len(notes)
-            }
-        except:
-            return {'avg_note_duration': 0, 'rhythmic_density': 0}
-
-    def _extract_melody(self, score):
+        durations = table.elements['duration']
+        
+        return {
+            'avg_note_duration': float(durations.mean()) if len(durations) else 0,
+            'rhythmic_density': len(durations)
+        }
+
+    def _extract_melody(self, table: NoteTable):
         """멜로디 관련 특징 추출"""
-        try:
-            notes = score.getElementsByClass('Note')
-            if not notes:
-                return {'pitch_range': None, 'avg_pitch': None}
-            
-            pitches = [note.pitch.midi for note in notes]
-            
-            return {
-                'pitch_range': (min(pitches), max(pitches)) if pitches else None,
-                'avg_pitch': float(np.mean(pitches)) if pitches else None
-            }
-        except:
+        pitches = table.notes['pitch'][table.notes['kind'] == KIND_NOTE]
+        if not len(pitches):
             return {'pitch_range': None, 'avg_pitch': None}
+        
+        return {
+            'pitch_range': (int(pitches.min()), int(pitches.max())),
+            'avg_pitch': float(pitches.mean())
+        }
 
-    def _extract_key_signatures(self, score):
-        """조표 추출"""
-        try:
-            key_signatures = []
-            for el in score.getElementsByClass('KeySignature'):
-                key_signatures.append(str(el))
-            return key_signatures
-        except:
-            return []
+    def _extract_profile(self, table: NoteTable):
+        """음높이 클래스/음정 분포와 밀도 (수치 임베딩용, 소수점 4자리)"""
+        notes = table.notes
+        pitched = notes[(notes['kind'] == KIND_NOTE) | (notes['kind'] == KIND_CHORD)]
+        pitch_classes = np.bincount(pitched['pitch'] % 12, weights=pitched['duration'], minlength=12)
+        
+        # 트랙별로 연속한 단음 사이의 음정 (옥타브 이상은 12로 묶음)
+        melody = notes[notes['kind'] == KIND_NOTE]
+        melody = melody[np.lexsort((melody['onset'], melody['track']))]
+        same_track = melody['track'][1:] == melody['track'][:-1]
+        signed_steps = np.clip(np.diff(melody['pitch'].astype(np.int64)), -MAX_INTERVAL_STEP, MAX_INTERVAL_STEP)
+        intervals = np.bincount(np.abs(signed_steps[same_track]), minlength=13).astype(float)
+        
+        elements = table.elements
+        sounding = elements[elements['kind'] != KIND_REST]
+        total_beats = float((elements['onset'] + elements['duration']).max()) if len(elements) else 0.0
+        
+        return {
+            'pitch_class_histogram': self._normalized(pitch_classes),
+            'interval_histogram': self._normalized(intervals),
+            'notes_per_beat': round(len(sounding) / total_beats, 4) if total_beats else 0.0,
+            'total_beats': round(total_beats, 4),
+            'melody_contour': self._melody_contour(pitched),
+            'interval_ngrams': interval_ngram_ids(signed_steps, same_track).tolist()
+        }
 
-    def _extract_time_signatures(self, score):
-        """박자표 추출"""
-        try:
-            time_signatures = []
-            for el in score.getElementsByClass('TimeSignature'):
-                time_signatures.append(f"{el.numerator}/{el.denominator}")
-            return time_signatures
-        except:
+    def _melody_contour(self, pitched):
+        """시작 위치별 최고음(스카이라인)을 CONTOUR_LENGTH개로 다시 샘플링한 선율 윤곽"""
+        if not len(pitched):
             return []
+        order = np.lexsort((-pitched['pitch'], pitched['onset']))
+        onsets = pitched['onset'][order]
+        first = np.r_[True, onsets[1:] != onsets[:-1]]
+        skyline = pitched['pitch'][order][first]
+        samples = np.linspace(0, len(skyline) - 1, CONTOUR_LENGTH).round().astype(np.int64)
+        return skyline[samples].astype(int).tolist()
 
-    def _extract_instruments(self, score):
-        """사용된 악기 추출"""  
-        try:
-            instruments = []
-            for el in score.getElementsByClass('Instrument'):
-                instruments.append(str(el.instrumentName))
-            return instruments
-        except:
-            return []
\ No newline at end of file
+    def _normalized(self, histogram):
+        total = histogram.sum()
+        if not total:
+            return [0.0] * len(histogram)
+        return [round(float(value), 4) for value in histogram / total]
@@ -1,176 +1,524 @@
-from typing import List
+from typing import Iterator, List
 import os
-import json
-from midi_feature_extractor import MIDIFeatureExtractor
+import time
+import hashlib
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from midi_feature_extractor import MIDIFeatureExtractor, prompt_features
 from midi_vectorizer import MIDIVectorizer
 from llm_api import LLMAPI
+from metadata_filter import AttributeIndex, filtered_search
+from midi_sources import iter_midi_sources, source_name
+from musical_rerank import rerank as musical_rerank, DEFAULT_RERANK_CANDIDATES
+from motif_index import DEFAULT_MOTIF_LENGTH
+from index_registry import IndexRegistry, DEFAULT_MEMORY_BUDGET
+from vector_backends import ChromaVectorStore, faiss_batch_search
+from generation_result import GenerationResult, GenerationStream, STREAM_OUTPUTS
+
+# generate_many: 동시에 진행할 LLM 호출 수 / 한 번의 벡터 검색으로 묶는 최대 질의 수
+DEFAULT_LLM_CONCURRENCY = 4
+DEFAULT_SEARCH_BATCH = 32
+_DONE = object()
+
+def _doc_ids(docs):
+    # 응답 캐시 키용 검색 문서 ID: 저장소를 새로 만들 때마다 바뀌는 docstore uuid 대신 원본 경로 + 문서 내용 해시
+    return [f"{doc.metadata.get('filename', '')}:{hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()[:16]}"
+            for doc in docs]
+
 
 class MIDIRAGSystem:
-    def __init__(self):
-        self.vectorizer = MIDIVectorizer()
-        self.llm_api = LLMAPI()
-        self.feature_extractor = MIDIFeatureExtractor()
+    def __init__(self, index_type: str = 'flat', index_params: dict = None,
+                 segment_bars: int = None, hop_bars: int = None,
+                 motif_length: int = DEFAULT_MOTIF_LENGTH, motif_rhythm: bool = False,
+                 dedup_threshold: float = None, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 backend: str = 'faiss', cache_responses: bool = False):
+        """
+        Args:
+            index_type: 벡터 저장소 FAISS 색인 종류 ('flat', 'ivf_flat', 'hnsw', 'ivf_pq', 'pq')
+            index_params: 색인 파라미터 (생략하면 ann_index.DEFAULT_INDEX_PARAMS)
+                          예: {'storage': 'int8'}로 벡터를 1/4 크기로 양자화해 저장
+            segment_bars: 지정하면 학습 파일을 이 길이(마디)의 겹치는 구간으로 나눠 구간 단위로 검색
+            hop_bars: 구간 사이 간격 (마디, 생략하면 segment_bars의 절반)
+            motif_length: 학습 때 함께 만드는 모티프 역색인의 n-gram 음 수 (None이면 만들지 않음)
+            motif_rhythm: True면 모티프 검색에서 리듬(음 간격 비율)까지 일치해야 함
+            dedup_threshold: 지정하면 학습 때 선율 MinHash 유사도가 이 값 이상인 재출력/조옮김 파일은 대표 하나만 색인
+                             (기본값 None은 모두 색인, 권장값은 near_duplicates.DEFAULT_THRESHOLD,
+                             제외 목록은 vectorizer.dedup_index.duplicates())
+            memory_budget: register_corpus()로 등록한 코퍼스 저장소를 동시에 메모리에 둘 크기 상한 (바이트)
+            backend: 벡터 저장소 백엔드 ('faiss' 또는 디스크에 바로 저장되고 로드 없이 검색하는 'chroma')
+            cache_responses: True면 같은 입력 특징/검색 문서/프롬프트/모델의 LLM 응답을 디스크 캐시에서 재사용
+                             (UI 재렌더링/재시도용, 새 결과가 필요하면 generate(fresh=True))
+        """
+        vectorizer_options = dict(index_type=index_type, index_params=index_params,
+                                  segment_bars=segment_bars, hop_bars=hop_bars,
+                                  motif_length=motif_length, motif_rhythm=motif_rhythm,
+                                  dedup_threshold=dedup_threshold, backend=backend)
+        self.vectorizer = MIDIVectorizer(**vectorizer_options)
+        # 코퍼스 이름 -> 저장된 저장소 (처음 사용할 때 로드, 예산을 넘으면 LRU로 내림)
+        self.registry = IndexRegistry(lambda: MIDIVectorizer(**vectorizer_options), memory_budget=memory_budget)
+        self.llm_api = LLMAPI(use_cache=cache_responses)
+        # 질의 특징도 색인과 같은 확장 그룹을 포함해야 수치 임베딩/재정렬이 맞음
+        self.feature_extractor = MIDIFeatureExtractor(extended=True)
         self.vectorstore = None
+        self.attribute_index = None  # 필터 검색용 보조 색인 (첫 필터 검색 때 생성)
+        self._search_pool = None  # asearch()의 검색 전용 스레드
         
-    def train(self, midi_files: List[str], save_path: str = None):
+    def train(self, midi_files, save_path: str = None, workers: int = None, incremental: bool = True):
         """
         MIDI 파일들로 RAG 시스템 학습 및 벡터 저장소 저장
         
         Args:
-            midi_files: 학습에 사용할 MIDI 파일 경로 목록
+            midi_files: 학습에 사용할 MIDI 파일/zip·tar 압축 파일/디렉토리 경로 목록,
+                        또는 (이름, bytes) 메모리 버퍼의 iterable
             save_path: 벡터 저장소를 저장할 경로 (선택적)
+            workers: 특징 추출 워커 프로세스 수 (생략하면 CPU 수)
+            incremental: save_path에 저장된 색인이 있으면 바뀐 파일만 다시 색인 (False면 전체 재생성)
         """
-        print(f"벡터 저장소 생성 중... (파일 {len(midi_files)}개)")
-        self.vectorstore = self.vectorizer.vectorize_midi(midi_files)
-        
-        # 벡터 저장소 저장
         if save_path:
-            self.vectorizer.save_vectorstore(self.vectorstore, save_path)
-            print(f"벡터 저장소가 {save_path}에 저장되었습니다.")
+            # 코퍼스 목록과 비교해 추가/변경/삭제된 파일만 반영하고 목록과 함께 저장
+            self.attribute_index = None
+            self.vectorstore = self.vectorizer.update_vectorstore(
+                midi_files, save_path, workers=workers, rebuild=not incremental)
+            return
+        
+        if hasattr(midi_files, '__len__'):
+            print(f"벡터 저장소 생성 중... (입력 {len(midi_files)}개)")
+        else:
+            print("벡터 저장소 생성 중... (스트리밍 입력)")
+        self.attribute_index = None
+        self.vectorstore = self.vectorizer.vectorize_midi(midi_files, workers=workers)
     
-    def load_vectorstore(self, load_path: str):
+    def load_vectorstore(self, load_path: str, allow_dangerous_deserialization: bool = False):
         """
         저장된 벡터 저장소 로드
         
         Args:
             load_path: 벡터 저장소가 저장된 경로
+            allow_dangerous_deserialization: True면 pickle(index.pkl)로 저장된 이전 형식 저장소도 로드
+                                             (직접 만든 저장소에만 사용)
         
         Returns:
             bool: 로드 성공 여부
         """
-        self.vectorstore = self.vectorizer.load_vectorstore(load_path)
+        self.attribute_index = None
+        self.vectorstore = self.vectorizer.load_vectorstore(
+            load_path, allow_dangerous_deserialization=allow_dangerous_deserialization)
         return self.vectorstore is not None
     
-    def generate(self, input_midi: str, output_format='json'):
+    def register_corpus(self, name: str, path: str):
+        """
+        저장된 벡터 저장소를 코퍼스 이름으로 등록 (search/generate/find_motif의 corpus=name으로 사용)
+        저장소는 처음 사용할 때 로드됨
+        """
+        self.registry.register(name, path)
+    
+    def register_corpora(self, root_dir: str) -> List[str]:
+        """root_dir 아래 저장소 디렉토리마다 디렉토리 이름으로 코퍼스를 등록하고 이름 목록 반환"""
+        return self.registry.register_directory(root_dir)
+    
+    def _store(self, corpus: str = None):
+        # corpus가 없으면 train()/load_vectorstore()로 준비한 기본 저장소 (self도 vectorstore/attribute_index를 가짐)
+        return self if corpus is None else self.registry.get(corpus)
+    
+    def search(self, input_features: dict, k: int = 3, filters: dict = None, rerank: bool = True,
+               fetch_k: int = DEFAULT_RERANK_CANDIDATES, corpus: str = None):
+        """
+        입력 특징과 비슷한 학습 MIDI 문서 검색
+        
+        Args:
+            input_features: extract_features 결과
+            k: 찾을 문서 수
+            filters: 벡터 검색 전에 후보를 줄이는 조건 (metadata_filter 참고)
+                     예: {'main_tempo': (100, 140), 'time_signature': '4/4', 'instrument': ['Piano', 'Guitar']}
+            rerank: True면 벡터 검색으로 fetch_k개를 가져와 음높이 클래스 분포/음정 n-gram/선율 윤곽
+                    유사도로 다시 정렬한 뒤 상위 k개 반환 (musical_rerank 참고)
+            fetch_k: 재정렬할 후보 수
+            corpus: register_corpus()로 등록한 코퍼스 이름 (생략하면 기본 저장소)
+        """
+        store = self._store(corpus)
+        embedding = store.vectorstore.embedding_function.embed_query(str(input_features))
+        return self._search_embeddings(store, [input_features], [embedding], k, filters, rerank, fetch_k)[0]
+    
+    async def asearch(self, input_features: dict, k: int = 3, filters: dict = None, rerank: bool = True,
+                      fetch_k: int = DEFAULT_RERANK_CANDIDATES, corpus: str = None):
+        """
+        search()의 코루틴 버전
+        질의 임베딩은 비동기 호출로 기다리고, 색인 검색/재정렬은 검색 전용 스레드 하나에서 차례로 실행
+        (지연 로드한 저장소의 SQLite 연결을 여러 스레드가 동시에 쓰지 않도록)
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._search_executor()
+        store = self if corpus is None else await loop.run_in_executor(executor, self._store, corpus)
+        embedding = await store.vectorstore.embedding_function.aembed_query(str(input_features))
+        found = await loop.run_in_executor(executor, self._search_embeddings, store, [input_features], [embedding],
+                                           k, filters, rerank, fetch_k)
+        return found[0]
+    
+    def search_many(self, input_features_list: List[dict], k: int = 3, filters: dict = None, rerank: bool = True,
+                    fetch_k: int = DEFAULT_RERANK_CANDIDATES, corpus: str = None) -> List[List]:
+        """
+        여러 입력 특징을 한 번에 검색해 입력별 문서 목록 반환 (search()와 같은 인자)
+        질의 임베딩을 묶어 계산하고 색인 검색도 한 번에 수행
+        (FAISS에서 필터를 쓰면 후보 마스크는 한 번만 만들고 질의마다 후보 안에서 검색)
+        """
+        store = self._store(corpus)
+        embeddings = store.vectorstore.embedding_function.embed_documents([str(f) for f in input_features_list])
+        return self._search_embeddings(store, input_features_list, embeddings, k, filters, rerank, fetch_k)
+    
+    def _search_embeddings(self, store, input_features_list: List[dict], embeddings: List[List[float]], k: int,
+                           filters: dict, rerank: bool, fetch_k: int) -> List[List]:
+        """질의 임베딩들로 저장소를 한 번에 검색하고 입력 특징으로 재정렬"""
+        candidates = max(k, fetch_k) if rerank else k
+        if isinstance(store.vectorstore, ChromaVectorStore):
+            # Chroma는 필터 조건을 where 절로 바꿔 컬렉션 검색에서 바로 거름
+            found = store.vectorstore.batch_search_by_vector(embeddings, candidates, filters)
+        else:
+            if filters and store.attribute_index is None:
+                store.attribute_index = AttributeIndex.from_vectorstore(store.vectorstore)
+            mask = store.attribute_index.candidates(filters) if filters else None
+            if mask is None:
+                found = faiss_batch_search(store.vectorstore, embeddings, candidates)
+            else:
+                found = [filtered_search(store.vectorstore, embedding, candidates, mask) for embedding in embeddings]
+        
+        results = [[doc for doc, _ in hits] for hits in found]
+        if rerank:
+            results = [musical_rerank(features, docs, k) for features, docs in zip(input_features_list, results)]
+        return results
+    
+    def find_motif(self, motif, k: int = 10, min_coverage: float = 0.0, corpus: str = None):
+        """
+        모티프가 들어 있는 학습 MIDI 구간 검색 (조옮김 무관, motif_rhythm이면 리듬 윤곽도 비교)
+        
+        Args:
+            motif: MIDI 음높이 목록, (음높이 목록, 시작 위치 목록) 또는 MIDI 파일 경로/(이름, bytes)
+                   MIDI 파일이면 음이 가장 많은 트랙의 선율선(최고음)을 모티프로 사용
+            k: 찾을 구간 수
+            min_coverage: 질의 n-gram 중 이 비율 이상 일치한 구간만 반환
+            corpus: register_corpus()로 등록한 코퍼스 이름 (생략하면 기본 저장소)
+        
+        Returns:
+            List[Dict]: [{'filename', 'onset', 'end', 'coverage', 'matched'}, ...] (coverage 내림차순)
+        """
+        motif_index = self.vectorizer.motif_index if corpus is None else self.registry.get(corpus).motif_index
+        if motif_index is None or not len(motif_index):
+            raise ValueError("모티프 색인이 없습니다. motif_length를 지정해 train()을 호출하거나 저장소를 로드하세요.")
+        
+        onsets = None
+        if isinstance(motif, str) or (isinstance(motif, tuple) and isinstance(motif[0], str)):
+            pitches, onsets, track_start = self.feature_extractor.extract_note_table(motif).melody_line()
+            tracks = np.cumsum(track_start)
+            if len(tracks):
+                longest = tracks == np.bincount(tracks).argmax()
+                pitches, onsets = pitches[longest], onsets[longest]
+        elif isinstance(motif, tuple):
+            pitches, onsets = motif
+        else:
+            pitches = motif
+        return motif_index.search(pitches, onsets, k=k, min_coverage=min_coverage)
+    
+    def generate(self, input_midi: str, output_format: str = None, filters: dict = None, rerank: bool = True,
+                 corpus: str = None, fresh: bool = False):
         """
-        입력 MIDI에 어울리는 새로운 MIDI 생성
+        입력 MIDI에 어울리는 새로운 MIDI 생성 (특징 추출, 검색, LLM 호출을 한 번만 수행)
         
         Args:
             input_midi (str): 입력 MIDI 파일 경로
-            output_format (str): 출력 형식 ('json' 또는 'midi')
+            output_format (str): 생략하면 GenerationResult, 'json'/'midi'면 해당 렌더링만 반환 (이전 방식)
+            filters: 유사 MIDI 검색 조건 (템포 범위, 박자, 조표, 악기, 음역; search() 참고)
+            rerank: 벡터 검색 후보를 음악적 유사도로 다시 정렬할지 여부
+            corpus: 검색할 코퍼스 이름 (register_corpus()로 등록, 생략하면 기본 저장소)
+            fresh: True면 같은 입력/검색 결과로 캐시된 LLM 응답이 있어도 새로 생성 (LLMAPI 응답 캐시 참고)
             
         Returns:
-            str 또는 bytes: 'json' 형식이면 JSON 문자열, 'midi' 형식이면 MIDI 파일 바이트
+            GenerationResult: 음표 데이터, 유사 문서, 단계별 소요 시간 (result.json / result.midi는 요청할 때 변환)
+        """
+        if output_format not in (None, 'json', 'midi'):
+            raise ValueError(f"지원하지 않는 출력 형식: {output_format}")
+        timings = {}
+        start = time.perf_counter()
+        input_features, similar_docs = self._retrieve(input_midi, filters, rerank, corpus, timings)
+        similar_features = [doc.page_content for doc in similar_docs]
+        
+        # 새로운 MIDI 생성 (JSON 형식)
+        step = time.perf_counter()
+        json_response = self.llm_api.generate_response(
+            prompt_features(input_features),
+            "\n".join(similar_features),
+            doc_ids=_doc_ids(similar_docs),
+            fresh=fresh
+        )
+        timings['llm'] = time.perf_counter() - step
+        timings['total'] = time.perf_counter() - start
+        result = GenerationResult(json_response, input_features, similar_docs, timings)
+        
+        if output_format == 'json':
+            return result.json
+        if output_format == 'midi':
+            try:
+                return result.midi
+            except Exception as e:
+                print(f"MIDI 변환 중 오류 발생: {str(e)}")
+                return result.json  # 오류 발생 시 JSON 반환
+        return result
+    
+    def generate_stream(self, input_midi, output: str = 'notes', filters: dict = None, rerank: bool = True,
+                        corpus: str = None, fresh: bool = False) -> GenerationStream:
+        """
+        generate()의 스트리밍 버전: LLM 응답 전체를 기다리지 않고 음표 객체가 닫히는 대로 반환
+        특징 추출과 검색은 호출할 때 끝내고, LLM 요청은 반환된 스트림을 읽기 시작할 때 보냅니다.
+        
+        Args:
+            input_midi: 입력 MIDI 파일 경로, MIDI bytes 또는 (이름, bytes)
+            output: 'notes'면 검증한 음표 딕셔너리, 'midi'면 mido 메시지 (GenerationStream 참고)
+            filters, rerank, corpus, fresh: generate()와 같음 (캐시된 응답은 한 번에 모두 반환)
+        
+        Returns:
+            GenerationStream: for로 읽고, 다 읽은 뒤 stream.result (GenerationResult, timings에 first_note 포함)
         """
+        if output not in STREAM_OUTPUTS:
+            raise ValueError(f"지원하지 않는 스트리밍 출력: {output}")
+        timings = {}
+        start = time.perf_counter()
+        input_features, similar_docs = self._retrieve(input_midi, filters, rerank, corpus, timings)
+        chunks, finish = self.llm_api.stream_response(prompt_features(input_features),
+                                                      "\n".join(doc.page_content for doc in similar_docs),
+                                                      doc_ids=_doc_ids(similar_docs), fresh=fresh)
+        return GenerationStream(chunks, finish, input_features, similar_docs, timings, start,
+                                output=output, source=source_name(input_midi))
+    
+    def _retrieve(self, input_midi, filters: dict, rerank: bool, corpus: str, timings: dict):
+        """generate 공통 단계: 입력 특징 추출과 유사 문서 검색 (소요 시간은 timings에 기록)"""
         # 벡터 저장소가 없는 경우 오류
-        if not self.vectorstore:
+        if corpus is None and not self.vectorstore:
             raise ValueError("벡터 저장소가 없습니다. train() 메소드를 호출하거나 load_vectorstore()로 저장소를 로드하세요.")
         
+        step = time.perf_counter()
         # 입력 MIDI 특징 추출
         input_features = self.feature_extractor.extract_features(input_midi)
+        timings['features'] = time.perf_counter() - step
         
         # 유사한 MIDI 찾기
-        similar_docs = self.vectorstore.similarity_search(str(input_features), k=3)
-        similar_features = [doc.page_content for doc in similar_docs]
+        step = time.perf_counter()
+        similar_docs = self.search(input_features, k=3, filters=filters, rerank=rerank, corpus=corpus)
+        timings['search'] = time.perf_counter() - step
         
         # 유사한 MIDI 파일 이름 출력
+        self._print_similar(similar_docs)
+        return input_features, similar_docs
+    
+    async def agenerate(self, input_midi, filters: dict = None, rerank: bool = True, corpus: str = None,
+                        executor=None, fresh: bool = False) -> GenerationResult:
+        """
+        generate()의 코루틴 버전 (한 이벤트 루프에서 여러 생성을 동시에 진행)
+        특징 추출은 프로세스 풀에서, 질의 임베딩과 LLM 호출은 비동기 호출로 기다리므로
+        LLM 응답을 기다리는 동안 스레드를 차지하지 않습니다. 태스크를 취소하면 진행 중인 LLM 요청도 끊습니다.
+        
+        Args:
+            input_midi: 입력 MIDI 파일 경로, MIDI bytes 또는 (이름, bytes)
+            filters, rerank, corpus, fresh: generate()와 같음
+            executor: 특징 추출에 쓸 풀 (생략하면 feature_extractor가 처음 호출할 때 만든 프로세스 풀)
+        """
+        timings = {}
+        start = time.perf_counter()
+        input_features, similar_docs = await self._aretrieve(input_midi, filters, rerank, corpus, executor, timings)
+        
+        step = time.perf_counter()
+        json_response = await self.llm_api.agenerate_response(
+            prompt_features(input_features),
+            "\n".join(doc.page_content for doc in similar_docs),
+            doc_ids=_doc_ids(similar_docs),
+            fresh=fresh
+        )
+        timings['llm'] = time.perf_counter() - step
+        timings['total'] = time.perf_counter() - start
+        return GenerationResult(json_response, input_features, similar_docs, timings,
+                                source=source_name(input_midi))
+    
+    async def agenerate_stream(self, input_midi, output: str = 'notes', filters: dict = None, rerank: bool = True,
+                               corpus: str = None, executor=None, fresh: bool = False) -> GenerationStream:
+        """generate_stream()의 코루틴 버전: 특징 추출/검색을 기다린 뒤 async for로 읽는 스트림 반환"""
+        if output not in STREAM_OUTPUTS:
+            raise ValueError(f"지원하지 않는 스트리밍 출력: {output}")
+        timings = {}
+        start = time.perf_counter()
+        input_features, similar_docs = await self._aretrieve(input_midi, filters, rerank, corpus, executor, timings)
+        chunks, finish = self.llm_api.astream_response(prompt_features(input_features),
+                                                       "\n".join(doc.page_content for doc in similar_docs),
+                                                       doc_ids=_doc_ids(similar_docs), fresh=fresh)
+        return GenerationStream(chunks, finish, input_features, similar_docs, timings, start,
+                                output=output, source=source_name(input_midi))
+    
+    async def _aretrieve(self, input_midi, filters: dict, rerank: bool, corpus: str, executor, timings: dict):
+        """_retrieve()의 코루틴 버전 (특징 추출은 executor, 생략하면 처음 호출할 때 만든 프로세스 풀에서)"""
+        if corpus is None and not self.vectorstore:
+            raise ValueError("벡터 저장소가 없습니다. train() 메소드를 호출하거나 load_vectorstore()로 저장소를 로드하세요.")
+        step = time.perf_counter()
+        input_features = await self.feature_extractor.aextract_features(input_midi, executor=executor)
+        timings['features'] = time.perf_counter() - step
+        
+        step = time.perf_counter()
+        similar_docs = await self.asearch(input_features, k=3, filters=filters, rerank=rerank, corpus=corpus)
+        timings['search'] = time.perf_counter() - step
+        self._print_similar(similar_docs)
+        return input_features, similar_docs
+    
+    def _search_executor(self) -> ThreadPoolExecutor:
+        if self._search_pool is None:
+            self._search_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="midi-rag-search")
+        return self._search_pool
+    
+    def close(self):
+        """agenerate()/asearch()가 만든 프로세스/스레드 풀 종료"""
+        self.feature_extractor.close()
+        if self._search_pool is not None:
+            self._search_pool.shutdown(wait=True, cancel_futures=True)
+        self._search_pool = None
+    
+    def _print_similar(self, similar_docs):
         print("유사한 MIDI 파일:")
         for i, doc in enumerate(similar_docs):
-            print(f"  {i+1}. {doc.metadata.get('filename', 'Unknown')}")
+            location = ""
+            if 'bar_start' in doc.metadata:
+                location = f" ({doc.metadata['bar_start'] + 1}~{doc.metadata['bar_end']}마디)"
+            print(f"  {i+1}. {doc.metadata.get('filename', 'Unknown')}{location}")
+
+    def generate_many(self, inputs, filters: dict = None, rerank: bool = True, corpus: str = None,
+                      workers: int = None, max_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+                      search_batch: int = DEFAULT_SEARCH_BATCH, fresh: bool = False) -> Iterator[GenerationResult]:
+        """
+        여러 입력 MIDI를 파이프라인으로 생성해 끝난 순서대로 반환
+        특징 추출(프로세스 풀), 묶음 벡터 검색, LLM 호출(동시 max_concurrency개)이 동시에 진행되므로
+        전체 처리량은 세 단계의 합이 아니라 가장 느린 단계에 맞춰집니다.
         
-        # 새로운 MIDI 생성 (JSON 형식)
-        json_response = self.llm_api.generate_response(
-            str(input_features),
-            "\n".join(similar_features)
-        )
+        Args:
+            inputs: train()과 같은 입력 (MIDI 파일/압축 파일/디렉토리 경로 목록 또는 (이름, bytes) iterable)
+            filters, rerank, corpus, fresh: generate()와 같음
+            workers: 특징 추출 워커 프로세스 수 (생략하면 CPU 수)
+            max_concurrency: 동시에 진행할 LLM 호출 수
+            search_batch: 한 번의 벡터 검색으로 묶는 최대 질의 수
+                          (쉬고 있는 LLM 호출 자리가 있으면 다 모이기를 기다리지 않고 바로 검색)
         
-        if output_format == 'json':
-            return json_response
-        elif output_format == 'midi':
-            # JSON을 MIDI로 변환
-            from mido import MidiFile, MidiTrack, Message, MetaMessage
-            
+        Yields:
+            GenerationResult: source/index로 입력을 구분, 실패한 입력은 ok=False이고 error에 메시지
+                              timings: features (추출), search (묶음 검색), llm, total (시작부터 완료까지)
+        """
+        if max_concurrency < 1 or search_batch < 1:
+            raise ValueError(f"max_concurrency와 search_batch는 1 이상이어야 합니다: {max_concurrency}, {search_batch}")
+        if corpus is None and not self.vectorstore:
+            raise ValueError("벡터 저장소가 없습니다. train() 메소드를 호출하거나 load_vectorstore()로 저장소를 로드하세요.")
+        self._store(corpus)  # 없는 코퍼스는 추출을 시작하기 전에 알림
+        
+        start = time.perf_counter()
+        results = queue.Queue()
+        stop = threading.Event()
+        # 검색을 마치고 LLM을 기다리는 입력이 쌓이지 않도록 제한 (자리가 없으면 추출도 멈춤)
+        slots = threading.Semaphore(max_concurrency + search_batch)
+        llm_pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        lock = threading.Lock()
+        active = [0]  # 제출했지만 끝나지 않은 LLM 호출 수
+        
+        def run_llm(record, docs, search_seconds):
+            step = time.perf_counter()
+            response, error = None, None
             try:
-                # JSON 파싱
-                data = json.loads(json_response)
-                
-                # MIDI 파일 생성
-                mid = MidiFile()
-                
-                # 템포 트랙 추가
-                tempo_track = MidiTrack()
-                mid.tracks.append(tempo_track)
-                
-                # 템포 설정 (120 BPM)
-                tempo_track.append(MetaMessage('set_tempo', tempo=500000, time=0))
-                
-                # 타임 시그니처 설정
-                time_signatures = data.get('time_signatures', ['4/4'])
-                if time_signatures and len(time_signatures) > 0:
-                    time_sig = time_signatures[0].split('/')
-                    if len(time_sig) == 2:
-                        numerator, denominator = int(time_sig[0]), int(time_sig[1])
-                        tempo_track.append(MetaMessage('time_signature', 
-                                                      numerator=numerator, 
-                                                      denominator=denominator,
-                                                      clocks_per_click=24,
-                                                      notated_32nd_notes_per_beat=8,
-                                                      time=0))
-                
-                # 키 시그니처 설정 (있는 경우)
-                key_signatures = data.get('key_signatures', [])
-                if key_signatures and len(key_signatures) > 0:
-                    tempo_track.append(MetaMessage('key_signature', key=key_signatures[0], time=0))
-                
-                # 트랙 추가
-                for track_data in data.get('tracks', []):
-                    track = MidiTrack()
-                    mid.tracks.append(track)
-                    
-                    # 악기 설정
-                    instrument = track_data.get('instrument', 0)
-                    track.append(Message('program_change', program=instrument, time=0))
-                    
-                    # 노트 추가
-                    notes = track_data.get('notes', [])
-                    notes.sort(key=lambda x: x.get('time', 0))  # 시간 순으로 정렬
-                    
-                    def seconds_to_ticks(seconds):
-                        """초 단위 시간을 MIDI 틱으로 변환"""
-                        # 기본값: 480 ticks per quarter note, 120 BPM (500000 microseconds per beat)
-                        return int(seconds * 480 * 120 / 60)
-                    
-                    last_time = 0
-                    for note in notes:
-                        pitch = note.get('pitch', 60)  # 기본값: 중간 C
-                        time_seconds = note.get('time', 0)
-                        duration_seconds = note.get('duration', 1)
-                        velocity = note.get('velocity', 64)
-                        
-                        # 시간을 틱으로 변환
-                        time_ticks = seconds_to_ticks(time_seconds)
-                        duration_ticks = seconds_to_ticks(duration_seconds)
-                        
-                        # 이전 이벤트로부터의 상대적 시간
-                        delta_ticks = time_ticks - last_time
-                        
-                        # 노트 온
-                        track.append(Message('note_on', note=pitch, velocity=velocity, time=max(0, delta_ticks)))
-                        
-                        # 노트 오프 (노트 온 후에 duration_ticks 시간 후)
-                        track.append(Message('note_off', note=pitch, velocity=0, time=duration_ticks))
-                        
-                        # 마지막 이벤트 시간 업데이트
-                        last_time = time_ticks + duration_ticks
-                
-                # 메모리에 MIDI 파일 생성
-                import io
-                buffer = io.BytesIO()
-                mid.save(file=buffer)
-                buffer.seek(0)
-                return buffer.read()
-                
+                response = self.llm_api.generate_response(prompt_features(record['features']),
+                                                          "\n".join(doc.page_content for doc in docs),
+                                                          doc_ids=_doc_ids(docs), fresh=fresh)
             except Exception as e:
-                print(f"MIDI 변환 중 오류 발생: {str(e)}")
-                return json_response  # 오류 발생 시 JSON 반환
-        else:
-            raise ValueError(f"지원하지 않는 출력 형식: {output_format}")
-
+                error = f"{type(e).__name__}: {str(e)}"
+            timings = {'features': record['elapsed'], 'search': search_seconds,
+                       'llm': time.perf_counter() - step, 'total': time.perf_counter() - start}
+            results.put(GenerationResult(response, record['features'], docs, timings,
+                                         source=record['file'], index=record['index'], error=error))
+            with lock:
+                active[0] -= 1
+            slots.release()
+        
+        def flush(batch):
+            step = time.perf_counter()
+            found = self.search_many([record['features'] for record in batch], k=3, filters=filters,
+                                     rerank=rerank, corpus=corpus)
+            seconds = time.perf_counter() - step
+            for record, docs in zip(batch, found):
+                with lock:
+                    active[0] += 1
+                llm_pool.submit(run_llm, record, docs, seconds)
+        
+        def produce():
+            records = self.feature_extractor.extract_features_batch(iter_midi_sources(inputs), workers=workers)
+            batch = []
+            try:
+                for record in records:
+                    if stop.is_set():
+                        break
+                    if not record['ok']:
+                        results.put(GenerationResult(
+                            None, None, [], {'features': record['elapsed'], 'total': time.perf_counter() - start},
+                            source=record['file'], index=record['index'],
+                            error=f"{record['error_type']}: {record['error']}"))
+                        continue
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    batch.append(record)
+                    with lock:
+                        idle = active[0] < max_concurrency
+                    if len(batch) >= search_batch or idle:
+                        flush(batch)
+                        batch = []
+                if batch and not stop.is_set():
+                    flush(batch)
+            except Exception as e:
+                results.put(e)
+            finally:
+                records.close()
+                llm_pool.shutdown(wait=True, cancel_futures=stop.is_set())
+                results.put(_DONE)
+        
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        succeeded = failed = 0
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if item.ok:
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield item
+            print(f"일괄 생성: 성공 {succeeded}개, 실패 {failed}개, {time.perf_counter() - start:.2f}초")
+        finally:
+            # 호출하는 쪽이 중간에 멈추면 남은 추출/LLM 호출을 취소
+            stop.set()
+            producer.join()
+    
     def save_midi(self, midi_data, output_path):
-        """생성된 MIDI 데이터를 파일로 저장"""
+        """
+        생성된 MIDI 데이터를 파일로 저장
+        midi_data가 GenerationResult면 확장자가 .mid/.midi일 때 MIDI 바이트, 그 외에는 JSON 문자열을 저장
+        """
         # 출력 디렉토리 확인
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
+        if isinstance(midi_data, GenerationResult):
+            if output_path.lower().endswith(('.mid', '.midi')):
+                try:
+                    midi_data = midi_data.midi
+                except Exception as e:
+                    # 이전 generate(output_format='midi')처럼 변환에 실패하면 JSON(또는 원본 응답)을 저장
+                    print(f"MIDI 변환 중 오류 발생: {str(e)} (JSON으로 대신 저장합니다: {output_path})")
+                    midi_data = midi_data.json
+            else:
+                midi_data = midi_data.json
+        
         if isinstance(midi_data, str):
             # JSON 형식인 경우
             with open(output_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,101 @@
+# midi_sources.py
+import os
+import glob
+import tarfile
+import zipfile
+from typing import Iterator, Tuple, Union
+
+# MIDI 소스: 파일 경로(str), 메모리 버퍼 (이름, bytes) 또는 bytes
+MIDISource = Union[str, Tuple[str, bytes], bytes]
+
+MIDI_SUFFIXES = ('.mid', '.midi')
+ZIP_SUFFIXES = ('.zip',)
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+# 압축 파일 안의 MIDI 하나가 이보다 크면 건너뜀 (메모리 사용량 제한)
+MAX_MEMBER_BYTES = 64 * 1024 * 1024
+ARCHIVE_SEPARATOR = "::"
+
+
+def is_midi_name(name: str) -> bool:
+    return name.lower().endswith(MIDI_SUFFIXES)
+
+
+def is_archive(path: str) -> bool:
+    lowered = path.lower()
+    return lowered.endswith(ZIP_SUFFIXES) or lowered.endswith(TAR_SUFFIXES)
+
+
+def source_name(source: MIDISource) -> str:
+    """소스 표시 이름 (경로, 또는 '압축파일::멤버' 형식 이름)"""
+    if isinstance(source, tuple):
+        return source[0]
+    if isinstance(source, (bytes, bytearray)):
+        return "<memory>"
+    return source
+
+
+def source_payload(source: MIDISource):
+    """파서에 넘길 값 (경로 문자열 또는 MIDI bytes)"""
+    if isinstance(source, tuple):
+        return source[1]
+    return source
+
+
+def iter_archive(path: str, max_member_bytes: int = MAX_MEMBER_BYTES) -> Iterator[Tuple[str, bytes]]:
+    """
+    zip/tar 압축 파일의 MIDI 멤버를 하나씩 (이름, bytes)로 반환
+    압축을 디스크에 풀지 않으며, 한 번에 멤버 하나만 메모리에 올립니다.
+    """
+    if path.lower().endswith(ZIP_SUFFIXES):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_midi_name(info.filename):
+                    continue
+                if info.file_size > max_member_bytes:
+                    print(f"Skipping {path}{ARCHIVE_SEPARATOR}{info.filename}: {info.file_size} bytes")
+                    continue
+                yield f"{path}{ARCHIVE_SEPARATOR}{info.filename}", archive.read(info)
+        return
+
+    # 'r|*' 스트림 모드: 앞에서부터 한 번만 읽으므로 압축 tar도 전체를 메모리에 올리지 않음
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or not is_midi_name(member.name):
+                continue
+            if member.size > max_member_bytes:
+                print(f"Skipping {path}{ARCHIVE_SEPARATOR}{member.name}: {member.size} bytes")
+                continue
+            f = archive.extractfile(member)
+            if f is not None:
+                yield f"{path}{ARCHIVE_SEPARATOR}{member.name}", f.read()
+
+
+def iter_midi_sources(sources) -> Iterator[MIDISource]:
+    """
+    학습 입력을 MIDI 소스 스트림으로 펼침
+
+    Args:
+        sources: 경로 하나 또는 아래 항목들의 iterable
+                 - MIDI 파일 경로
+                 - zip/tar 압축 파일 경로 (MIDI 멤버를 스트리밍)
+                 - 디렉토리 경로 (바로 아래의 MIDI/압축 파일)
+                 - (이름, bytes) 또는 bytes 메모리 버퍼
+    """
+    if isinstance(sources, (str, bytes, tuple)):
+        sources = [sources]
+    for index, source in enumerate(sources):
+        if isinstance(source, (bytes, bytearray)):
+            yield (f"<memory:{index}>", bytes(source))
+        elif isinstance(source, tuple):
+            yield source
+        elif os.path.isdir(source):
+            for path in sorted(glob.glob(os.path.join(source, "*"))):
+                if is_archive(path):
+                    yield from iter_archive(path)
+                elif is_midi_name(path):
+                    yield path
+        elif is_archive(source):
+            yield from iter_archive(source)
+        else:
+            yield source
+
@@ -1,21 +1,88 @@
 # midi_vectorizer.py
 from typing import List, Dict
 import os
+import uuid
 from langchain_core.documents import Document
-from langchain_community.vectorstores import FAISS
-from langchain_ollama import OllamaEmbeddings
-from midi_feature_extractor import MIDIFeatureExtractor
+from midi_feature_extractor import MIDIFeatureExtractor, EXTRACTOR_VERSION
+from feature_cache import FeatureCache
+from midi_sources import iter_midi_sources, source_name
+from musical_embeddings import MusicalEmbeddings
+from cached_embeddings import CachedEmbeddings
+from index_manifest import IndexManifest
+from ann_index import resolve_index_params
+from motif_index import MotifIndex, DEFAULT_MOTIF_LENGTH
+from near_duplicates import NearDuplicateIndex
+from vector_backends import make_backend, ChromaVectorStore
+
+EMBEDDING_TYPES = ('musical', 'ollama')
+# 중복 제거 결과를 출력할 때 보여 줄 최대 파일 수
+MAX_REPORTED_DUPLICATES = 20
 
 class MIDIVectorizer:
-    def __init__(self):
-        self.embeddings = OllamaEmbeddings(
-            model="llama3.2",
-            base_url="http://localhost:11434"
-        )
-        self.feature_extractor = MIDIFeatureExtractor()
+    def __init__(self, feature_cache: FeatureCache = None, embedding: str = 'musical',
+                 embedding_cache: FeatureCache = None, base_url: str = "http://localhost:11434",
+                 batch_size: int = 32, max_concurrency: int = 4,
+                 index_type: str = 'flat', index_params: Dict = None,
+                 segment_bars: int = None, hop_bars: int = None,
+                 motif_length: int = DEFAULT_MOTIF_LENGTH, motif_rhythm: bool = False,
+                 dedup_threshold: float = None, backend: str = 'faiss'):
+        """
+        Args:
+            feature_cache: 특징 디스크 캐시 (생략하면 기본 캐시)
+            embedding: 'musical' (특징 수치 벡터, 기본값) 또는 'ollama' (특징 텍스트를 LLM으로 임베딩)
+            embedding_cache: 'ollama' 임베딩 벡터 디스크 캐시 (생략하면 기본 캐시)
+            base_url: Ollama 서버 주소
+            batch_size, max_concurrency: 'ollama' 임베딩 요청당 텍스트 수 / 동시 요청 수
+            index_type: FAISS 색인 종류 ('flat', 'ivf_flat', 'hnsw', 'ivf_pq', 'pq')
+            index_params: 색인 파라미터 (nlist, nprobe, M, ef_search, m, nbits, storage 등, 생략하면 기본값)
+                          storage: flat/ivf_flat/hnsw 벡터 저장 형식 ('float32', 'float16', 'int8')
+            segment_bars: 지정하면 파일 전체 대신 이 길이(마디)의 겹치는 구간마다 문서 하나를 색인
+            hop_bars: 구간 사이 간격 (마디, 생략하면 segment_bars의 절반)
+            motif_length: 모티프 색인의 음정 n-gram 음 수 (None이면 모티프 색인을 만들지 않음)
+            motif_rhythm: True면 모티프 색인 n-gram에 음 간격 비율 등급도 포함
+            dedup_threshold: 지정하면 선율 MinHash 유사도가 이 값 이상인 파일(재출력/조옮김)은 대표 하나만 색인
+                             (기본값 None은 모든 파일을 색인, 권장값은 near_duplicates.DEFAULT_THRESHOLD)
+            backend: 벡터 저장소 백엔드 ('faiss': 메모리 FAISS 색인, 'chroma': 디스크에 바로 저장되는 Chroma 컬렉션,
+                     Chroma는 자체 HNSW 색인을 쓰므로 index_type/index_params를 사용하지 않음)
+        """
+        if embedding not in EMBEDDING_TYPES:
+            raise ValueError(f"Unknown embedding: {embedding} (expected one of {EMBEDDING_TYPES})")
+        # 잘못된 색인 종류/파라미터는 색인을 만들기 전에 알림
+        self.index_type = index_type
+        self.index_params = resolve_index_params(index_type, index_params)
+        self.embedding = embedding
+        self.segments = None
+        if segment_bars is not None:
+            hop_bars = hop_bars or max(1, segment_bars // 2)
+            if segment_bars < 1 or hop_bars < 1:
+                raise ValueError(f"segment_bars와 hop_bars는 1 이상이어야 합니다: {segment_bars}, {hop_bars}")
+            self.segments = (segment_bars, hop_bars)
+        if embedding == 'musical':
+            self.embeddings = MusicalEmbeddings()
+        else:
+            from langchain_ollama import OllamaEmbeddings
+            model = "llama3.2"
+            # 같은 문서/질의를 다시 임베딩할 때는 디스크 캐시에서 벡터를 읽음
+            self.embeddings = CachedEmbeddings(
+                OllamaEmbeddings(model=model, base_url=base_url),
+                model=model,
+                cache=embedding_cache,
+                batch_size=batch_size,
+                max_concurrency=max_concurrency
+            )
+        self.backend = make_backend(backend, self.embeddings, self.index_type, self.index_params)
+        # 같은 코퍼스로 다시 학습할 때는 디스크 캐시에서 특징을 읽음
+        # 수치 임베딩/재정렬에 쓰는 확장 그룹(profile, progression)까지 추출
+        self.feature_extractor = MIDIFeatureExtractor(cache=feature_cache, extended=True)
+        # 벡터 저장소와 함께 만들고 저장/로드하는 선율 모티프 역색인
+        self.motif_settings = (motif_length, motif_rhythm) if motif_length else None
+        self.motif_index = MotifIndex(*self.motif_settings) if self.motif_settings else None
+        # 거의 같은 파일을 묶는 MinHash 색인 (대표 파일만 벡터/모티프 색인에 넣음)
+        self.dedup_threshold = dedup_threshold
+        self.dedup_index = NearDuplicateIndex(dedup_threshold) if dedup_threshold is not None else None
     
-    def _create_document(self, features: Dict, midi_file: str) -> Document:
-        """특징을 Document 객체로 변환"""
+    def create_document(self, features: Dict, midi_file: str, segment: Dict = None) -> Document:
+        """특징을 Document 객체로 변환 (segment: 구간 색인이면 마디 범위/시작 시점)"""
         # 더 자세한 특징들을 포함하도록 수정
         feature_text = f"""
         파일명: {midi_file}
@@ -38,14 +105,15 @@ class MIDIVectorizer:
         - 코드 진행: {features.get('chord_progression', [])}
         """
         
-        return Document(
-            page_content=feature_text,
-            metadata={
-                "filename": midi_file,
-                "features": features,
-                "musical_style": self._analyze_style(features)  # 음악 스타일 분석 추가
-            }
-        )
+        metadata = {
+            "filename": midi_file,
+            "features": features,
+            "musical_style": self._analyze_style(features)  # 음악 스타일 분석 추가
+        }
+        if segment is not None:
+            feature_text = f"\n        구간: {segment['bar_start'] + 1}~{segment['bar_end']}마디\n" + feature_text
+            metadata.update(bar_start=segment['bar_start'], bar_end=segment['bar_end'], onset=segment['onset'])
+        return Document(page_content=feature_text, metadata=metadata)
     
     def _analyze_style(self, features: Dict) -> str:
         """MIDI 특징을 기반으로 음악 스타일 분석"""
@@ -53,41 +121,277 @@ class MIDIVectorizer:
         # 예: 템포, 악기, 코드 진행 등을 기반으로 장르나 스타일 추정
         return "분석된 스타일"
     
-    def vectorize_midi(self, midi_files: List[str]):
-        """MIDI 파일들을 벡터화하여 저장"""
-        docs = []
-        for midi_file in midi_files:
+    def vectorize_midi(self, midi_files, workers: int = None):
+        """
+        MIDI 파일들을 벡터화하여 저장
+        
+        Args:
+            midi_files: MIDI 파일/zip·tar 압축 파일/디렉토리 경로, 또는 (이름, bytes) 버퍼의 iterable.
+                        압축 파일은 풀지 않고 멤버를 하나씩 스트리밍하여 추출
+            workers: 특징 추출 워커 프로세스 수 (생략하면 CPU 수)
+        """
+        if self.motif_settings:
+            self.motif_index = MotifIndex(*self.motif_settings)
+        signatures = None
+        if self.dedup_index is not None:
+            self.dedup_index = NearDuplicateIndex(self.dedup_threshold)
+            signatures = {}
+        docs = self.create_documents(iter_midi_sources(midi_files), workers=workers, signatures=signatures)
+        if self.dedup_index is not None:
+            docs, _, _ = self._deduplicate(docs, signatures)
+        return self._add_documents(None, docs)
+    
+    def build_vectorstore(self, docs: List[Document], path: str = None):
+        """
+        이미 만든 문서(create_document)로 새 벡터 저장소 생성 (특징 추출/중복 제거/모티프 색인 없이)
+        path: Chroma 영구 저장소 디렉토리 (생략하면 메모리, FAISS는 save_vectorstore로 저장)
+        """
+        return self._add_documents(None, docs, path=path)
+    
+    def create_documents(self, sources, workers: int = None, signatures: Dict = None) -> List[Document]:
+        """
+        MIDI 소스 스트림의 특징을 추출해 입력 순서대로 Document 목록 생성
+        구간 색인이면 파일마다 구간 순서대로 여러 문서를 만듦
+        모티프 색인을 쓰면 같은 추출 과정에서 파일별 선율선도 모티프 색인에 추가
+        signatures를 넘기면 파일 이름 -> 선율선 MinHash 서명(중복 제거용)을 채움
+        """
+        indexed_docs = []
+        melody_lines = self.motif_index is not None or signatures is not None
+        for record in self.feature_extractor.extract_features_batch(sources, workers=workers,
+                                                                    segments=self.segments,
+                                                                    melody_lines=melody_lines):
+            if not record['ok']:
+                print(f"Error processing {record['file']}: {record['error_type']}: {record['error']}")
+                continue
             try:
-                features = self.feature_extractor.extract_features(midi_file)
-                doc = self._create_document(features, midi_file)
-                docs.append(doc)
+                if self.segments:
+                    for number, segment in enumerate(record['features']):
+                        doc = self.create_document(segment['features'], record['file'], segment)
+                        indexed_docs.append(((record['index'], number), doc))
+                else:
+                    doc = self.create_document(record['features'], record['file'])
+                    indexed_docs.append(((record['index'], 0), doc))
+                if self.motif_index is not None:
+                    self.motif_index.add(record['file'], record['melody_line'])
+                if signatures is not None:
+                    signatures[record['file']] = self.dedup_index.signature(record['melody_line'])
             except Exception as e:
-                print(f"Error processing {midi_file}: {str(e)}")
+                print(f"Error processing {record['file']}: {str(e)}")
+        
+        # 병렬 추출은 끝난 순서로 오므로 입력 순서대로 정렬
+        indexed_docs.sort(key=lambda item: item[0])
+        
+        stats = self.feature_extractor.cache_stats()
+        if stats:
+            print(f"특징 캐시: 적중 {stats['hits']}회, 미스 {stats['misses']}회")
+        return [doc for _, doc in indexed_docs]
+    
+    def _deduplicate(self, docs: List[Document], signatures: Dict, orphans: Dict = None):
+        """
+        중복 색인에 파일을 입력 순서대로 등록하고 대표 파일의 문서만 남김
+        
+        Args:
+            docs: create_documents 결과
+            signatures: create_documents가 채운 파일 이름 -> MinHash 서명
+            orphans: 대표가 삭제되어 다시 묶어야 하는 기존 중복 파일 이름 -> 서명 (문서는 없음)
         
-        vectorstore = FAISS.from_documents(documents=docs, embedding=self.embeddings)
+        Returns:
+            (남은 문서, 제외된 파일 이름 -> (대표 이름, 유사도), 새 대표가 되어 문서를 만들어야 하는 기존 파일 이름 목록)
+        """
+        dropped = {}
+        promoted = []
+        for name, signature in (orphans or {}).items():
+            representative, similarity = self.dedup_index.add(name, signature)
+            if representative is None:
+                promoted.append(name)
+            else:
+                dropped[name] = (representative, similarity)
+        for name in dict.fromkeys(doc.metadata['filename'] for doc in docs):
+            representative, similarity = self.dedup_index.add(name, signatures.get(name))
+            if representative is not None:
+                dropped[name] = (representative, similarity)
+        
+        if dropped:
+            print(f"중복 제거: 파일 {len(dropped)}개를 거의 같은 대표 파일로 대체")
+            for name, (representative, similarity) in list(dropped.items())[:MAX_REPORTED_DUPLICATES]:
+                print(f"  {name} -> {representative} (유사도 {similarity:.2f})")
+            if len(dropped) > MAX_REPORTED_DUPLICATES:
+                print(f"  ... 외 {len(dropped) - MAX_REPORTED_DUPLICATES}개")
+            if self.motif_index is not None:
+                self.motif_index.remove(dropped)
+        return [doc for doc in docs if doc.metadata['filename'] not in dropped], dropped, promoted
+    
+    def _add_documents(self, vectorstore, docs: List[Document], ids: List[str] = None, path: str = None):
+        """
+        문서를 임베딩해 저장소에 추가
+        vectorstore가 None이면 백엔드 저장소를 새로 생성 (path: Chroma 영구 저장소 디렉토리, 없으면 메모리)
+        """
+        if self.embedding == 'musical':
+            # 텍스트를 다시 해석하지 않고 추출한 특징 딕셔너리로 바로 벡터 계산
+            vectors = [self.embeddings.embed_features(doc.metadata['features']) for doc in docs]
+        else:
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in docs])
+            stats = self.embeddings.stats()
+            print(f"임베딩 캐시: 적중 {stats['hits']}회, 미스 {stats['misses']}회, 모델 요청 {stats['requests']}회")
+        
+        if vectorstore is None:
+            vectorstore = self.backend.create(vectors, path)
+        vectorstore.add_embeddings(
+            [(doc.page_content, vector) for doc, vector in zip(docs, vectors)],
+            metadatas=[doc.metadata for doc in docs],
+            ids=ids
+        )
+        self.backend.retrain_if_grown(vectorstore)
+        return vectorstore
+    
+    def index_key(self) -> str:
+        """저장된 색인을 재사용할 수 있는지 판단하는 설정 키 (임베딩 종류, 특징 추출기 버전, 백엔드/색인 종류, 구간 설정)"""
+        key = f"{self.embedding}:{EXTRACTOR_VERSION}:{self.backend.spec()}"
+        if self.segments:
+            key += ":segments:{}x{}".format(*self.segments)
+        if self.motif_index is not None:
+            key += f":{self.motif_index.settings()}"
+        if self.dedup_index is not None:
+            key += f":{self.dedup_index.settings()}"
+        return key
+    
+    def update_vectorstore(self, midi_files, index_dir: str, workers: int = None, rebuild: bool = False):
+        """
+        index_dir에 저장된 색인을 코퍼스 목록(manifest.json)과 비교해 증분 갱신 후 저장
+        새 파일은 추가, 내용이 바뀐 파일은 다시 임베딩, 사라진 파일은 색인에서 삭제합니다.
+        저장된 색인이 없거나 설정이 다르면 전체를 새로 만듭니다.
+        
+        Args:
+            midi_files: vectorize_midi와 같은 입력
+            index_dir: 벡터 저장소와 코퍼스 목록을 저장할 디렉토리
+            workers: 특징 추출 워커 프로세스 수 (생략하면 CPU 수)
+            rebuild: True면 저장된 색인을 무시하고 전체를 새로 만듦
+        """
+        index_key = self.index_key()
+        manifest = None if rebuild else IndexManifest.load(index_dir, index_key)
+        vectorstore = self.load_vectorstore(index_dir, lazy=False) if manifest is not None else None
+        if isinstance(vectorstore, ChromaVectorStore):
+            self._reconcile(vectorstore, manifest)
+        if vectorstore is None:
+            manifest = IndexManifest(index_key)
+            if self.motif_settings:
+                self.motif_index = MotifIndex(*self.motif_settings)
+            if self.dedup_index is not None:
+                self.dedup_index = NearDuplicateIndex(self.dedup_threshold)
+        
+        # 해시가 같은 파일은 특징 추출/임베딩 없이 건너뜀
+        seen = {}
+        signatures = {} if self.dedup_index is not None else None
+        docs = self.create_documents(manifest.changed_sources(iter_midi_sources(midi_files), seen),
+                                     workers=workers, signatures=signatures)
+        
+        stale = set(manifest.stale_doc_ids(seen))
+        if stale:
+            self.backend.delete(vectorstore, stale)
+        # 사라졌거나 바뀐 파일의 항목을 지우고, 바뀐 파일은 아래에서 새 문서 ID로 다시 기록
+        manifest.files = {name: entry for name, entry in manifest.files.items()
+                          if seen.get(name) == entry['hash']}
+        kept = len(manifest.files)
+        
+        if self.dedup_index is not None:
+            # 바뀌거나 사라진 파일을 중복 색인에서 빼고, 그 파일을 대표로 삼던 중복 파일은 다시 묶음
+            orphans = self.dedup_index.remove(set(self.dedup_index.entries) - set(manifest.files))
+            docs, dropped, promoted = self._deduplicate(docs, signatures, orphans)
+            for name in dropped:
+                manifest.files[name] = {'hash': seen[name], 'doc_ids': []}
+            if promoted:
+                # 새 대표가 된 기존 중복 파일은 문서가 없으므로 특징을 다시 추출 (대부분 캐시 적중)
+                promoted = set(promoted)
+                for name in promoted:
+                    manifest.files.pop(name, None)
+                sources = (source for source in iter_midi_sources(midi_files) if source_name(source) in promoted)
+                promoted_docs = self.create_documents(sources, workers=workers)
+                docs += promoted_docs
+                # 입력을 다시 읽을 수 없어 문서를 만들지 못한 파일은 다음 갱신 때 새 파일로 처리
+                missing = promoted - {doc.metadata['filename'] for doc in promoted_docs}
+                for name in set(self.dedup_index.remove(missing)) | missing:
+                    manifest.files.pop(name, None)
+        
+        if docs:
+            ids = [str(uuid.uuid4()) for _ in docs]
+            vectorstore = self._add_documents(vectorstore, docs, ids, path=index_dir)
+            for doc, doc_id in zip(docs, ids):
+                name = doc.metadata['filename']
+                entry = manifest.files.setdefault(name, {'hash': seen[name], 'doc_ids': []})
+                entry['doc_ids'].append(doc_id)
+        
+        print(f"증분 색인: 추가/갱신 문서 {len(docs)}개, 삭제 문서 {len(stale)}개, 유지 파일 {kept}개")
+        if self.motif_index is not None:
+            # 바뀐 파일은 add()가 교체했으므로 문서가 없는 파일(삭제/추출 실패/중복)만 제거
+            indexed = {name for name, entry in manifest.files.items() if entry['doc_ids']}
+            self.motif_index.remove(set(self.motif_index.filenames()) - indexed)
+        
+        if vectorstore is None:
+            print("색인할 MIDI 파일이 없습니다.")
+            return None
+        if self.save_vectorstore(vectorstore, index_dir):
+            manifest.save(index_dir)
         return vectorstore
     
+    def _reconcile(self, vectorstore: ChromaVectorStore, manifest: IndexManifest):
+        """
+        Chroma는 추가/삭제가 바로 디스크에 반영되므로, 목록을 저장하기 전에 중단된 갱신의 흔적을 정리
+        목록에 없는 문서는 삭제하고, 문서가 빠진 파일은 목록에서 지워 다시 색인되게 함
+        """
+        present = set(vectorstore.ids())
+        known = {doc_id for entry in manifest.files.values() for doc_id in entry['doc_ids']}
+        orphaned = present - known
+        if orphaned:
+            vectorstore.delete(orphaned)
+        manifest.files = {name: entry for name, entry in manifest.files.items()
+                          if all(doc_id in present for doc_id in entry['doc_ids'])}
+    
     def save_vectorstore(self, vectorstore, save_path: str):
-        """벡터 저장소를 파일로 저장"""
+        """
+        벡터 저장소를 파일로 저장
+        FAISS: save_path/index.faiss 색인, save_path/index.json 학습 벡터 수, save_path/metadata.sqlite 문서 내용/메타데이터
+        Chroma: save_path/chroma.sqlite3와 HNSW 세그먼트 (같은 디렉토리에서 갱신한 저장소는 이미 저장되어 있음)
+        공통: save_path/motif.npz 모티프 색인, save_path/duplicates.npz 중복 묶음 (사용하는 경우)
+        """
         try:
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            vectorstore.save_local(save_path)
+            os.makedirs(save_path, exist_ok=True)
+            self.backend.save(vectorstore, save_path)
+            if self.motif_index is not None:
+                self.motif_index.save(save_path)
+            if self.dedup_index is not None:
+                self.dedup_index.save(save_path)
             print(f"벡터 저장소가 {save_path}에 저장되었습니다.")
             return True
         except Exception as e:
             print(f"벡터 저장소 저장 중 오류 발생: {str(e)}")
             return False
     
-    def load_vectorstore(self, load_path: str):
-        """저장된 벡터 저장소 로드"""
+    def load_vectorstore(self, load_path: str, lazy: bool = True, allow_dangerous_deserialization: bool = False):
+        """
+        저장된 벡터 저장소 로드
+        
+        Args:
+            load_path: save_vectorstore로 저장한 디렉토리
+            lazy: FAISS에서 True면 색인을 메모리 매핑하고 메타데이터는 검색된 문서만 SQLite에서 읽음 (읽기 전용).
+                  False면 전체를 메모리로 읽음 (문서 추가/삭제 가능)
+                  Chroma는 lazy와 관계없이 컬렉션을 열기만 하고 검색된 문서만 읽음
+            allow_dangerous_deserialization: True면 pickle(index.pkl)로 저장된 이전 형식 FAISS 저장소도 로드
+                  (pickle은 임의 코드를 실행할 수 있으므로 직접 만든 저장소에만 사용)
+        """
         try:
-            if os.path.exists(load_path):
-                vectorstore = FAISS.load_local(load_path, self.embeddings)
-                print(f"벡터 저장소를 {load_path}에서 로드했습니다.")
-                return vectorstore
-            else:
+            if not os.path.exists(load_path):
                 print(f"벡터 저장소 파일을 찾을 수 없습니다: {load_path}")
                 return None
+            vectorstore = self.backend.load(load_path, lazy=lazy,
+                                            allow_dangerous_deserialization=allow_dangerous_deserialization)
+            if self.motif_settings:
+                # 모티프 색인이 없거나 설정이 다르면 빈 색인 (update_vectorstore는 index_key로 전체 재색인)
+                self.motif_index = MotifIndex.load(load_path, *self.motif_settings) or MotifIndex(*self.motif_settings)
+            if self.dedup_index is not None:
+                self.dedup_index = (NearDuplicateIndex.load(load_path, self.dedup_threshold)
+                                    or NearDuplicateIndex(self.dedup_threshold))
+            print(f"벡터 저장소를 {load_path}에서 로드했습니다.")
+            return vectorstore
         except Exception as e:
             print(f"벡터 저장소 로드 중 오류 발생: {str(e)}")
             return None
@@ -202,4 +506,4 @@ class MIDIVectorizer:
 
 
 
-# 전처리 , 청크 ,파싱 , 
\ No newline at end of file
+# 전처리 , 청크 ,파싱 , 
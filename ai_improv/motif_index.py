@@ -0,0 +1,333 @@
+# motif_index.py
+import os
+import struct
+import zipfile
+from typing import Dict, List
+import numpy as np
+from midi_feature_extractor import MAX_INTERVAL_STEP
+
+MOTIF_FILENAME = "motif.npz"
+# 색인 npz 저장 형식 (2: 문자열을 object 대신 유니코드 배열로 저장, 설정 문자열에 들어가 이전 형식은 다시 색인)
+NPZ_FORMAT = 2
+# n-gram 하나에 들어가는 음 수 (음정은 하나 적음)
+DEFAULT_MOTIF_LENGTH = 4
+# 리듬 양자화: 연속한 두 음 간격(IOI)의 비율을 log2로 반올림해 -2..2 (1/4배 ~ 4배) 5단계로 구분
+RHYTHM_CLASSES = 5
+_STEP_BASE = 2 * MAX_INTERVAL_STEP + 1
+
+
+def encode_varint(values: np.ndarray) -> np.ndarray:
+    """0 이상의 정수 배열 -> LEB128 가변 길이 바이트 (값마다 7비트씩, 작은 값은 1바이트)"""
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return np.zeros(0, dtype=np.uint8)
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+    starts = np.cumsum(sizes) - sizes
+    out = np.zeros(int(sizes.sum()), dtype=np.uint8)
+    for byte in range(int(sizes.max())):
+        selected = sizes > byte
+        chunk = (values[selected] >> np.uint64(7 * byte)) & np.uint64(0x7F)
+        more = (sizes[selected] > byte + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[selected] + byte] = (chunk | more).astype(np.uint8)
+    return out
+
+
+def decode_varint(data: np.ndarray) -> np.ndarray:
+    """encode_varint의 역변환"""
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.r_[0, ends[:-1] + 1]
+    # 값 안에서 몇 번째 바이트인지 (7비트 단위 자리)
+    place = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(np.int64) << (7 * place)
+    return np.add.reduceat(parts, starts)
+
+
+def load_npz(path: str, mmap_mode: str = 'r') -> Dict[str, np.ndarray]:
+    """
+    np.savez로 저장한 npz의 배열들을 메모리 매핑으로 열기 (np.load는 npz에 mmap_mode를 적용하지 않음)
+    압축하지 않고 저장된 멤버는 zip 안의 .npy 데이터 위치를 바로 매핑하고, 압축된 멤버는 일반적으로 읽음
+    object 배열은 pickle로 읽어야 하므로 로드하지 않음 (ValueError, 파일 이름 등 문자열은 유니코드 배열로 저장)
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+            # 로컬 파일 헤더(30바이트 + 이름 + extra 필드) 다음이 .npy 데이터
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            start = info.header_offset + 30 + name_length + extra_length
+            f.seek(start)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{path}: object 배열({name})은 pickle이 필요해 로드하지 않습니다")
+            if not int(np.prod(shape)):
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+def gram_keys(pitches: np.ndarray, onsets: np.ndarray = None, track_start: np.ndarray = None,
+              length: int = DEFAULT_MOTIF_LENGTH, rhythm: bool = False):
+    """
+    선율선 -> (n-gram 키, 시작 음 번호)
+    음정(반음, ±MAX_INTERVAL_STEP로 자름)만 쓰므로 조옮김에 무관하고, rhythm이면 음 간격 비율 등급도 키에 넣어
+    템포에 무관한 리듬 윤곽까지 일치해야 함. 트랙 경계를 넘는 n-gram은 제외
+    """
+    pitches = np.asarray(pitches, dtype=np.int64)
+    count = len(pitches) - length + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    steps = np.clip(np.diff(pitches), -MAX_INTERVAL_STEP, MAX_INTERVAL_STEP) + MAX_INTERVAL_STEP
+    keys = np.lib.stride_tricks.sliding_window_view(steps, length - 1) @ (_STEP_BASE ** np.arange(length - 2, -1, -1))
+    if rhythm:
+        if onsets is None:
+            raise ValueError("rhythm=True인 모티프 색인은 음 시작 위치(onsets)가 필요합니다")
+        gaps = np.maximum(np.diff(np.asarray(onsets, dtype=np.float64)), 1e-6)
+        ratios = np.clip(np.rint(np.log2(gaps[1:] / gaps[:-1])), -2, 2).astype(np.int64) + 2
+        if length > 2:
+            windows = np.lib.stride_tricks.sliding_window_view(ratios, length - 2)
+            keys = keys * RHYTHM_CLASSES ** (length - 2) + windows @ (RHYTHM_CLASSES ** np.arange(length - 3, -1, -1))
+    positions = np.arange(count)
+    if track_start is not None:
+        # n-gram 안쪽(두 번째 음부터)에 트랙 첫 음이 있으면 경계를 넘는 것
+        crossing = np.lib.stride_tricks.sliding_window_view(np.asarray(track_start, dtype=bool)[1:], length - 1)
+        ok = ~crossing.any(axis=1)
+        keys, positions = keys[ok], positions[ok]
+    return keys, positions
+
+
+class MotifIndex:
+    """
+    선율 음정 n-gram -> (파일, 음 위치) 역색인. "이 모티프가 들어 있는 릭" 검색용.
+    모든 파일의 선율선을 이어 붙인 전체 음 번호로 게시 목록(posting list)을 만들고,
+    목록마다 번호 차이를 LEB128 가변 길이로 저장해 (대부분 1~2바이트) 큰 코퍼스도 메모리에 둡니다.
+    키는 정렬된 배열의 이진 탐색으로 찾으므로 조회 비용은 코퍼스 크기가 아니라 일치 수에 비례합니다.
+    """
+
+    def __init__(self, length: int = DEFAULT_MOTIF_LENGTH, rhythm: bool = False):
+        """
+        Args:
+            length: n-gram 음 수 (2 이상, 질의 모티프는 이보다 길거나 같아야 함)
+            rhythm: True면 음 간격 비율 등급까지 같아야 일치 (질의에 시작 위치 필요)
+        """
+        if length < 2:
+            raise ValueError(f"모티프 n-gram 길이는 2 이상이어야 합니다: {length}")
+        self.length = length
+        self.rhythm = rhythm
+        # 파일별 선율선을 이어 붙인 배열 (file_offsets[i]:file_offsets[i+1]이 파일 i)
+        self.files = []
+        self.file_offsets = np.zeros(1, dtype=np.int64)
+        self.pitches = np.zeros(0, dtype=np.int16)
+        self.onsets = np.zeros(0, dtype=np.float32)
+        self.track_start = np.zeros(0, dtype=bool)
+        # 게시 목록: keys[i]의 목록은 postings[posting_offsets[i]:posting_offsets[i+1]] 바이트
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.posting_offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.zeros(0, dtype=np.uint8)
+        self._pending = []
+        self._dirty = False
+
+    def __len__(self):
+        return len(self.files) + len(self._pending)
+
+    def settings(self) -> str:
+        """저장된 색인 재사용 여부 판단용 설정 문자열"""
+        return f"motif:{self.length}{':rhythm' if self.rhythm else ''}:v{NPZ_FORMAT}"
+
+    def filenames(self) -> List[str]:
+        """색인된 파일 이름 목록"""
+        self._consolidate()
+        return list(self.files)
+
+    def add(self, filename: str, melody_line: tuple):
+        """
+        파일 하나의 선율선(NoteTable.melody_line() 결과) 추가 (같은 이름이 있으면 교체)
+        게시 목록은 다음 검색/저장 때 다시 만듦
+        """
+        pitches, onsets, track_start = melody_line
+        self._pending.append((filename, np.asarray(pitches, dtype=np.int16),
+                              np.asarray(onsets, dtype=np.float32), np.asarray(track_start, dtype=bool)))
+        self._dirty = True
+
+    def remove(self, filenames):
+        """파일들의 선율선 삭제"""
+        self._consolidate()
+        self._drop(set(filenames))
+
+    def _drop(self, filenames: set):
+        keep = [i for i, name in enumerate(self.files) if name not in filenames]
+        if len(keep) == len(self.files):
+            return
+        sizes = np.diff(self.file_offsets)
+        notes = np.repeat(np.isin(np.arange(len(self.files)), keep), sizes)
+        self.files = [self.files[i] for i in keep]
+        self.file_offsets = np.r_[0, np.cumsum(sizes[keep])].astype(np.int64)
+        self.pitches, self.onsets, self.track_start = \
+            self.pitches[notes], self.onsets[notes], self.track_start[notes]
+        self._dirty = True
+
+    def _consolidate(self):
+        """추가 대기 중인 선율선을 이어 붙인 배열에 합침"""
+        if not self._pending:
+            return
+        # 같은 이름은 마지막으로 추가한 선율선만 남기고 기존 항목은 교체
+        latest = {entry[0]: entry for entry in self._pending}
+        self._drop(set(latest))
+        names, pitches, onsets, track_start = zip(*latest.values())
+        self.files.extend(names)
+        sizes = [len(line) for line in pitches]
+        self.file_offsets = np.r_[self.file_offsets, self.file_offsets[-1] + np.cumsum(sizes)].astype(np.int64)
+        self.pitches = np.concatenate((self.pitches,) + pitches)
+        self.onsets = np.concatenate((self.onsets,) + onsets)
+        self.track_start = np.concatenate((self.track_start,) + track_start)
+        self._pending = []
+
+    def build(self):
+        """선율선 배열에서 게시 목록 전체를 다시 만듦 (바뀐 것이 없으면 아무것도 하지 않음)"""
+        if not self._dirty:
+            return
+        self._consolidate()
+        # 파일 첫 음도 경계로 취급해 파일 사이를 넘는 n-gram 제외
+        boundaries = self.track_start.copy()
+        boundaries[self.file_offsets[:-1][np.diff(self.file_offsets) > 0]] = True
+        keys, positions = gram_keys(self.pitches, self.onsets, boundaries, self.length, self.rhythm)
+        order = np.argsort(keys, kind='stable')  # 같은 키 안에서는 음 번호 오름차순
+        keys, positions = keys[order], positions[order]
+        first = np.r_[True, keys[1:] != keys[:-1]] if len(keys) else np.zeros(0, dtype=bool)
+        deltas = np.diff(positions, prepend=0)
+        deltas[first] = positions[first]
+        sizes = np.zeros(len(keys), dtype=np.int64)
+        encoded = encode_varint(deltas)
+        # 값마다 바이트 수 -> 목록별 바이트 범위
+        if len(encoded):
+            ends = np.flatnonzero(encoded < 0x80)
+            sizes = np.diff(ends, prepend=-1)
+        list_starts = np.flatnonzero(first)
+        byte_starts = np.r_[0, np.cumsum(sizes)][list_starts]
+        self.keys = keys[list_starts]
+        self.posting_offsets = np.r_[byte_starts, len(encoded)].astype(np.int64)
+        self.postings = encoded
+        self._dirty = False
+
+    def _lookup(self, key: int) -> np.ndarray:
+        """키 하나의 게시 목록 (전체 음 번호 배열)"""
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return np.zeros(0, dtype=np.int64)
+        return np.cumsum(decode_varint(self.postings[self.posting_offsets[i]:self.posting_offsets[i + 1]]))
+
+    def search(self, pitches, onsets=None, k: int = 10, min_coverage: float = 0.0) -> List[Dict]:
+        """
+        모티프(음높이 목록, 조옮김 무관)가 들어 있는 구간 검색
+        질의의 n-gram마다 게시 목록을 찾아 같은 위치에서 시작하는 일치를 모으고,
+        질의 n-gram 중 일치한 비율(coverage) 순으로 정렬
+
+        Args:
+            pitches: 모티프 MIDI 음높이 목록 (length개 이상)
+            onsets: 음 시작 위치 (박 단위, rhythm 색인이면 필요)
+            k: 반환할 구간 수
+            min_coverage: 이 비율 미만으로 일치한 구간은 제외
+
+        Returns:
+            List[Dict]: [{'filename', 'onset', 'end', 'coverage', 'matched'}, ...]
+                        onset/end는 구간 첫 음/마지막 음의 시작 위치 (박 단위)
+        """
+        self.build()
+        query_keys, query_positions = gram_keys(pitches, onsets, None, self.length, self.rhythm)
+        if not len(query_keys) or not len(self.keys):
+            return []
+
+        # 질의 n-gram q가 전체 음 번호 p에서 일치하면 구간은 p - q에서 시작
+        starts, hit_files = [], []
+        for key in np.unique(query_keys):
+            positions = self._lookup(key)
+            if not len(positions):
+                continue
+            files = np.searchsorted(self.file_offsets, positions, side='right') - 1
+            for q in query_positions[query_keys == key]:
+                starts.append(positions - q)
+                hit_files.append(files)
+        if not starts:
+            return []
+        starts, hit_files = np.concatenate(starts), np.concatenate(hit_files)
+
+        # (파일, 시작 음) 쌍마다 일치한 질의 n-gram 수 (구간이 파일 앞을 넘어가도 다른 파일과 섞이지 않게 파일별로 묶음)
+        span = len(self.pitches) + len(pitches)
+        pairs, counts = np.unique(hit_files * span + (starts + len(pitches)), return_counts=True)
+        coverage = counts / len(query_keys)
+        order = np.argsort(-counts, kind='stable')
+        order = order[coverage[order] >= min_coverage][:k]
+
+        results = []
+        for pair, count in zip(pairs[order], counts[order]):
+            file_index, start = int(pair // span), int(pair % span) - len(pitches)
+            lo, hi = self.file_offsets[file_index], self.file_offsets[file_index + 1]
+            first, last = max(start, lo), min(start + len(pitches), hi) - 1
+            results.append({
+                'filename': self.files[file_index],
+                'onset': float(self.onsets[first]),
+                'end': float(self.onsets[last]),
+                'coverage': round(float(count) / len(query_keys), 4),
+                'matched': int(count)
+            })
+        return results
+
+    def memory_bytes(self) -> int:
+        """색인 배열 크기 (게시 목록 + 선율선)"""
+        self.build()
+        arrays = (self.keys, self.posting_offsets, self.postings, self.file_offsets,
+                  self.pitches, self.onsets, self.track_start)
+        return int(sum(array.nbytes for array in arrays))
+
+    @staticmethod
+    def path(index_dir: str) -> str:
+        return os.path.join(index_dir, MOTIF_FILENAME)
+
+    def save(self, index_dir: str):
+        """선율선과 게시 목록을 npz 하나로 저장 (임시 파일에 쓴 뒤 교체)"""
+        self.build()
+        os.makedirs(index_dir, exist_ok=True)
+        path = self.path(index_dir)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, settings=np.array(self.settings()), files=np.array(self.files, dtype=str),
+                 file_offsets=self.file_offsets, pitches=self.pitches, onsets=self.onsets,
+                 track_start=self.track_start, keys=self.keys, posting_offsets=self.posting_offsets,
+                 postings=self.postings)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, index_dir: str, length: int = DEFAULT_MOTIF_LENGTH, rhythm: bool = False):
+        """저장된 모티프 색인 로드 (없거나 설정이 다르면 None, 게시 목록/선율선 배열은 메모리 매핑)"""
+        index = cls(length, rhythm)
+        if not os.path.exists(index.path(index_dir)):
+            return None
+        try:
+            data = load_npz(index.path(index_dir))
+            if str(data['settings']) != index.settings():
+                print(f"모티프 색인 설정이 달라 사용하지 않습니다: {index.path(index_dir)}")
+                return None
+            index.files = data['files'].tolist()
+            for name in ('file_offsets', 'pitches', 'onsets', 'track_start', 'keys',
+                         'posting_offsets', 'postings'):
+                setattr(index, name, data[name])
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            print(f"모티프 색인을 로드하지 못했습니다: {str(e)}")
+            return None
+        return index
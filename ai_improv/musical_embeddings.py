@@ -0,0 +1,121 @@
+# musical_embeddings.py
+import ast
+import json
+from typing import Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from chord_lut import get_chord_lut, run_length_decode
+
+CHORD_QUALITIES = ('major', 'minor', 'diminished', 'augmented', 'other')
+
+# 벡터 구성 (블록 이름, 차원, 가중치)
+EMBEDDING_BLOCKS = (
+    ('pitch_class', 12, 1.0),
+    ('interval', 13, 1.0),
+    ('chord_quality', len(CHORD_QUALITIES), 0.5),
+    ('scalars', 10, 1.0),
+)
+EMBEDDING_DIM = sum(size for _, size, _ in EMBEDDING_BLOCKS)
+
+
+def _parse_features(text: str) -> Dict:
+    """str(features) 또는 JSON 문자열을 특징 딕셔너리로 복원"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        features = ast.literal_eval(text)
+    except (ValueError, SyntaxError) as e:
+        raise ValueError(f"특징 딕셔너리 문자열이 아닙니다: {text[:80]!r}") from e
+    if not isinstance(features, dict):
+        raise ValueError(f"특징 딕셔너리 문자열이 아닙니다: {text[:80]!r}")
+    return features
+
+
+def _clip(value, scale) -> float:
+    if value is None:
+        return 0.0
+    return float(min(max(value / scale, 0.0), 1.0))
+
+
+def features_to_vector(features: Dict) -> np.ndarray:
+    """
+    특징 딕셔너리 -> 고정 차원(EMBEDDING_DIM) 단위 벡터
+    음높이 클래스/음정 분포, 코드 성질 분포, 템포/밀도/음역/코드 통계를 블록별 가중치로 합침
+    """
+    profile = features.get('profile') or {}
+    harmony = features.get('harmony') or {}
+    tempo = features.get('tempo') or {}
+    rhythm = features.get('rhythm') or {}
+    melody = features.get('melody') or {}
+
+    pitch_classes = np.asarray(profile.get('pitch_class_histogram') or [0.0] * 12, dtype=float)
+    intervals = np.asarray(profile.get('interval_histogram') or [0.0] * 13, dtype=float)
+
+    # 코드 ID(음높이 클래스 마스크)로 코드 성질 분포 계산
+    lut = get_chord_lut()
+    qualities = np.zeros(len(CHORD_QUALITIES))
+    encoding = features.get('progression')
+    if encoding and encoding['chord_ids']:
+        for chord_id in run_length_decode(encoding):
+            quality = lut.root_quality(chord_id)[1]
+            qualities[CHORD_QUALITIES.index(quality) if quality in CHORD_QUALITIES else -1] += 1
+        qualities /= qualities.sum()
+
+    progression = harmony.get('chord_progression') or []
+    density = rhythm.get('rhythmic_density') or 0
+    pitch_range = melody.get('pitch_range') or (None, None)
+    time_signatures = features.get('time_signatures') or []
+    numerator, denominator = 4, 4
+    if time_signatures:
+        try:
+            numerator, denominator = (int(part) for part in time_signatures[0].split('/'))
+        except ValueError:
+            pass
+
+    scalars = np.array([
+        _clip(tempo.get('main_tempo'), 240.0),
+        _clip(rhythm.get('avg_note_duration'), 4.0),
+        _clip(profile.get('notes_per_beat'), 8.0),
+        _clip(pitch_range[0], 127.0),
+        _clip(pitch_range[1], 127.0),
+        _clip(melody.get('avg_pitch'), 127.0),
+        _clip(len(progression), float(density)) if density else 0.0,
+        _clip(harmony.get('unique_chords'), float(len(progression))) if progression else 0.0,
+        _clip(numerator, 12.0),
+        1.0 if denominator == 8 else 0.0,
+    ])
+
+    blocks = {'pitch_class': pitch_classes, 'interval': intervals,
+              'chord_quality': qualities, 'scalars': scalars}
+    vector = np.concatenate([blocks[name] * weight for name, _, weight in EMBEDDING_BLOCKS])
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector.astype(np.float32)
+
+
+class MusicalEmbeddings(Embeddings):
+    """
+    모델 서버 없이 특징 딕셔너리로 계산하는 결정적 수치 임베딩.
+    텍스트 입력은 str(features)/JSON 문자열로 받아 특징 딕셔너리로 복원합니다.
+    """
+
+    dimension = EMBEDDING_DIM
+
+    def embed_features(self, features: Dict) -> List[float]:
+        return features_to_vector(features).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_features(_parse_features(text)) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_features(_parse_features(text))
+
+    # 계산이 가벼워 기본 구현처럼 스레드 풀로 넘기지 않고 바로 계산
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
@@ -0,0 +1,97 @@
+# musical_rerank.py
+from typing import Dict, List
+import numpy as np
+from midi_feature_extractor import CONTOUR_LENGTH
+
+# 벡터 검색에서 미리 가져올 후보 수
+DEFAULT_RERANK_CANDIDATES = 100
+# 재정렬 점수 가중치 (음높이 클래스 분포, 음정 n-gram 겹침, 선율 윤곽 DTW)
+DEFAULT_WEIGHTS = {'pitch_class': 0.4, 'ngram': 0.3, 'contour': 0.3}
+# 음정 n-gram ID를 이 크기의 비트 집합으로 접어서 비교
+NGRAM_BUCKETS = 1024
+# DTW 대역 폭 (윤곽 길이의 1/8, Sakoe-Chiba 대역)
+DTW_BAND = CONTOUR_LENGTH // 8
+# 윤곽 거리(반음)를 유사도로 바꿀 때의 척도: exp(-평균 거리 / CONTOUR_SCALE)
+CONTOUR_SCALE = 4.0
+
+
+def _profile_arrays(features_list: List[Dict]):
+    """특징 딕셔너리 목록 -> (음높이 클래스 분포 N x 12, n-gram 비트 집합 N x B, 윤곽 N x L, 윤곽 유무 N)"""
+    profiles = [(features or {}).get('profile') or {} for features in features_list]
+    count = len(profiles)
+    histograms = np.array([profile.get('pitch_class_histogram') or [0.0] * 12 for profile in profiles],
+                          dtype=float).reshape(count, 12)
+
+    ngrams = np.zeros((count, NGRAM_BUCKETS), dtype=bool)
+    ids = [profile.get('interval_ngrams') or [] for profile in profiles]
+    rows = np.repeat(np.arange(count), [len(row_ids) for row_ids in ids])
+    if len(rows):
+        ngrams[rows, np.concatenate([np.asarray(row_ids, dtype=np.int64) for row_ids in ids]) % NGRAM_BUCKETS] = True
+
+    has_contour = np.array([len(profile.get('melody_contour') or []) == CONTOUR_LENGTH for profile in profiles],
+                           dtype=bool)
+    contours = np.zeros((count, CONTOUR_LENGTH))
+    if has_contour.any():
+        contours[has_contour] = [profile['melody_contour'] for profile, ok in zip(profiles, has_contour) if ok]
+        # 조옮김에 무관하도록 평균 음높이를 뺀 상대 윤곽
+        contours[has_contour] -= contours[has_contour].mean(axis=1, keepdims=True)
+    return histograms, ngrams, contours, has_contour
+
+
+def banded_dtw(query: np.ndarray, candidates: np.ndarray, band: int = DTW_BAND) -> np.ndarray:
+    """
+    길이 L인 윤곽 하나와 N개 윤곽 사이의 대역 제한 DTW 평균 거리 (N,)
+    행 i의 가로 방향 의존성은 누적합 + 누적 최솟값으로 풀어 후보 전체를 한 번에 계산 (Python 반복은 L회)
+        D[i, j] = P[j] + min_{t<=j} (A[t] - P[t] + C[i, t]),  A[t] = min(D[i-1, t], D[i-1, t-1]),  P = cumsum(C[i])
+    배열은 (열, 후보) 순서로 두어 누적 연산이 연속 메모리에서 후보 전체에 대해 진행되도록 함
+    """
+    count, length = candidates.shape
+    columns = np.ascontiguousarray(candidates.T)  # L x N
+    previous = np.full((length + 1, count), np.inf)  # 0번 행은 j = -1 (항상 inf)
+    for i in range(length):
+        lo, hi = max(0, i - band), min(length, i + band + 1)
+        if i == 0:
+            above = np.full((hi - lo, count), np.inf)
+            above[0] = 0.0
+        else:
+            above = np.minimum(previous[lo + 1:hi + 1], previous[lo:hi])
+        cost = np.abs(columns[lo:hi] - query[i])
+        prefix = np.cumsum(cost, axis=0)
+        current = np.full((length + 1, count), np.inf)
+        current[lo + 1:hi + 1] = prefix + np.minimum.accumulate(above - prefix + cost, axis=0)
+        previous = current
+    return previous[length] / length
+
+
+def similarity_scores(query_features: Dict, candidate_features: List[Dict], weights: Dict = None) -> np.ndarray:
+    """질의 특징과 후보 특징들의 음악적 유사도 (N,), 클수록 비슷함 (0~1)"""
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    q_hist, q_ngrams, q_contour, q_has = _profile_arrays([query_features])
+    hist, ngrams, contours, has_contour = _profile_arrays(candidate_features)
+
+    # 음높이 클래스 분포 코사인 유사도
+    norms = np.linalg.norm(hist, axis=1) * np.linalg.norm(q_hist[0])
+    pitch_class = np.divide(hist @ q_hist[0], norms, out=np.zeros(len(hist)), where=norms > 0)
+
+    # 음정 n-gram 자카드 유사도
+    intersection = (ngrams & q_ngrams[0]).sum(axis=1)
+    union = (ngrams | q_ngrams[0]).sum(axis=1)
+    ngram = np.divide(intersection, union, out=np.zeros(len(ngrams)), where=union > 0)
+
+    # 선율 윤곽 DTW 거리 -> 유사도 (윤곽이 없으면 0)
+    contour = np.zeros(len(contours))
+    if q_has[0] and has_contour.any():
+        distances = banded_dtw(q_contour[0], contours[has_contour])
+        contour[has_contour] = np.exp(-distances / CONTOUR_SCALE)
+
+    return (weights['pitch_class'] * pitch_class + weights['ngram'] * ngram
+            + weights['contour'] * contour) / sum(weights.values())
+
+
+def rerank(query_features: Dict, docs: List, k: int, weights: Dict = None) -> List:
+    """벡터 검색 후보 문서들을 음악적 유사도로 다시 정렬해 상위 k개 반환 (같은 점수는 검색 순서 유지)"""
+    if not docs:
+        return []
+    scores = similarity_scores(query_features, [doc.metadata.get('features') for doc in docs], weights)
+    order = np.argsort(-scores, kind='stable')[:k]
+    return [docs[i] for i in order]
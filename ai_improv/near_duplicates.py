@@ -0,0 +1,180 @@
+# near_duplicates.py
+import os
+import zipfile
+from typing import Dict, List
+import mmh3
+import numpy as np
+from motif_index import NPZ_FORMAT, gram_keys, load_npz
+
+DEDUP_FILENAME = "duplicates.npz"
+# 추정 자카드 유사도가 이 값 이상이면 같은 곡의 재출력/조옮김으로 보고 대표 파일만 색인
+DEFAULT_THRESHOLD = 0.8
+# MinHash 해시 함수 수와 LSH 밴드 수 (밴드당 행 = 128 / 32 = 4, 후보가 되는 유사도 약 (1/32)^(1/4) = 0.42)
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+# 슁글: 음 5개의 음정 + 음 간격 비율 등급 (조옮김/템포에 무관)
+SHINGLE_LENGTH = 5
+# 슁글이 이보다 적은 짧은 파일은 비교하지 않고 항상 색인
+MIN_SHINGLES = 8
+_SEED = 20250301
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH로 거의 같은 MIDI 파일을 묶는 색인.
+    파일마다 선율선 슁글 집합의 MinHash 서명을 만들고, 서명을 밴드로 나눈 LSH 버킷에서 만난
+    대표 파일과만 유사도를 확인합니다. 새 파일은 기존 대표 중 가장 비슷한 것이 임계값 이상이면
+    그 대표의 중복으로, 아니면 새 대표로 등록하므로 (대표 중심 묶음) 파일 수에 거의 선형입니다.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 bands: int = DEFAULT_BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm({num_perm})은 bands({bands})로 나누어떨어져야 합니다")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(_SEED)
+        # 곱셈-덧셈-시프트 해시 (a * x + b) >> 32, a는 홀수 64비트
+        self._a = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self.entries = {}  # 이름 -> {'signature', 'representative', 'similarity'}
+        self._buckets = [{} for _ in range(bands)]  # 밴드 해시 -> 대표 이름 목록
+
+    def __len__(self):
+        return len(self.entries)
+
+    def settings(self) -> str:
+        """저장된 색인 재사용 여부 판단용 설정 문자열"""
+        return f"dedup:{self.threshold}:{self.num_perm}x{self.bands}:v{NPZ_FORMAT}"
+
+    def signature(self, melody_line: tuple):
+        """선율선(NoteTable.melody_line() 결과)의 MinHash 서명 (uint32 num_perm개, 슁글이 적으면 None)"""
+        pitches, onsets, track_start = melody_line
+        keys, _ = gram_keys(pitches, onsets, track_start, SHINGLE_LENGTH, rhythm=True)
+        shingles = np.unique(keys).astype(np.uint64)
+        if len(shingles) < MIN_SHINGLES:
+            return None
+        with np.errstate(over='ignore'):
+            hashes = (shingles[:, None] * self._a + self._b) >> np.uint64(32)
+        return hashes.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [mmh3.hash64(signature[band * self.rows:(band + 1) * self.rows].tobytes())[0]
+                for band in range(self.bands)]
+
+    def add(self, name: str, signature) -> tuple:
+        """
+        파일 등록 -> (대표 이름, 추정 유사도). 새 대표가 되면 (None, 0.0)
+        내용이 바뀐 파일은 먼저 remove()로 삭제해 그 파일에 묶여 있던 중복도 다시 묶어야 함
+        """
+        if name in self.entries:
+            raise ValueError(f"이미 등록된 파일입니다: {name}")
+        if signature is None:
+            self.entries[name] = {'signature': None, 'representative': None, 'similarity': 0.0}
+            return None, 0.0
+
+        band_keys = self._band_keys(signature)
+        candidates = set()
+        for bucket, key in zip(self._buckets, band_keys):
+            candidates.update(bucket.get(key, ()))
+        if candidates:
+            candidates = sorted(candidates)
+            similarity = (np.stack([self.entries[other]['signature'] for other in candidates])
+                          == signature).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.threshold:
+                entry = {'signature': signature, 'representative': candidates[best],
+                         'similarity': round(float(similarity[best]), 4)}
+                self.entries[name] = entry
+                return entry['representative'], entry['similarity']
+
+        self.entries[name] = {'signature': signature, 'representative': None, 'similarity': 0.0}
+        for bucket, key in zip(self._buckets, band_keys):
+            bucket.setdefault(key, []).append(name)
+        return None, 0.0
+
+    def _unregister(self, name: str):
+        entry = self.entries.pop(name)
+        if entry['representative'] is None and entry['signature'] is not None:
+            for bucket, key in zip(self._buckets, self._band_keys(entry['signature'])):
+                members = bucket.get(key)
+                if members and name in members:
+                    members.remove(name)
+                    if not members:
+                        del bucket[key]
+
+    def remove(self, names) -> Dict[str, np.ndarray]:
+        """
+        파일들을 삭제하고, 삭제된 대표에 묶여 있던 (삭제되지 않은) 중복 파일의 서명을 반환
+        반환된 파일들도 색인에서 빠지므로 호출하는 쪽에서 add()로 다시 묶어야 함
+        """
+        names = set(names) & set(self.entries)
+        orphans = {}
+        if not names:
+            return orphans
+        for other, entry in list(self.entries.items()):
+            if other not in names and entry['representative'] in names:
+                orphans[other] = entry['signature']
+        for name in names | set(orphans):
+            self._unregister(name)
+        return orphans
+
+    def duplicates(self) -> Dict[str, List[str]]:
+        """대표 이름 -> 그 대표로 대체된 중복 파일 목록"""
+        groups = {}
+        for name, entry in self.entries.items():
+            if entry['representative'] is not None:
+                groups.setdefault(entry['representative'], []).append(name)
+        return groups
+
+    @staticmethod
+    def path(index_dir: str) -> str:
+        return os.path.join(index_dir, DEDUP_FILENAME)
+
+    def save(self, index_dir: str):
+        """서명과 묶음 정보를 npz 하나로 저장 (LSH 버킷은 로드할 때 대표 서명으로 다시 만듦)"""
+        os.makedirs(index_dir, exist_ok=True)
+        names = list(self.entries)
+        signatures = np.zeros((len(names), self.num_perm), dtype=np.uint32)
+        has_signature = np.zeros(len(names), dtype=bool)
+        for i, name in enumerate(names):
+            if self.entries[name]['signature'] is not None:
+                signatures[i] = self.entries[name]['signature']
+                has_signature[i] = True
+        path = self.path(index_dir)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, settings=np.array(self.settings()), names=np.array(names, dtype=str),
+                 signatures=signatures, has_signature=has_signature,
+                 representatives=np.array([self.entries[name]['representative'] or '' for name in names],
+                                          dtype=str),
+                 similarities=np.array([self.entries[name]['similarity'] for name in names]))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, index_dir: str, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+             bands: int = DEFAULT_BANDS):
+        """저장된 중복 색인 로드 (없거나 설정이 다르면 None, 서명 행렬은 메모리 매핑)"""
+        index = cls(threshold, num_perm, bands)
+        if not os.path.exists(index.path(index_dir)):
+            return None
+        try:
+            data = load_npz(index.path(index_dir))
+            if str(data['settings']) != index.settings():
+                print(f"중복 색인 설정이 달라 사용하지 않습니다: {index.path(index_dir)}")
+                return None
+            rows = zip(data['names'].tolist(), data['signatures'], data['has_signature'],
+                       data['representatives'].tolist(), data['similarities'].tolist())
+            for name, signature, has_signature, representative, similarity in rows:
+                index.entries[name] = {'signature': signature if has_signature else None,
+                                       'representative': representative or None,
+                                       'similarity': similarity}
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            print(f"중복 색인을 로드하지 못했습니다: {str(e)}")
+            return None
+        for name, entry in index.entries.items():
+            if entry['representative'] is None and entry['signature'] is not None:
+                for bucket, key in zip(index._buckets, index._band_keys(entry['signature'])):
+                    bucket.setdefault(key, []).append(name)
+        return index
@@ -0,0 +1,158 @@
+# note_stream.py
+import re
+import ast
+import json
+import math
+import operator
+from typing import Dict, List, Optional
+
+# 음표 값 자리에 계산되지 않은 수식이 온 경우 (예: "time": 0.6 + 1.8)
+_VALUE_EXPRESSION = re.compile(r'("[\w]+")\s*:\s*([\d.]+\s*[\+\-\*\/\^]\s*[\(\)\d\s\+\-\*\/\^\.]*)(,|\s*\})')
+_INSTRUMENT = re.compile(r'"instrument"\s*:\s*(\d+)')
+
+
+# 값 자리 수식에 허용하는 연산 (거듭제곱/함수 호출/속성 접근 등은 계산하지 않음)
+_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+_SIGNS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+MAX_EXPRESSION_LENGTH = 100  # 이보다 긴 수식은 계산하지 않음 (깊은 괄호 중첩 방지)
+
+
+def _evaluate(expr) -> float:
+    """
+    숫자와 + - * / (괄호, 부호 포함)만으로 된 수식 계산
+    eval을 쓰지 않고 구문 트리를 직접 계산하므로 그 밖의 식은 ValueError (값은 float, 넘치면 inf)
+    """
+    text = str(expr)
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"수식이 너무 깁니다: {len(text)}자")
+
+    def visit(node):
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return float(node.value)
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _SIGNS:
+            return _SIGNS[type(node.op)](visit(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+            return _OPERATORS[type(node.op)](visit(node.left), visit(node.right))
+        raise ValueError(f"계산할 수 없는 수식: {text}")
+
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError:
+        raise ValueError(f"계산할 수 없는 수식: {text}")
+    try:
+        return visit(tree.body)
+    except ZeroDivisionError:
+        raise ValueError(f"0으로 나누는 수식: {text}")
+
+
+def parse_note(text: str) -> Dict:
+    """음표 객체 하나({"pitch": ..., ...})를 딕셔너리로 해석 (값 자리의 수식은 계산)"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(_VALUE_EXPRESSION.sub(lambda m: f"{m.group(1)}: {_evaluate(m.group(2))}{m.group(3)}", text))
+
+
+def validate_note(raw: Dict, track: int = 0, instrument: int = 0) -> Optional[Dict]:
+    """
+    해석한 음표를 MIDI로 보낼 수 있는 값으로 정리 (쓸 수 없으면 None)
+    pitch는 0~127 정수여야 하고, time/duration/velocity가 없으면 render_midi와 같은 기본값을 씀
+    """
+    try:
+        values = {}
+        for key, default in (('pitch', None), ('time', 0), ('duration', 1), ('velocity', 64)):
+            value = raw.get(key, default)
+            if value is None:
+                return None
+            value = float(_evaluate(value) if isinstance(value, str) else value)
+            if not math.isfinite(value):
+                return None
+            values[key] = value
+    except Exception:
+        return None
+
+    pitch = int(round(values['pitch']))
+    if not 0 <= pitch <= 127 or values['time'] < 0 or values['duration'] <= 0:
+        return None
+    return {'track': track, 'instrument': instrument, 'pitch': pitch, 'time': values['time'],
+            'duration': values['duration'], 'velocity': max(1, min(127, int(round(values['velocity']))))}
+
+
+def note_messages(note: Dict) -> List:
+    """
+    음표 하나를 mido note_on/note_off 메시지로 변환
+    time은 생성 결과 시작부터의 절대 시간(초)이고, 채널은 트랙 번호로 구분
+    """
+    from mido import Message
+
+    channel = note['track'] % 16
+    return [Message('note_on', channel=channel, note=note['pitch'], velocity=note['velocity'], time=note['time']),
+            Message('note_off', channel=channel, note=note['pitch'], velocity=0,
+                    time=note['time'] + note['duration'])]
+
+
+class NoteStreamParser:
+    """
+    LLM 응답 토큰을 받는 대로 읽어 닫힌 음표 객체를 바로 꺼내는 파서.
+    응답 전체를 기다리지 않고 중괄호 깊이만 따라가며 (문자열 안의 괄호는 무시),
+    안에 다른 객체가 없고 "pitch" 키가 있는 객체가 닫히면 음표로 해석합니다.
+    음표를 감싼 객체를 트랙으로 보고, 그 안에서 음표보다 먼저 나온 "instrument" 값을 악기로 씁니다.
+    """
+
+    def __init__(self):
+        self.text = ''  # 지금까지 받은 응답 전체
+        self.notes = 0  # 꺼낸 음표 수
+        self.rejected = 0  # 해석/검증에 실패한 음표 객체 수
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._stack = []  # 열린 객체마다 [시작 위치, 안에 객체가 있는지]
+        self._tracks = {}  # 트랙 객체 시작 위치 -> 트랙 번호
+        self._instruments = {}  # 트랙 번호 -> 악기
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """응답 조각을 추가하고 이번 조각으로 완성된 음표들을 validate_note 형식으로 반환"""
+        self.text += chunk
+        notes = []
+        text = self.text
+        for pos in range(self._pos, len(text)):
+            char = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._stack:
+                    self._stack[-1][1] = True
+                self._stack.append([pos, False])
+            elif char == '}' and self._stack:
+                start, has_child = self._stack.pop()
+                if not has_child and '"pitch"' in text[start:pos]:
+                    note = self._note(text[start:pos + 1], start)
+                    if note is None:
+                        self.rejected += 1
+                    else:
+                        notes.append(note)
+        self._pos = len(text)
+        self.notes += len(notes)
+        return notes
+
+    def _note(self, text: str, start: int) -> Optional[Dict]:
+        track_start = self._stack[-1][0] if self._stack else 0
+        track = self._tracks.setdefault(track_start, len(self._tracks))
+        if track not in self._instruments:
+            # 첫 음표보다 뒤에 나오는 악기는 반영하지 않음 (프롬프트 형식은 instrument가 notes보다 먼저)
+            match = _INSTRUMENT.search(self.text, track_start, start)
+            self._instruments[track] = int(match.group(1)) if match else 0
+        try:
+            raw = parse_note(text)
+        except Exception:
+            return None
+        if not isinstance(raw, dict):
+            return None
+        return validate_note(raw, track, self._instruments[track])
@@ -0,0 +1,216 @@
+# note_table.py
+from typing import Dict, Iterator, List
+import numpy as np
+
+# 요소 종류 (kind 열 값)
+KIND_NOTE = 0
+KIND_CHORD = 1
+KIND_REST = 2
+KIND_UNPITCHED = 3
+KIND_PERCUSSION_CHORD = 4
+
+_FAST_PARSER_KINDS = {
+    'note': KIND_NOTE,
+    'chord': KIND_CHORD,
+    'rest': KIND_REST,
+    'unpitched': KIND_UNPITCHED,
+    'percussion_chord': KIND_PERCUSSION_CHORD,
+}
+
+# 한 행 = 노트/쉼표 하나 (코드는 구성음마다 한 행, 같은 element 번호를 공유)
+NOTE_DTYPE = np.dtype([
+    ('onset', 'f8'),     # 악보 전체 기준 시작 위치 (quarterLength)
+    ('duration', 'f8'),  # 길이 (quarterLength)
+    ('pitch', 'i2'),     # MIDI 음높이 (쉼표/타악기는 -1)
+    ('velocity', 'i2'),  # 세기 (쉼표는 0)
+    ('track', 'i2'),     # 파트(트랙) 번호
+    ('channel', 'i2'),   # MIDI 채널 (mido 엔진만 채움, music21 엔진과 쉼표는 -1)
+    ('element', 'i4'),   # 요소 번호 (music21 flatten() 순서)
+    ('kind', 'i1'),      # KIND_* 값
+])
+
+
+class NoteTable:
+    """
+    MIDI 파일 하나를 한 번 해석한 결과.
+    notes: NOTE_DTYPE 구조화 배열 (music21 score.flatten() 순서)
+    나머지: 템포(BPM), 조표, 박자표, 악기 이름 목록
+    """
+
+    def __init__(self, notes: np.ndarray, tempos: List = None, key_signatures: List[str] = None,
+                 time_signatures: List[str] = None, instruments: List[str] = None):
+        self.notes = notes
+        self.tempos = tempos or []
+        self.key_signatures = key_signatures or []
+        self.time_signatures = time_signatures or []
+        self.instruments = instruments or []
+
+    def __len__(self):
+        return len(self.notes)
+
+    @property
+    def element_starts(self) -> np.ndarray:
+        """각 요소(노트/코드/쉼표)의 첫 행 여부"""
+        element = self.notes['element']
+        starts = np.ones(len(element), dtype=bool)
+        starts[1:] = element[1:] != element[:-1]
+        return starts
+
+    @property
+    def elements(self) -> np.ndarray:
+        """요소당 한 행만 남긴 배열 (길이/개수 계산용)"""
+        return self.notes[self.element_starts]
+
+    def bar_length(self) -> float:
+        """한 마디 길이 (quarterLength, 첫 박자표 기준, 없으면 4/4)"""
+        for ts in self.time_signatures:
+            try:
+                numerator, denominator = (int(part) for part in ts.split('/'))
+            except ValueError:
+                continue
+            if numerator > 0 and denominator > 0:
+                return numerator * 4.0 / denominator
+        return 4.0
+
+    def bar_windows(self, window_bars: int, hop_bars: int) -> Iterator[tuple]:
+        """
+        window_bars마디 길이 구간을 hop_bars마디씩 옮기며 (시작 마디, 끝 마디, 시작 위치, 끝 위치) 반환
+        박자표가 바뀌는 곡도 첫 박자표의 마디 길이로 나눔
+        """
+        if not len(self.notes):
+            return
+        bar = self.bar_length()
+        end = float((self.notes['onset'] + self.notes['duration']).max())
+        total_bars = max(1, int(np.ceil(end / bar - 1e-9)))
+        last_start = max(0, total_bars - window_bars)
+        starts = list(range(0, last_start + 1, hop_bars))
+        if starts[-1] != last_start:
+            # 마지막 마디까지 덮도록 끝에 맞춘 구간 추가
+            starts.append(last_start)
+        for bar_start in starts:
+            bar_end = min(bar_start + window_bars, total_bars)
+            yield bar_start, bar_end, bar_start * bar, bar_end * bar
+
+    def window(self, start: float, end: float) -> 'NoteTable':
+        """
+        [start, end) 구간에서 시작하는 행만 남긴 테이블 (시작 위치는 구간 기준으로 옮기고 길이는 구간 끝에서 자름)
+        행이 시작 위치 순서이므로 이진 탐색으로 잘라냄
+        """
+        onsets = self.notes['onset']
+        lo, hi = np.searchsorted(onsets, [start, end], side='left')
+        notes = self.notes[lo:hi].copy()
+        notes['onset'] -= start
+        notes['duration'] = np.minimum(notes['duration'], (end - start) - notes['onset'])
+        return NoteTable(notes, tempos=self.tempos, key_signatures=self.key_signatures,
+                         time_signatures=self.time_signatures, instruments=self.instruments)
+
+    def melody_line(self) -> tuple:
+        """
+        트랙별 선율선: 같은 시작 위치의 음 중 최고음(스카이라인)만 남긴 (음높이, 시작 위치, 트랙 첫 음 여부)
+        트랙 순서대로 이어 붙이며, 트랙 경계를 넘는 음정은 세 번째 배열로 구분
+        """
+        rows = self.notes[(self.notes['kind'] == KIND_NOTE) | (self.notes['kind'] == KIND_CHORD)]
+        rows = rows[np.lexsort((-rows['pitch'], rows['onset'], rows['track']))]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows['track'][1:] != rows['track'][:-1]) | (rows['onset'][1:] != rows['onset'][:-1])
+        rows = rows[first]
+        track_start = np.ones(len(rows), dtype=bool)
+        track_start[1:] = rows['track'][1:] != rows['track'][:-1]
+        return rows['pitch'].astype(np.int16), rows['onset'].astype(np.float32), track_start
+
+    def chord_pitches(self) -> List[tuple]:
+        """코드별 MIDI 음높이 튜플 (등장 순서)"""
+        rows = self.notes[self.notes['kind'] == KIND_CHORD]
+        if not len(rows):
+            return []
+        bounds = np.flatnonzero(np.diff(rows['element'])) + 1
+        return [tuple(group.tolist()) for group in np.split(rows['pitch'], bounds)]
+
+    def chord_masks(self) -> List[int]:
+        """코드별 12비트 음높이 클래스 마스크 (chord_pitches()와 같은 순서)"""
+        rows = self.notes[self.notes['kind'] == KIND_CHORD]
+        if not len(rows):
+            return []
+        bits = np.left_shift(1, rows['pitch'].astype(np.int64) % 12)
+        starts = np.flatnonzero(np.r_[True, np.diff(rows['element']) != 0])
+        return np.bitwise_or.reduceat(bits, starts).tolist()
+
+    @classmethod
+    def from_parsed(cls, parsed: Dict) -> 'NoteTable':
+        """FastMIDIParser.parse() 결과로 테이블 생성"""
+        parts = parsed['parts']
+
+        # music21 score.flatten()과 같은 순서 (오프셋, 꾸밈음 우선, 파트 순)
+        elements = []
+        for part_index, part in enumerate(parts):
+            for offset, element in part['elements']:
+                elements.append((offset, not element.grace, part_index, element))
+        elements.sort(key=lambda item: item[:3])
+
+        rows = []
+        for element_index, (offset, _, part_index, e) in enumerate(elements):
+            kind = _FAST_PARSER_KINDS[e.kind]
+            onset, duration = float(offset), float(e.ql)
+            if kind == KIND_REST:
+                rows.append((onset, duration, -1, 0, part_index, -1, element_index, kind))
+                continue
+            pitched = kind in (KIND_NOTE, KIND_CHORD)
+            for pitch, velocity, channel in zip(e.pitches, e.velocities, e.channels):
+                rows.append((onset, duration, pitch if pitched else -1, velocity,
+                             part_index, channel, element_index, kind))
+
+        def by_offset(name):
+            # flatten()처럼 모든 파트의 메타 요소를 오프셋 순으로 (같은 오프셋은 파트 순)
+            return [value for _, value in sorted((item for part in parts for item in part[name]),
+                                                 key=lambda item: item[0])]
+
+        return cls(
+            np.array(rows, dtype=NOTE_DTYPE),
+            tempos=by_offset('tempos'),
+            key_signatures=by_offset('keys'),
+            time_signatures=by_offset('time_signatures'),
+            instruments=[str(name) for part in parts for name in part['instruments']],
+        )
+
+    @classmethod
+    def from_score(cls, score) -> 'NoteTable':
+        """music21 Score로 테이블 생성"""
+        from music21 import chord, note, percussion
+
+        # 요소 -> 파트 번호 (flatten()은 요소를 복사하지 않으므로 id로 찾음)
+        # music21 악보는 노트별 MIDI 채널을 보존하지 않으므로 channel은 항상 -1
+        tracks = {}
+        for part_index, part in enumerate(score.parts):
+            for el in part.recurse().notesAndRests:
+                tracks[id(el)] = part_index
+
+        flattened = score.flatten()
+        rows = []
+        for element_index, el in enumerate(flattened.notesAndRests):
+            onset, duration = float(el.offset), float(el.quarterLength)
+            track, channel = tracks.get(id(el), 0), -1
+            if isinstance(el, note.Rest):
+                rows.append((onset, duration, -1, 0, track, -1, element_index, KIND_REST))
+            elif isinstance(el, chord.Chord):
+                for n in el.notes:
+                    rows.append((onset, duration, n.pitch.midi, n.volume.velocity or 0,
+                                 track, channel, element_index, KIND_CHORD))
+            elif isinstance(el, percussion.PercussionChord):
+                for n in el.notes:
+                    rows.append((onset, duration, -1, n.volume.velocity or 0,
+                                 track, channel, element_index, KIND_PERCUSSION_CHORD))
+            elif isinstance(el, note.Note):
+                rows.append((onset, duration, el.pitch.midi, el.volume.velocity or 0,
+                             track, channel, element_index, KIND_NOTE))
+            else:
+                rows.append((onset, duration, -1, el.volume.velocity or 0,
+                             track, channel, element_index, KIND_UNPITCHED))
+
+        return cls(
+            np.array(rows, dtype=NOTE_DTYPE),
+            tempos=[el.number for el in flattened.getElementsByClass('MetronomeMark')],
+            key_signatures=[str(el) for el in flattened.getElementsByClass('KeySignature')],
+            time_signatures=[f"{el.numerator}/{el.denominator}"
+                             for el in flattened.getElementsByClass('TimeSignature')],
+            instruments=[str(el.instrumentName) for el in flattened.getElementsByClass('Instrument')],
+        )
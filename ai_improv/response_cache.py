@@ -0,0 +1,61 @@
+# response_cache.py
+import os
+import json
+import time
+import hashlib
+from typing import Dict, List
+from feature_cache import FeatureCache
+
+DEFAULT_RESPONSE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache", "responses")
+DEFAULT_RESPONSE_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+DEFAULT_TTL = 7 * 24 * 60 * 60  # 7일
+
+
+class ResponseCache(FeatureCache):
+    """
+    LLM 응답 디스크 캐시. 키는 프롬프트에 들어간 입력 특징, 검색된 문서 ID, 프롬프트 템플릿 버전,
+    모델 이름, 샘플링 파라미터의 해시이므로 이 중 하나라도 바뀌면 새로 생성합니다.
+    저장 후 ttl초가 지난 응답은 만료되고, 용량(max_bytes)을 넘으면 LRU로 삭제합니다 (FeatureCache와 같음).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_RESPONSE_CACHE_DIR, max_bytes: int = DEFAULT_RESPONSE_MAX_BYTES,
+                 ttl: float = DEFAULT_TTL):
+        """
+        Args:
+            cache_dir: 캐시 디렉토리
+            max_bytes: 캐시 파일 크기 합의 상한 (바이트)
+            ttl: 응답 유효 시간 (초, None이면 만료 없음)
+        """
+        super().__init__(cache_dir, max_bytes)
+        self.ttl = ttl
+        self.expired = 0  # 만료되어 미스로 처리한 횟수
+
+    def response_key(self, input_features: str, doc_ids: List[str], prompt_version: str, model: str,
+                     params: Dict) -> str:
+        """응답을 결정하는 값들을 정렬된 JSON으로 직렬화해 해시한 캐시 키"""
+        payload = json.dumps({'features': input_features, 'documents': list(doc_ids), 'prompt': prompt_version,
+                              'model': model, 'params': params}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """캐시된 응답 반환 (없거나 만료되었으면 None)"""
+        with self._lock:
+            entry = super().get(key, count=False)
+            if entry is not None and self.ttl is not None and time.time() - entry[0] > self.ttl:
+                self.expired += 1
+                self._remove(key)
+                entry = None
+            self.record(hit=entry is not None)
+            return None if entry is None else entry[1]
+
+    def put(self, key: str, response: str):
+        """응답을 저장 시각과 함께 저장"""
+        super().put(key, (time.time(), response))
+
+    def stats(self) -> Dict:
+        """적중/미스/만료 횟수와 현재 캐시 크기"""
+        with self._lock:
+            stats = super().stats()
+            stats['expired'] = self.expired
+        stats['ttl'] = self.ttl
+        return stats
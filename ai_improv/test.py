@@ -50,7 +50,33 @@ def main():
     except Exception as e:
         log_step("특징 추출 실패", str(e))
         return
-    
+
+    # 1-1. mido 엔진 결과가 music21 엔진과 같은지 확인
+    try:
+        fast_features = feature_extractor.extract_features(test_file, engine='mido')
+        mismatched = [name for name in features if features[name] != fast_features.get(name)]
+        log_step("1-1. mido 엔진 비교 테스트", {
+            "file": test_file,
+            "match": not mismatched,
+            "mismatched_features": mismatched
+        })
+    except Exception as e:
+        log_step("mido 엔진 비교 실패", str(e))
+        return
+
+    # 1-2. 노트 테이블 확인
+    try:
+        note_table = feature_extractor.extract_note_table(test_file, engine='mido')
+        log_step("1-2. 노트 테이블 테스트", {
+            "rows": len(note_table),
+            "columns": list(note_table.notes.dtype.names),
+            "tracks": sorted(set(note_table.notes['track'].tolist())),
+            "avg_velocity": float(note_table.notes['velocity'][note_table.notes['velocity'] > 0].mean())
+        })
+    except Exception as e:
+        log_step("노트 테이블 생성 실패", str(e))
+        return
+
     # 2. 벡터 저장소 생성 테스트
     try:
         vectorizer = MIDIVectorizer()
@@ -82,6 +108,7 @@ def main():
         ]
         
         log_step("3. 유사도 검색 결과", similarity_results, save_to_file=True)
+        log_step("특징 캐시 통계", feature_extractor.cache_stats())
     except Exception as e:
         log_step("유사도 검색 실패", str(e))
         return
@@ -123,11 +150,11 @@ def main():
         rag_system = MIDIRAGSystem()
         rag_system.train(training_files)
         
-        output_midi = rag_system.generate(test_file)
+        result = rag_system.generate(test_file)
         output_path = os.path.join(output_dir, "generated_output.json")
         
         with open(output_path, "w", encoding="utf-8") as f:
-            f.write(output_midi)
+            f.write(result.json)
         
         log_step("전체 RAG 시스템 테스트 완료", {
             "output_saved_to": output_path
@@ -0,0 +1,20 @@
+# conftest.py
+import os
+import sys
+
+# 모듈들이 같은 디렉토리의 모듈을 바로 import하므로 (from feature_cache import ...) ai_improv를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def write_melody(path, pitches, beats=None, tpq: int = 480) -> str:
+    """음높이 목록(과 음마다의 박 길이)으로 단선율 MIDI 파일을 쓰고 경로 반환"""
+    import mido
+
+    track = mido.MidiTrack()
+    for pitch, length in zip(pitches, beats or [1] * len(pitches)):
+        track.append(mido.Message('note_on', note=pitch, velocity=80, time=0))
+        track.append(mido.Message('note_off', note=pitch, velocity=0, time=int(length * tpq)))
+    mido.MidiFile(ticks_per_beat=tpq, tracks=[track]).save(str(path))
+    return str(path)
@@ -0,0 +1,143 @@
+# make_fixtures.py
+import os
+import random
+import mido
+
+# python tests/fixtures/make_fixtures.py  -> 엔진 비교 테스트용 MIDI 파일 다시 생성
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _track(events, name=None):
+    """(절대 틱, 메시지) 목록 -> 델타 시간 트랙"""
+    track = mido.MidiTrack()
+    if name:
+        track.append(mido.MetaMessage('track_name', name=name, time=0))
+    tick = 0
+    for at, msg in sorted(events, key=lambda e: (e[0], e[1].type != 'note_off')):
+        track.append(msg.copy(time=at - tick))
+        tick = at
+    return track
+
+
+def _notes(notes, channel=0):
+    """(시작 틱, 길이 틱, 음높이, 세기) 목록 -> note_on/note_off 이벤트"""
+    events = []
+    for start, length, pitch, velocity in notes:
+        events.append((start, mido.Message('note_on', channel=channel, note=pitch, velocity=velocity)))
+        events.append((start + length, mido.Message('note_off', channel=channel, note=pitch, velocity=0)))
+    return events
+
+
+def _conductor(tpq, numerator, denominator, tempo=120, key='C', changes=()):
+    """템포/박자표/조표만 있는 첫 트랙 (changes: (틱, 메타 메시지) 추가 변경)"""
+    events = [(0, mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(tempo))),
+              (0, mido.MetaMessage('time_signature', numerator=numerator, denominator=denominator)),
+              (0, mido.MetaMessage('key_signature', key=key))]
+    return _track(events + list(changes))
+
+
+def multi_track(tpq=480):
+    """컨덕터 + 피아노 코드 + 베이스 + 멜로디, 중간에 템포 변경"""
+    rng = random.Random(1)
+    chords = [(60, 64, 67), (57, 60, 64), (62, 65, 69), (55, 59, 62, 65)] * 2
+    piano = [(bar * 4 * tpq, 4 * tpq, p, 70) for bar, chord in enumerate(chords) for p in chord]
+    bass = [(bar * 4 * tpq + beat * tpq, tpq, chord[0] - 24, 90)
+            for bar, chord in enumerate(chords) for beat in range(4)]
+    melody, tick = [], 0
+    while tick < len(chords) * 4 * tpq:
+        length = rng.choice([tpq // 2, tpq, tpq // 2 * 3, tpq // 3])
+        melody.append((tick, length, rng.choice([72, 74, 76, 77, 79, 81]), rng.randrange(60, 110)))
+        tick += length
+    tempo_change = [(4 * 4 * tpq, mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(96)))]
+    mid = mido.MidiFile(type=1, ticks_per_beat=tpq)
+    mid.tracks.append(_conductor(tpq, 4, 4, 120, 'G', tempo_change))
+    mid.tracks.append(_track([(0, mido.Message('program_change', channel=0, program=0))] + _notes(piano, 0), 'Piano'))
+    mid.tracks.append(_track([(0, mido.Message('program_change', channel=1, program=32))] + _notes(bass, 1), 'Bass'))
+    mid.tracks.append(_track([(0, mido.Message('program_change', channel=2, program=65))] + _notes(melody, 2)))
+    return mid
+
+
+def percussion(tpq=480):
+    """채널 9(10번) 드럼 트랙 + 피아노"""
+    drums = []
+    for beat in range(16):
+        start = beat * tpq
+        drums.append((start, tpq // 4, 42, 80))  # 하이햇
+        drums.append((start + tpq // 2, tpq // 4, 42, 60))
+        drums.append((start, tpq // 4, 36 if beat % 2 == 0 else 38, 100))  # 킥/스네어
+    piano = [(bar * 4 * tpq, 2 * tpq, p, 75) for bar in range(4) for p in (48 + bar * 2, 55 + bar * 2, 64 + bar * 2)]
+    mid = mido.MidiFile(type=1, ticks_per_beat=tpq)
+    mid.tracks.append(_conductor(tpq, 4, 4, 100, 'Bb'))
+    mid.tracks.append(_track(_notes(drums, 9), 'Drums'))
+    mid.tracks.append(_track([(0, mido.Message('program_change', channel=0, program=4))] + _notes(piano, 0), 'E.Piano'))
+    return mid
+
+
+def five_four(tpq=96):
+    """5/4 박자, 작은 분해능(tpq 96), 단조 조표"""
+    notes, tick = [], 0
+    pattern = [tpq, tpq // 2, tpq // 2, tpq, 2 * tpq] * 6
+    pitches = [57, 60, 64, 62, 65, 69, 67, 64]
+    for i, length in enumerate(pattern):
+        notes.append((tick, length, pitches[i % len(pitches)], 80))
+        tick += length
+    mid = mido.MidiFile(type=1, ticks_per_beat=tpq)
+    mid.tracks.append(_conductor(tpq, 5, 4, 140, 'Am'))
+    mid.tracks.append(_track([(0, mido.Message('program_change', channel=0, program=24))] + _notes(notes), 'Guitar'))
+    return mid
+
+
+def seven_eight(tpq=960):
+    """7/8 박자에서 3/4로 바뀌는 곡, 큰 분해능(tpq 960)과 셋잇단/사람이 연주한 듯한 어긋난 타이밍"""
+    rng = random.Random(7)
+    eighth = tpq // 2
+    notes, tick = [], 0
+    for bar in range(4):  # 7/8 네 마디
+        for group in (2, 2, 3):
+            for i in range(group):
+                jitter = rng.randrange(-15, 16) if tick else 0
+                notes.append((tick + jitter, eighth - 20, 62 + (bar + i) % 7, 64 + 10 * (i == 0)))
+                tick += eighth
+    change_at = tick
+    for bar in range(3):  # 3/4 세 마디 (셋잇단 포함)
+        for beat in range(3):
+            if beat == 1:
+                for i in range(3):
+                    notes.append((tick + i * tpq // 3, tpq // 3, 69 + i, 70))
+            else:
+                notes.append((tick, tpq, 67 - bar, 70))
+                notes.append((tick, tpq, 59 - bar, 55))
+            tick += tpq
+    mid = mido.MidiFile(type=1, ticks_per_beat=tpq)
+    mid.tracks.append(_conductor(tpq, 7, 8, 160, 'D', [
+        (change_at, mido.MetaMessage('time_signature', numerator=3, denominator=4))]))
+    mid.tracks.append(_track([(0, mido.Message('program_change', channel=0, program=73))] + _notes(notes), 'Flute'))
+    return mid
+
+
+def single_track(tpq=384):
+    """type 0 파일 하나의 트랙에 여러 채널 (메타 이벤트도 같은 트랙)"""
+    events = [(0, mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(88))),
+              (0, mido.MetaMessage('time_signature', numerator=6, denominator=8)),
+              (0, mido.Message('program_change', channel=0, program=0)),
+              (0, mido.Message('program_change', channel=3, program=40))]
+    events += _notes([(i * tpq * 3 // 2, tpq * 3 // 2, 48 + (i % 4) * 5, 70) for i in range(12)], 0)
+    events += _notes([(i * tpq // 2, tpq // 2, 72 + (i * 5) % 12, 60 + i % 30) for i in range(36)], 3)
+    mid = mido.MidiFile(type=0, ticks_per_beat=tpq)
+    mid.tracks.append(_track(events))
+    return mid
+
+
+FIXTURES = {
+    'multi_track.mid': multi_track,
+    'percussion.mid': percussion,
+    'five_four_tpq96.mid': five_four,
+    'seven_eight_tpq960.mid': seven_eight,
+    'single_track_type0.mid': single_track,
+}
+
+
+if __name__ == "__main__":
+    for name, build in FIXTURES.items():
+        build().save(os.path.join(FIXTURES_DIR, name))
+        print(f"저장: {name}")
@@ -0,0 +1,158 @@
+# stub_servers.py
+import json
+import datetime
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_embedding(text: str, dim: int = 8):
+    """텍스트마다 항상 같은 값이 나오는 가짜 임베딩"""
+    return [b / 255 for b in hashlib.sha256(text.encode("utf-8")).digest()[:dim]]
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 수백 개 연결이 한꺼번에 들어와도 accept 대기열이 넘치지 않도록
+
+
+class StubEmbedServer:
+    """
+    Ollama /api/embed를 흉내 내는 로컬 HTTP 서버.
+    요청마다 받은 텍스트 수와 동시에 처리 중인 요청 수의 최댓값을 기록하고,
+    fail_statuses에 넣은 상태 코드(예: 500, 429)를 앞의 요청부터 차례로 돌려줍니다.
+    """
+
+    def __init__(self, delay: float = 0.0, fail_statuses=()):
+        self.delay = delay
+        self.fail_statuses = list(fail_statuses)
+        self.batches = []  # 성공한 요청마다 받은 텍스트 수
+        self.calls = 0  # 실패 포함 전체 요청 수
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.calls += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    status = stub.fail_statuses.pop(0) if stub.fail_statuses else 200
+                try:
+                    time.sleep(stub.delay)
+                    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    if status == 200:
+                        with stub._lock:
+                            stub.batches.append(len(texts))
+                        payload = {"model": body["model"], "embeddings": [fake_embedding(t) for t in texts]}
+                    else:
+                        payload = {"error": f"stub failure {status}"}
+                    data = json.dumps(payload).encode("utf-8")
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+        return Handler
+
+
+class StubGenerateServer:
+    """
+    Ollama /api/generate를 흉내 내는 로컬 HTTP 서버 (스트리밍 NDJSON 응답).
+    release가 설정될 때까지 모든 요청을 붙잡아 두므로, 동시에 처리 중인 요청 수(in_flight)를 확인한 뒤
+    release.set()으로 한꺼번에 응답할 수 있습니다 (생성자에서 hold=False면 바로 응답).
+    """
+
+    def __init__(self, response: str, hold: bool = True, delay: float = 0.0, timeout: float = 30.0):
+        self.response = response
+        self.delay = delay
+        self.timeout = timeout
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+        self.calls = 0  # 받은 요청 수
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.release.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.calls += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    stub.release.wait(stub.timeout)
+                    time.sleep(stub.delay)
+                    created = datetime.datetime.now(datetime.timezone.utc).isoformat()
+                    lines = [{"model": body["model"], "created_at": created, "response": stub.response,
+                              "done": False},
+                             {"model": body["model"], "created_at": created, "response": "", "done": True,
+                              "done_reason": "stop"}]
+                    data = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+                    try:
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.send_header("Content-Length", str(len(data)))
+                        self.end_headers()
+                        self.wfile.write(data)
+                    except OSError:
+                        pass  # 응답을 기다리다 취소한 클라이언트는 이미 연결을 끊었음
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+        return Handler
@@ -0,0 +1,108 @@
+# test_ann_index.py
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+from langchain_core.documents import Document
+from ann_index import build_index, remove_ids, RETRAIN_GROWTH_FACTOR
+from vector_backends import FAISSBackend
+
+DIM = 16
+
+
+class VectorEmbeddings:
+    """메타데이터에 넣은 원본 벡터를 그대로 돌려주는 수치 임베딩 (MusicalEmbeddings.embed_features와 같은 역할)"""
+    calls = 0
+
+    def embed_features(self, features):
+        VectorEmbeddings.calls += 1
+        return list(features['vector'])
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+
+def make_docs(vectors, start=0):
+    return [Document(page_content=f"doc {start + i}", metadata={'features': {'vector': vector.tolist()}})
+            for i, vector in enumerate(vectors)]
+
+
+def make_store(backend, vectors):
+    store = backend.create(vectors)
+    ids = [f"id{i}" for i in range(len(vectors))]
+    store.add_embeddings([(doc.page_content, v) for doc, v in zip(make_docs(vectors), vectors)],
+                         metadatas=[doc.metadata for doc in make_docs(vectors)], ids=ids)
+    return store, ids
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(400, DIM)).astype(np.float32)
+
+
+@pytest.mark.parametrize("index_type, params", [
+    ('ivf_flat', {'nlist': 4, 'nprobe': 4}),
+    ('ivf_flat', {'nlist': 4, 'nprobe': 4, 'storage': 'int8'}),
+    ('ivf_pq', {'nlist': 4, 'nprobe': 4, 'm': 4, 'nbits': 4}),
+    ('hnsw', {'storage': 'int8'}),
+])
+def test_delete_rebuilds_lossy_index_from_original_vectors(vectors, index_type, params):
+    backend = FAISSBackend(VectorEmbeddings(), index_type, params)
+    store, ids = make_store(backend, vectors)
+    removed = set(ids[::3])
+    backend.delete(store, removed)
+
+    keep = [i for i, doc_id in enumerate(ids) if doc_id not in removed]
+    expected = build_index(index_type, vectors[keep], params)
+    expected.add(vectors[keep])
+    # 원본 벡터로 새로 학습하고 다시 추가한 색인과 같은 코드 (복원값을 다시 양자화하지 않음)
+    assert store.index.ntotal == len(keep)
+    assert faiss.serialize_index(store.index).tobytes() == faiss.serialize_index(expected).tobytes()
+    assert [store.index_to_docstore_id[i] for i in range(len(keep))] == [ids[i] for i in keep]
+    assert store.trained_count == len(keep)
+
+
+@pytest.mark.parametrize("index_type, params", [
+    ('flat', {}),
+    ('flat', {'storage': 'int8'}),
+    ('pq', {'m': 4, 'nbits': 4}),
+    ('hnsw', {}),
+])
+def test_delete_keeps_lossless_indexes(vectors, index_type, params):
+    index = build_index(index_type, vectors, params)
+    index.add(vectors)
+    before = index.reconstruct_n(0, index.ntotal)
+    assert remove_ids(index, [0, 5, 7])
+    after = index.reconstruct_n(0, index.ntotal)
+    np.testing.assert_array_equal(after, np.delete(before, [0, 5, 7], axis=0))
+
+
+def test_retrain_after_growth(vectors):
+    backend = FAISSBackend(VectorEmbeddings(), 'ivf_pq', {'nlist': 2, 'nprobe': 2, 'm': 4, 'nbits': 4})
+    first = 100
+    store, _ = make_store(backend, vectors[:first])
+    assert store.trained_count == first
+
+    def add(start, stop):
+        docs = make_docs(vectors[start:stop], start)
+        store.add_embeddings([(doc.page_content, v) for doc, v in zip(docs, vectors[start:stop])],
+                             metadatas=[doc.metadata for doc in docs], ids=[f"id{i}" for i in range(start, stop)])
+        backend.retrain_if_grown(store)
+
+    limit = int(first * RETRAIN_GROWTH_FACTOR)
+    add(first, limit)
+    assert store.trained_count == first  # 아직 배수를 넘지 않음
+    add(limit, limit + 50)
+    assert store.trained_count == store.index.ntotal == limit + 50
+    expected = build_index('ivf_pq', vectors[:limit + 50], {'nlist': 2, 'nprobe': 2, 'm': 4, 'nbits': 4})
+    expected.add(vectors[:limit + 50])
+    assert faiss.serialize_index(store.index).tobytes() == faiss.serialize_index(expected).tobytes()
+
+
+def test_trained_count_is_saved(tmp_path, vectors):
+    backend = FAISSBackend(VectorEmbeddings(), 'ivf_flat', {'nlist': 2, 'nprobe': 2})
+    store, _ = make_store(backend, vectors[:100])
+    store.trained_count = 42
+    backend.save(store, str(tmp_path))
+    assert backend.load(str(tmp_path), lazy=False).trained_count == 42
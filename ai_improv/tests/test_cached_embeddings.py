@@ -0,0 +1,122 @@
+# test_cached_embeddings.py
+import asyncio
+import pytest
+
+pytest.importorskip("langchain_ollama")
+from langchain_ollama import OllamaEmbeddings
+from cached_embeddings import CachedEmbeddings
+from feature_cache import FeatureCache
+from stub_servers import StubEmbedServer, fake_embedding
+
+MODEL = "stub-embed"
+TEXTS = [f"문서 {i}" for i in range(10)]
+
+
+def make_embeddings(server, cache_dir, **kwargs):
+    kwargs.setdefault("backoff", 0.0)
+    return CachedEmbeddings(OllamaEmbeddings(model=MODEL, base_url=server.url), model=MODEL,
+                            cache=FeatureCache(str(cache_dir)), **kwargs)
+
+
+def test_requests_per_batch(tmp_path):
+    with StubEmbedServer() as server:
+        embeddings = make_embeddings(server, tmp_path, batch_size=3, max_concurrency=1)
+        vectors = embeddings.embed_documents(TEXTS + TEXTS[:4])  # 중복 텍스트는 한 번만 보냄
+
+    assert server.batches == [3, 3, 3, 1]
+    assert server.calls == embeddings.requests == 4
+    assert embeddings.embedded_texts == len(TEXTS)
+    assert vectors == [pytest.approx(fake_embedding(t)) for t in TEXTS + TEXTS[:4]]
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 3])
+def test_max_concurrency(tmp_path, max_concurrency):
+    with StubEmbedServer(delay=0.05) as server:
+        embeddings = make_embeddings(server, tmp_path, batch_size=1, max_concurrency=max_concurrency)
+        embeddings.embed_documents(TEXTS)
+
+    assert server.calls == len(TEXTS)
+    assert server.max_in_flight == max_concurrency
+
+
+def test_async_max_concurrency(tmp_path):
+    with StubEmbedServer(delay=0.05) as server:
+        embeddings = make_embeddings(server, tmp_path, batch_size=1, max_concurrency=3)
+        vectors = asyncio.run(embeddings.aembed_documents(TEXTS))
+
+    assert server.calls == len(TEXTS)
+    assert server.max_in_flight == 3
+    assert vectors == [pytest.approx(fake_embedding(t)) for t in TEXTS]
+
+
+@pytest.mark.parametrize("statuses", [[500], [429], [500, 429]])
+def test_retry_after_server_error(tmp_path, statuses):
+    with StubEmbedServer(fail_statuses=statuses) as server:
+        embeddings = make_embeddings(server, tmp_path, batch_size=len(TEXTS), max_retries=3)
+        vectors = embeddings.embed_documents(TEXTS)
+
+    # 실패한 요청마다 같은 배치를 다시 보냄
+    assert server.calls == embeddings.requests == len(statuses) + 1
+    assert server.batches == [len(TEXTS)]
+    assert vectors == [pytest.approx(fake_embedding(t)) for t in TEXTS]
+
+
+def test_retries_exhausted(tmp_path):
+    with StubEmbedServer(fail_statuses=[500, 500]) as server:
+        embeddings = make_embeddings(server, tmp_path, max_retries=1)
+        with pytest.raises(Exception):
+            embeddings.embed_documents(TEXTS)
+
+    assert server.calls == 2
+    assert server.batches == []
+
+
+def test_second_pass_makes_no_calls(tmp_path):
+    with StubEmbedServer() as server:
+        first = make_embeddings(server, tmp_path, batch_size=4)
+        vectors = first.embed_documents(TEXTS)
+        calls = server.calls
+
+        # 같은 캐시 디렉토리를 쓰는 새 인스턴스 (다시 색인하는 경우)
+        second = make_embeddings(server, tmp_path, batch_size=4)
+        assert second.embed_documents(TEXTS) == vectors
+        assert second.embed_query(TEXTS[3]) == vectors[3]
+        assert asyncio.run(second.aembed_query(TEXTS[5])) == vectors[5]
+
+    assert calls == 3
+    assert server.calls == calls
+    assert second.requests == 0
+    assert second.stats()['hits'] == len(TEXTS) + 2
+
+
+def test_second_index_pass_makes_no_calls(tmp_path):
+    mido = pytest.importorskip("mido")
+    pytest.importorskip("music21")
+    from midi_vectorizer import MIDIVectorizer
+
+    midi_files = []
+    for i in range(3):
+        track = mido.MidiTrack()
+        for pitch in (60 + i, 64 + i, 67 + i, 72 + i):
+            track.append(mido.Message('note_on', note=pitch, velocity=80, time=0))
+            track.append(mido.Message('note_off', note=pitch, velocity=0, time=240))
+        path = tmp_path / f"stub_{i}.mid"
+        mido.MidiFile(tracks=[track]).save(str(path))
+        midi_files.append(str(path))
+
+    with StubEmbedServer() as server:
+        def index():
+            vectorizer = MIDIVectorizer(feature_cache=FeatureCache(str(tmp_path / "features")), embedding='ollama',
+                                        embedding_cache=FeatureCache(str(tmp_path / "embeddings")),
+                                        base_url=server.url, motif_length=None)
+            vectorstore = vectorizer.vectorize_midi(midi_files)
+            vectorstore.similarity_search("멜로디", k=1)
+            return vectorizer.embeddings
+
+        first = index()
+        calls = server.calls
+        second = index()
+
+    assert calls == first.requests > 0
+    assert server.calls == calls
+    assert second.requests == 0
@@ -0,0 +1,67 @@
+# test_chord_lut.py
+import json
+import pytest
+
+pytest.importorskip("music21")
+import chord_lut
+from chord_lut import ChordLookupTable, DEFAULT_LUT_PATH, get_chord_lut, installed_music21_version, _music21_common_name
+
+CHORDS = [(60, 64, 67), (62, 65, 69, 72), (55, 59, 62, 65), (60, 67), (48, 52, 55, 58, 62)]
+
+
+def write_lut(tmp_path, version, rename=None):
+    with open(DEFAULT_LUT_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data['music21_version'] = version
+    if rename:
+        # 다른 music21 버전에서 코드 이름이 바뀐 경우를 흉내 냄
+        for entry in data['entries']:
+            if entry[0] is not None:
+                entry[0] = rename
+    path = tmp_path / "chord_lut.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return str(path)
+
+
+def test_matching_version_uses_table(tmp_path):
+    lut = ChordLookupTable(write_lut(tmp_path, installed_music21_version()))
+    assert lut.names[0b10010001] == 'major triad'
+    for pitches in CHORDS:
+        assert lut.name(pitches) == _music21_common_name(pitches)
+
+
+def test_compatible_table_from_other_version_is_used(tmp_path, capsys):
+    lut = ChordLookupTable(write_lut(tmp_path, "0.0.1"))
+    assert capsys.readouterr().out == ""
+    assert lut.music21_version == "0.0.1"
+    assert lut.names[0b10010001] == 'major triad' and lut.dyads is not None
+
+
+def test_incompatible_table_falls_back_to_music21(tmp_path, capsys):
+    lut = ChordLookupTable(write_lut(tmp_path, "0.0.1", rename="renamed chord"))
+    assert "0.0.1" in capsys.readouterr().out
+    assert lut.music21_version == "0.0.1"
+    assert lut.names == [None] * len(lut.names) and lut.dyads is None
+    for pitches in CHORDS:
+        assert lut.name(pitches) == _music21_common_name(pitches)
+    assert lut.identify((60, 64, 67))['root'] == 0
+    assert lut.identify((60, 64, 67))['quality'] == 'major'
+
+
+def test_shipped_table_is_used_at_runtime(monkeypatch):
+    lut = get_chord_lut()
+    assert lut.dyads is not None
+    assert sum(name is not None for name in lut.names) > 4000
+
+    # 표에 있는 코드는 music21을 부르지 않고 이름/근음/성질을 돌려줌
+    def no_music21(*args):
+        raise AssertionError("music21로 계산했습니다")
+    monkeypatch.setattr(chord_lut, "_music21_common_name", no_music21)
+    monkeypatch.setattr(chord_lut, "_dyad_name", no_music21)
+    monkeypatch.setattr(chord_lut, "_music21_root_quality", no_music21)
+    fallbacks = lut.fallbacks
+    assert lut.identify((60, 64, 67)) == {'chord_id': 0b10010001, 'name': 'major triad', 'root': 0,
+                                          'quality': 'major'}
+    assert lut.name((57, 60, 64)) == 'minor triad'
+    assert lut.name((60, 67)) == lut.dyads[0][7 + chord_lut.MAX_INTERVAL]
+    assert lut.fallbacks == fallbacks
@@ -0,0 +1,75 @@
+# test_engine_parity.py
+import os
+import glob
+import numpy as np
+import pytest
+
+mido = pytest.importorskip("mido")
+pytest.importorskip("music21")
+from conftest import FIXTURES_DIR
+from midi_fast_parser import PERCUSSION_CHANNEL
+from midi_feature_extractor import MIDIFeatureExtractor, FEATURE_GROUPS, EXTENDED_GROUPS
+from note_table import KIND_REST, KIND_UNPITCHED, KIND_PERCUSSION_CHORD
+
+FIXTURES = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.mid")))
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return MIDIFeatureExtractor(use_cache=False, extended=True)
+
+
+def test_fixtures_present():
+    # 여러 트랙, 채널 9 타악기, 5/4와 7/8(중간 박자 변경), tpq 96/384/480/960, type 0 파일
+    assert len(FIXTURES) >= 5
+
+
+def test_percussion_fixture_is_unpitched(extractor):
+    table = extractor.extract_note_table(os.path.join(FIXTURES_DIR, "percussion.mid"), engine='mido')
+    assert np.isin(table.notes['kind'], (KIND_UNPITCHED, KIND_PERCUSSION_CHORD)).any()
+
+
+@pytest.mark.parametrize("midi_file", FIXTURES, ids=os.path.basename)
+def test_note_table_parity(extractor, midi_file):
+    expected = extractor.extract_note_table(midi_file, engine='music21')
+    table = extractor.extract_note_table(midi_file, engine='mido')
+
+    assert len(table.notes) == len(expected.notes) > 0
+    for field in table.notes.dtype.names:
+        if field != 'channel':
+            np.testing.assert_array_equal(table.notes[field], expected.notes[field], err_msg=field)
+    assert table.tempos == expected.tempos
+    assert table.key_signatures == expected.key_signatures
+    assert table.time_signatures == expected.time_signatures
+    assert table.instruments == expected.instruments
+
+
+@pytest.mark.parametrize("midi_file", FIXTURES, ids=os.path.basename)
+def test_channels(extractor, midi_file):
+    # music21 악보에는 노트별 채널이 없으므로 mido 엔진만 실제 채널을 채움
+    expected = {msg.channel for track in mido.MidiFile(midi_file).tracks for msg in track
+                if msg.type == 'note_on' and msg.velocity > 0}
+    table = extractor.extract_note_table(midi_file, engine='mido')
+    sounding = table.notes[table.notes['kind'] != KIND_REST]
+    assert set(sounding['channel'].tolist()) == expected
+    assert (table.notes['channel'][table.notes['kind'] == KIND_REST] == -1).all()
+    percussion = np.isin(table.notes['kind'], (KIND_UNPITCHED, KIND_PERCUSSION_CHORD))
+    assert (table.notes['channel'][percussion] == PERCUSSION_CHANNEL).all()
+    assert (extractor.extract_note_table(midi_file, engine='music21').notes['channel'] == -1).all()
+
+
+@pytest.mark.parametrize("midi_file", FIXTURES, ids=os.path.basename)
+def test_feature_parity(extractor, midi_file):
+    expected = extractor.extract_features(midi_file, engine='music21')
+    features = extractor.extract_features(midi_file, engine='mido')
+
+    assert set(features) == set(expected) == set(FEATURE_GROUPS + EXTENDED_GROUPS)
+    for name in FEATURE_GROUPS + EXTENDED_GROUPS:
+        assert features[name] == expected[name], name
+
+
+@pytest.mark.parametrize("midi_file", FIXTURES, ids=os.path.basename)
+def test_bytes_source_parity(extractor, midi_file):
+    with open(midi_file, "rb") as f:
+        payload = f.read()
+    assert extractor.extract_features(payload, engine='mido') == extractor.extract_features(payload, engine='music21')
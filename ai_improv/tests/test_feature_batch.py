@@ -0,0 +1,119 @@
+# test_feature_batch.py
+import os
+import glob
+import asyncio
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+
+pytest.importorskip("music21")
+from conftest import FIXTURES_DIR
+from feature_cache import FeatureCache
+from midi_feature_extractor import FEATURE_GROUPS, MIDIFeatureExtractor
+from midi_sources import source_name
+
+FIXTURES = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.mid")))
+RECORD_FIELDS = {'index', 'file', 'ok', 'features', 'melody_line', 'error_type', 'error', 'elapsed', 'cache_hit'}
+
+
+def sources(names):
+    """이름이 다른 (이름, bytes) 소스 목록 (내용은 픽스처를 돌려 씀)"""
+    data = [open(path, "rb").read() for path in FIXTURES]
+    return [(name, data[i % len(data)]) for i, name in enumerate(names)]
+
+
+@pytest.fixture
+def misbehaving(monkeypatch):
+    """이름이 crash로 시작하면 워커 프로세스를 죽이고, slow로 시작하면 오래 걸리는 추출기"""
+    extract_note_table = MIDIFeatureExtractor.extract_note_table
+
+    def patched(self, source, engine=None):
+        name = os.path.basename(source_name(source))
+        if name.startswith("crash"):
+            os._exit(1)
+        if name.startswith("slow"):
+            time.sleep(5)
+        return extract_note_table(self, source, engine)
+
+    monkeypatch.setattr(MIDIFeatureExtractor, "extract_note_table", patched)
+    return MIDIFeatureExtractor(use_cache=False)
+
+
+def test_records_come_back_for_every_input():
+    extractor = MIDIFeatureExtractor(use_cache=False)
+    records = list(extractor.extract_features_batch(FIXTURES + [("broken.mid", b"not a midi file")], workers=2))
+    assert sorted(record['index'] for record in records) == list(range(len(FIXTURES) + 1))
+    for record in records:
+        assert set(record) == RECORD_FIELDS
+        assert record['elapsed'] >= 0 and record['cache_hit'] is False
+
+    by_index = {record['index']: record for record in records}
+    for index, path in enumerate(FIXTURES):
+        assert by_index[index]['ok'] and by_index[index]['file'] == path
+        assert list(by_index[index]['features']) == list(FEATURE_GROUPS)
+    failure = by_index[len(FIXTURES)]
+    assert failure['ok'] is False and failure['file'] == "broken.mid"
+    assert failure['features'] is None and failure['melody_line'] is None
+    assert failure['error_type'] and failure['error']
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_timeout_returns_failure_record(misbehaving, workers):
+    records = list(misbehaving.extract_features_batch(sources(["a.mid", "slow.mid", "b.mid"]), workers=workers,
+                                                      timeout=0.5))
+    by_name = {record['file']: record for record in records}
+    slow = by_name["slow.mid"]
+    assert slow['ok'] is False and slow['error_type'] == 'FeatureExtractionTimeout'
+    assert 0.5 <= slow['elapsed'] < 5
+    assert by_name["a.mid"]['ok'] and by_name["b.mid"]['ok']
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="워커가 테스트에서 바꾼 추출기를 물려받으려면 fork가 필요")
+def test_worker_crash_does_not_lose_remaining_files(misbehaving):
+    workers = 2
+    names = [f"file{i}.mid" for i in range(3)] + ["crash.mid"] + [f"file{i}.mid" for i in range(3, 12)]
+    crash_index = names.index("crash.mid")
+    records = list(misbehaving.extract_features_batch(sources(names), workers=workers))
+
+    assert sorted(record['index'] for record in records) == list(range(len(names)))
+    by_index = {record['index']: record for record in records}
+    assert by_index[crash_index]['ok'] is False
+    for record in records:
+        if not record['ok']:
+            assert record['error_type'] == 'BrokenProcessPool'
+    # 비정상 종료 때 처리 중이던 파일만 실패할 수 있고, 그 뒤 파일은 새 풀에서 처리됨
+    assert all(by_index[index]['ok'] for index in range(crash_index + workers * 2, len(names)))
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="워커가 테스트에서 바꾼 추출기를 물려받으려면 fork가 필요")
+def test_async_extraction_without_executor_enforces_timeout(misbehaving):
+    slow, fast = sources(["slow.mid", "fast.mid"])
+    start = time.perf_counter()
+    with pytest.raises(ValueError, match="FeatureExtractionTimeout"):
+        asyncio.run(misbehaving.aextract_features(slow, timeout=0.5))
+    assert time.perf_counter() - start < 5
+    assert list(asyncio.run(misbehaving.aextract_features(fast, timeout=0.5))) == list(FEATURE_GROUPS)
+    misbehaving.close()
+
+
+def test_async_extraction_shares_one_process_pool(tmp_path):
+    extractor = MIDIFeatureExtractor(cache=FeatureCache(str(tmp_path)))
+
+    async def run():
+        return await asyncio.gather(*(extractor.aextract_features(path) for path in FIXTURES * 2))
+
+    try:
+        results = asyncio.run(run())
+        pool = extractor._pool
+        assert isinstance(pool, ProcessPoolExecutor)
+        asyncio.run(extractor.aextract_features(FIXTURES[0]))
+        assert extractor._pool is pool
+    finally:
+        extractor.close()
+    assert extractor._pool is None
+    assert all(list(features) == list(FEATURE_GROUPS) for features in results)
+    stats = extractor.cache_stats()
+    assert stats['hits'] + stats['misses'] == len(FIXTURES) * 2 + 1 and stats['hits'] >= 1
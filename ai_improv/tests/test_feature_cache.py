@@ -0,0 +1,123 @@
+# test_feature_cache.py
+import os
+import threading
+import pytest
+
+from feature_cache import FeatureCache
+
+PAYLOAD = b"x" * 1000  # 항목 하나가 약 1KB
+
+
+def entry_size(tmp_path):
+    cache = FeatureCache(str(tmp_path / "probe"))
+    cache.put("probe", PAYLOAD)
+    return cache.stats()['size_bytes']
+
+
+def test_counters_and_hit_rate(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    assert cache.get("a") is None
+    cache.put("a", {"tempo": 120})
+    assert cache.get("a") == {"tempo": 120}
+    assert cache.get("a") == {"tempo": 120}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'hit_rate': 0.0, 'entries': 0, 'size_bytes': 0,
+                             'max_bytes': cache.max_bytes}
+    assert os.listdir(tmp_path) == []
+
+
+def test_uncounted_lookups_are_recorded_explicitly(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.put("a", PAYLOAD)
+    assert cache.get("a", count=False) == PAYLOAD
+    assert cache.get("b", count=False) is None
+    assert (cache.hits, cache.misses) == (0, 0)
+    cache.record(hit=False)
+    cache.record(hit=True)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    size = entry_size(tmp_path)
+    cache = FeatureCache(str(tmp_path / "cache"), max_bytes=3 * size)
+    for key in "abc":
+        cache.put(key, PAYLOAD)
+    assert cache.get("a") == PAYLOAD  # a를 최근 사용으로 올림
+    cache.put("d", PAYLOAD)
+
+    assert cache.get("b") is None  # 가장 오래 사용하지 않은 b가 삭제됨
+    assert all(cache.get(key) == PAYLOAD for key in "acd")
+    stats = cache.stats()
+    assert stats['entries'] == 3 and stats['size_bytes'] <= cache.max_bytes
+    assert sorted(os.listdir(tmp_path / "cache")) == ["a.pkl", "c.pkl", "d.pkl"]
+
+
+def test_oversized_entry_is_kept_alone(tmp_path):
+    cache = FeatureCache(str(tmp_path), max_bytes=10)
+    cache.put("a", PAYLOAD)
+    cache.put("b", PAYLOAD)
+    assert cache.get("a") is None and cache.get("b") == PAYLOAD
+    assert cache.stats()['entries'] == 1
+
+
+def test_new_instance_orders_entries_by_mtime(tmp_path):
+    size = entry_size(tmp_path)
+    path = str(tmp_path / "cache")
+    first = FeatureCache(path, max_bytes=3 * size)
+    for key in "abc":
+        first.put(key, PAYLOAD)
+    # 다른 프로세스에서의 사용 순서는 파일 mtime으로 전달됨 (a가 가장 최근, b가 가장 오래됨)
+    for offset, key in enumerate("bca"):
+        os.utime(os.path.join(path, f"{key}.pkl"), (1_000_000 + offset, 1_000_000 + offset))
+
+    second = FeatureCache(path, max_bytes=3 * size)
+    assert second.stats()['entries'] == 3
+    second.put("d", PAYLOAD)
+    assert sorted(os.listdir(path)) == ["a.pkl", "c.pkl", "d.pkl"]
+
+
+def test_get_refreshes_mtime(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.put("a", PAYLOAD)
+    path = os.path.join(tmp_path, "a.pkl")
+    os.utime(path, (1_000_000, 1_000_000))
+    cache.get("a")
+    assert os.path.getmtime(path) > 1_000_000
+
+
+def test_file_removed_by_other_process_is_a_miss(tmp_path):
+    cache = FeatureCache(str(tmp_path))
+    cache.put("a", PAYLOAD)
+    os.remove(os.path.join(tmp_path, "a.pkl"))
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats['misses'], stats['entries'], stats['size_bytes']) == (1, 0, 0)
+
+
+def test_concurrent_threads_keep_index_consistent(tmp_path):
+    size = entry_size(tmp_path)
+    cache = FeatureCache(str(tmp_path / "cache"), max_bytes=20 * size)
+    rounds = 50
+
+    def worker(thread):
+        for i in range(rounds):
+            key = f"{(thread * 7 + i) % 40}"
+            if cache.get(key) is None:
+                cache.put(key, PAYLOAD)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 8 * rounds
+    files = [name for name in os.listdir(tmp_path / "cache")]
+    assert all(name.endswith(".pkl") for name in files)  # 임시 파일이 남지 않음
+    assert stats['entries'] == len(files) <= 20
+    assert stats['size_bytes'] == sum(os.path.getsize(tmp_path / "cache" / name) for name in files)
@@ -0,0 +1,69 @@
+# test_feature_groups.py
+import os
+import pytest
+
+pytest.importorskip("mido")
+pytest.importorskip("music21")
+from conftest import FIXTURES_DIR
+from feature_cache import FeatureCache
+from lazy_features import LazyFeatures
+from midi_feature_extractor import MIDIFeatureExtractor, FEATURE_GROUPS, EXTENDED_GROUPS, prompt_features
+
+MIDI_FILE = os.path.join(FIXTURES_DIR, "multi_track.mid")
+
+
+def test_default_schema_has_no_extended_groups():
+    features = MIDIFeatureExtractor(engine='mido', use_cache=False).extract_features(MIDI_FILE)
+    assert tuple(features) == FEATURE_GROUPS
+    assert set(features['harmony']) == {'chord_progression', 'unique_chords'}
+
+
+def test_extended_groups_on_request():
+    extractor = MIDIFeatureExtractor(engine='mido', use_cache=False)
+    extended = MIDIFeatureExtractor(engine='mido', use_cache=False, extended=True).extract_features(MIDI_FILE)
+    assert tuple(extended) == FEATURE_GROUPS + EXTENDED_GROUPS
+
+    lazy = extractor.extract_features(MIDI_FILE, groups=['profile', 'progression'])
+    assert isinstance(lazy, LazyFeatures)
+    assert lazy.to_dict() == {name: extended[name] for name in EXTENDED_GROUPS}
+    assert prompt_features(extended) == str(extractor.extract_features(MIDI_FILE))
+
+
+def test_extended_group_missing_from_cache_is_recomputed(tmp_path):
+    extractor = MIDIFeatureExtractor(engine='mido', cache=FeatureCache(str(tmp_path)))
+    extractor.extract_features(MIDI_FILE)
+    features = extractor.extract_features(MIDI_FILE, groups=['tempo', 'profile'])
+    assert features['profile']['melody_contour']
+    stats = extractor.cache_stats()
+    assert (stats['hits'], stats['misses']) == (0, 2)
+
+
+def test_recomputed_groups_are_stored(tmp_path, monkeypatch):
+    extractor = MIDIFeatureExtractor(engine='mido', cache=FeatureCache(str(tmp_path)))
+    default = extractor.extract_features(MIDI_FILE)
+    profile = extractor.extract_features(MIDI_FILE, groups=['profile'])['profile']
+
+    # 늘어난 딕셔너리가 저장되었으므로 다시 해석하지 않음
+    def no_parse(*args, **kwargs):
+        raise AssertionError("캐시된 파일을 다시 해석했습니다")
+    monkeypatch.setattr(MIDIFeatureExtractor, "extract_note_table", no_parse)
+    assert extractor.extract_features(MIDI_FILE, groups=['tempo', 'profile'])['profile'] == profile
+    assert extractor.extract_features(MIDI_FILE) == default
+    assert list(extractor.extract_features(MIDI_FILE)) == list(FEATURE_GROUPS)
+    stats = extractor.cache_stats()
+    assert (stats['hits'], stats['misses']) == (3, 2)
+
+
+def test_failed_files_are_not_counted(tmp_path):
+    extractor = MIDIFeatureExtractor(engine='mido', cache=FeatureCache(str(tmp_path)))
+    assert extractor.extract_features(b"not a midi file") == {}
+    records = list(extractor.extract_features_batch([("bad.mid", b"not a midi file"), MIDI_FILE, MIDI_FILE],
+                                                    workers=1))
+    assert [record['ok'] for record in records] == [False, True, True]
+    stats = extractor.cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_unknown_group():
+    with pytest.raises(ValueError):
+        MIDIFeatureExtractor(engine='mido', use_cache=False).extract_features(MIDI_FILE, groups=['nope'])
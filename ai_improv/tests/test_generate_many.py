@@ -0,0 +1,102 @@
+# test_generate_many.py
+import os
+import glob
+import json
+import time
+import threading
+import pytest
+
+pytest.importorskip("langchain_ollama")
+pytest.importorskip("music21")
+from conftest import FIXTURES_DIR
+from feature_cache import FeatureCache
+from llm_api import LLMAPI
+from midi_feature_extractor import MIDIFeatureExtractor
+from midi_rag import MIDIRAGSystem
+from midi_vectorizer import MIDIVectorizer
+from stub_servers import StubGenerateServer
+
+FIXTURES = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.mid")))
+NOTES = [{"pitch": 60 + i % 12, "time": i * 0.5, "duration": 0.5, "velocity": 80} for i in range(8)]
+RESPONSE = "```json\n" + json.dumps({"tracks": [{"instrument": 0, "notes": NOTES}],
+                                     "time_signatures": ["4/4"], "key_signatures": []}) + "\n```"
+
+
+@pytest.fixture(scope="module")
+def rag(tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp("features"))
+    system = MIDIRAGSystem()
+    system.vectorizer = MIDIVectorizer(feature_cache=FeatureCache(cache_dir), motif_length=None)
+    system.feature_extractor = MIDIFeatureExtractor(cache=FeatureCache(cache_dir), extended=True)
+    system.train(FIXTURES, workers=1)
+    yield system
+    system.close()
+
+
+def wait_until(condition, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "제한 시간 안에 조건을 만족하지 못했습니다."
+        time.sleep(0.01)
+
+
+def test_results_concurrency_bound_and_failed_inputs(rag):
+    inputs = [(os.path.basename(path), open(path, "rb").read()) for path in FIXTURES * 2]
+    inputs.append(("broken.mid", b"not a midi file"))
+    max_concurrency = 2
+    results = []
+
+    with StubGenerateServer(RESPONSE) as server:
+        rag.llm_api = LLMAPI(base_url=server.url)
+        consumer = threading.Thread(target=lambda: results.extend(
+            rag.generate_many(inputs, workers=1, max_concurrency=max_concurrency, search_batch=1)))
+        consumer.start()
+        # 응답을 붙잡아 둔 동안 LLM 호출은 max_concurrency개까지만 서버에 도착
+        wait_until(lambda: server.in_flight == max_concurrency)
+        time.sleep(0.5)
+        assert server.calls == max_concurrency
+        assert results == []
+        server.release.set()
+        consumer.join(timeout=60)
+        assert not consumer.is_alive()
+
+    assert server.max_in_flight == max_concurrency
+    assert server.calls == len(inputs) - 1
+    # 끝난 순서로 반환되지만 입력마다 정확히 한 번, index/source로 원래 입력을 찾을 수 있음
+    assert sorted(result.index for result in results) == list(range(len(inputs)))
+    for result in results:
+        assert result.source == inputs[result.index][0]
+    failed = [result for result in results if not result.ok]
+    assert [result.index for result in failed] == [len(inputs) - 1]
+    assert failed[0].error and failed[0].response is None
+    for result in results:
+        if result.ok:
+            assert len(result.data["tracks"][0]["notes"]) >= 100
+            assert set(result.timings) == {'features', 'search', 'llm', 'total'}
+            assert result.input_features and result.neighbors
+
+
+def test_llm_errors_are_reported_per_input(rag):
+    with StubGenerateServer(RESPONSE) as server:
+        url = server.url
+    # 서버를 닫은 주소로 호출하면 모든 LLM 호출이 연결 오류로 실패
+    rag.llm_api = LLMAPI(base_url=url)
+    results = list(rag.generate_many(FIXTURES, workers=1, max_concurrency=2))
+    assert sorted(result.index for result in results) == list(range(len(FIXTURES)))
+    for result in results:
+        assert not result.ok and result.response is None
+        assert result.error and ":" in result.error
+        assert 'llm' in result.timings
+        with pytest.raises(ValueError):
+            result.midi
+
+
+def test_search_error_is_raised_to_caller(rag, monkeypatch):
+    def failing_search(*args, **kwargs):
+        raise RuntimeError("검색 실패")
+    monkeypatch.setattr(rag, "search_many", failing_search)
+    with StubGenerateServer(RESPONSE, hold=False) as server:
+        rag.llm_api = LLMAPI(base_url=server.url)
+        with pytest.raises(RuntimeError, match="검색 실패"):
+            list(rag.generate_many(FIXTURES, workers=1))
+    assert server.calls == 0
@@ -0,0 +1,79 @@
+# test_generation_result.py
+import io
+import json
+import pytest
+
+mido = pytest.importorskip("mido")
+import generation_result
+from generation_result import GenerationResult, render_midi
+
+DATA = {
+    "tracks": [{"instrument": 33, "notes": [
+        {"pitch": 60, "time": 1.0, "duration": 0.5, "velocity": 90},
+        {"pitch": 64, "time": 0, "duration": 0.5},
+    ]}],
+    "time_signatures": ["3/4"],
+    "key_signatures": ["D"],
+}
+
+
+def test_render_midi_messages():
+    original = json.loads(json.dumps(DATA))
+    midi = mido.MidiFile(file=io.BytesIO(render_midi(DATA)))
+    assert midi.ticks_per_beat == 480 and len(midi.tracks) == 2
+
+    conductor = [msg for msg in midi.tracks[0] if msg.type != 'end_of_track']
+    assert [msg.type for msg in conductor] == ['set_tempo', 'time_signature', 'key_signature']
+    assert conductor[0].tempo == 500000
+    assert (conductor[1].numerator, conductor[1].denominator) == (3, 4)
+    assert conductor[2].key == 'D'
+
+    # 시간 순으로 정렬, 120 BPM에서 0.5초 = 480틱, velocity가 없으면 64
+    track = [msg for msg in midi.tracks[1] if msg.type != 'end_of_track']
+    assert (track[0].type, track[0].program) == ('program_change', 33)
+    notes = [(msg.type, msg.note, msg.velocity, msg.time) for msg in track[1:]]
+    assert notes == [('note_on', 64, 64, 0), ('note_off', 64, 0, 480),
+                     ('note_on', 60, 90, 480), ('note_off', 60, 0, 480)]
+    assert DATA == original  # 원본 음표 순서를 바꾸지 않음
+
+
+def test_render_midi_defaults():
+    midi = mido.MidiFile(file=io.BytesIO(render_midi({"tracks": [{"notes": [{"pitch": 70}]}]})))
+    conductor = [msg.type for msg in midi.tracks[0] if msg.type != 'end_of_track']
+    assert conductor == ['set_tempo', 'time_signature']  # 박자표가 없으면 4/4
+    assert midi.tracks[0][1].numerator == 4
+    track = [msg for msg in midi.tracks[1] if msg.type != 'end_of_track']
+    assert track[0].program == 0
+    assert (track[2].note, track[2].time) == (70, 960)  # 길이가 없으면 1초
+
+
+def test_midi_is_memoized(monkeypatch):
+    calls = []
+
+    def counting(data):
+        calls.append(data)
+        return render_midi(data)
+    monkeypatch.setattr(generation_result, "render_midi", counting)
+
+    result = GenerationResult(json.dumps(DATA), {}, [], {})
+    assert result.ok
+    first = result.midi
+    assert result.midi is first
+    assert len(calls) == 1 and calls[0] == DATA
+    assert result.json is result.json
+    assert json.loads(result.json) == DATA
+
+
+def test_unparsed_response():
+    result = GenerationResult("JSON이 아닌 응답", {}, [], {})
+    assert not result.ok and result.data is None
+    assert result.json == "JSON이 아닌 응답"
+    with pytest.raises(ValueError):
+        result.midi
+
+
+def test_error_result():
+    result = GenerationResult(None, None, [], {}, source="a.mid", index=3, error="ValueError: 해석 실패")
+    assert not result.ok and result.json == ""
+    with pytest.raises(ValueError, match="해석 실패"):
+        result.midi
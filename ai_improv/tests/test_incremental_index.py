@@ -0,0 +1,146 @@
+# test_incremental_index.py
+import os
+import json
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("music21")
+from conftest import write_melody
+from feature_cache import FeatureCache
+from index_manifest import MANIFEST_FILENAME, MANIFEST_VERSION, content_hash
+from midi_vectorizer import MIDIVectorizer
+
+MELODIES = {
+    "a.mid": [60, 62, 64, 65, 67, 65, 64, 62, 60, 67, 72, 71],
+    "b.mid": [48, 55, 52, 60, 57, 53, 50, 59, 62, 55, 48, 47],
+    "c.mid": [70, 68, 66, 65, 63, 61, 70, 75, 73, 72, 70, 68],
+    "d.mid": [40, 47, 45, 52, 50, 57, 55, 62, 60, 67, 65, 72],
+}
+MODIFIED_B = [48, 50, 52, 53, 55, 57, 59, 60, 62, 64, 65, 67]
+
+
+def backends():
+    params = ["faiss"]
+    try:
+        import chromadb  # noqa: F401
+        params.append("chroma")
+    except ImportError:
+        pass
+    return params
+
+
+def store_ids(vectorstore):
+    if hasattr(vectorstore, "index_to_docstore_id"):
+        return set(vectorstore.index_to_docstore_id.values())
+    return set(vectorstore.ids())
+
+
+def read_manifest(index_dir):
+    with open(os.path.join(index_dir, MANIFEST_FILENAME), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Corpus:
+    def __init__(self, tmp_path, backend):
+        self.root = tmp_path / "corpus"
+        self.root.mkdir()
+        self.index_dir = str(tmp_path / "index")
+        self.features = str(tmp_path / "features")
+        self.backend = backend
+
+    def write(self, name, pitches):
+        return write_melody(self.root / name, pitches)
+
+    def path(self, name):
+        return str(self.root / name)
+
+    def vectorizer(self, **kwargs):
+        return MIDIVectorizer(feature_cache=FeatureCache(self.features), backend=self.backend, **kwargs)
+
+    def update(self, **kwargs):
+        vectorizer = self.vectorizer(**kwargs)
+        vectorstore = vectorizer.update_vectorstore(str(self.root), self.index_dir, workers=1)
+        return vectorizer, vectorstore
+
+
+@pytest.fixture(params=backends())
+def corpus(request, tmp_path):
+    corpus = Corpus(tmp_path, request.param)
+    for name in ("a.mid", "b.mid", "c.mid"):
+        corpus.write(name, MELODIES[name])
+    return corpus
+
+
+def test_add_modify_delete(corpus):
+    vectorizer, vectorstore = corpus.update()
+    first = read_manifest(corpus.index_dir)
+    assert first['version'] == MANIFEST_VERSION and first['index_key'] == vectorizer.index_key()
+    assert set(first['files']) == {corpus.path(name) for name in ("a.mid", "b.mid", "c.mid")}
+    for name, entry in first['files'].items():
+        assert entry['hash'] == content_hash(name) and len(entry['doc_ids']) == 1
+    first_ids = {name: entry['doc_ids'] for name, entry in first['files'].items()}
+    assert store_ids(vectorstore) == {doc_id for ids in first_ids.values() for doc_id in ids}
+
+    # d 추가, b 수정, c 삭제
+    corpus.write("d.mid", MELODIES["d.mid"])
+    corpus.write("b.mid", MODIFIED_B)
+    os.remove(corpus.path("c.mid"))
+    vectorizer, vectorstore = corpus.update()
+    second = read_manifest(corpus.index_dir)['files']
+
+    assert set(second) == {corpus.path(name) for name in ("a.mid", "b.mid", "d.mid")}
+    assert second[corpus.path("a.mid")] == first['files'][corpus.path("a.mid")]
+    assert second[corpus.path("b.mid")]['hash'] == content_hash(corpus.path("b.mid")) != \
+        first['files'][corpus.path("b.mid")]['hash']
+    assert not set(second[corpus.path("b.mid")]['doc_ids']) & set(first_ids[corpus.path("b.mid")])
+    assert len(second[corpus.path("d.mid")]['doc_ids']) == 1
+    ids = store_ids(vectorstore)
+    assert ids == {doc_id for entry in second.values() for doc_id in entry['doc_ids']}
+    assert not ids & set(first_ids[corpus.path("c.mid")])
+    assert sorted(map(os.path.basename, vectorizer.motif_index.filenames())) == ["a.mid", "b.mid", "d.mid"]
+
+    # 다시 열어도 같은 문서 ID를 가짐 (저장된 색인과 목록이 일치)
+    reloaded = corpus.vectorizer().load_vectorstore(corpus.index_dir)
+    assert store_ids(reloaded) == ids
+
+    # 바뀐 것이 없으면 문서를 새로 만들지 않음
+    _, vectorstore = corpus.update()
+    assert read_manifest(corpus.index_dir)['files'] == second
+    assert store_ids(vectorstore) == ids
+
+
+def test_changed_settings_rebuild_everything(corpus):
+    corpus.update()
+    first = read_manifest(corpus.index_dir)
+    vectorizer, vectorstore = corpus.update(motif_length=3)
+    second = read_manifest(corpus.index_dir)
+    assert second['index_key'] == vectorizer.index_key() != first['index_key']
+    old_ids = {doc_id for entry in first['files'].values() for doc_id in entry['doc_ids']}
+    new_ids = {doc_id for entry in second['files'].values() for doc_id in entry['doc_ids']}
+    assert store_ids(vectorstore) == new_ids and not new_ids & old_ids
+
+
+def test_chroma_reconcile_after_interrupted_update(tmp_path):
+    pytest.importorskip("chromadb")
+    corpus = Corpus(tmp_path, "chroma")
+    for name in ("a.mid", "b.mid", "c.mid"):
+        corpus.write(name, MELODIES[name])
+    _, vectorstore = corpus.update()
+    files = read_manifest(corpus.index_dir)['files']
+
+    # 목록을 저장하기 전에 중단된 갱신: 목록에 없는 문서가 남고, a의 문서는 지워진 상태
+    kept = files[corpus.path("b.mid")]['doc_ids'][0]
+    row = vectorstore.collection.get(ids=[kept], include=['embeddings', 'documents', 'metadatas'])
+    vectorstore.collection.add(ids=["orphan"], embeddings=row['embeddings'], documents=row['documents'],
+                               metadatas=row['metadatas'])
+    vectorstore.delete(files[corpus.path("a.mid")]['doc_ids'])
+    del vectorstore
+
+    _, vectorstore = corpus.update()
+    repaired = read_manifest(corpus.index_dir)['files']
+    ids = store_ids(vectorstore)
+    assert "orphan" not in ids
+    assert ids == {doc_id for entry in repaired.values() for doc_id in entry['doc_ids']}
+    assert repaired[corpus.path("a.mid")]['doc_ids'] != files[corpus.path("a.mid")]['doc_ids']
+    assert repaired[corpus.path("b.mid")] == files[corpus.path("b.mid")]
+    assert repaired[corpus.path("c.mid")] == files[corpus.path("c.mid")]
@@ -0,0 +1,122 @@
+# test_index_registry.py
+import os
+import time
+import threading
+import pytest
+
+from index_registry import IndexRegistry
+
+
+class FakeVectorizer:
+    """디스크의 index.faiss 크기로만 예산을 계산하도록 저장소 대신 경로를 돌려주는 벡터라이저"""
+
+    def __init__(self, gates=None, started=None):
+        self.gates = gates or {}
+        self.started = started
+        self.motif_index = None
+
+    def load_vectorstore(self, path, lazy=True):
+        name = os.path.basename(path)
+        if self.started is not None:
+            self.started.append(name)
+        if name in self.gates:
+            assert self.gates[name].wait(20)
+        return None if name.startswith("broken") else f"store:{name}"
+
+
+def make_corpora(root, sizes):
+    registry_paths = {}
+    for name, size in sizes.items():
+        path = root / name
+        path.mkdir()
+        (path / "index.faiss").write_bytes(b"\0" * size)
+        registry_paths[name] = str(path)
+    return registry_paths
+
+
+def make_registry(tmp_path, sizes, memory_budget, **options):
+    registry = IndexRegistry(lambda: FakeVectorizer(**options), memory_budget=memory_budget)
+    for name, path in make_corpora(tmp_path, sizes).items():
+        registry.register(name, path)
+    return registry
+
+
+def test_lru_eviction_against_memory_budget(tmp_path):
+    registry = make_registry(tmp_path, {"a": 100, "b": 100, "c": 100}, memory_budget=250)
+    for name in ("a", "b", "c"):
+        assert registry.get(name).vectorstore == f"store:{name}"
+    stats = registry.stats()
+    assert stats['loaded'] == ["b", "c"]
+    assert stats['resident_bytes'] == 200
+    assert (stats['evictions'], stats['evicted_bytes']) == (1, 100)
+
+    # 적중한 코퍼스는 최근 사용으로 옮겨지므로 다음에는 c가 내려감
+    registry.get("b")
+    registry.get("a")
+    stats = registry.stats()
+    assert stats['loaded'] == ["b", "a"]
+    assert (stats['hits'], stats['loads'], stats['evictions']) == (1, 4, 2)
+    assert stats['resident_bytes'] <= stats['memory_budget']
+
+
+def test_corpus_larger_than_budget_stays_loaded(tmp_path):
+    registry = make_registry(tmp_path, {"small": 10, "large": 500}, memory_budget=100)
+    registry.get("small")
+    corpus = registry.get("large")
+    assert corpus.memory_bytes == 500
+    assert registry.stats()['loaded'] == ["large"]
+    assert registry.get("large") is corpus
+
+
+def test_evict_register_and_failures(tmp_path):
+    registry = make_registry(tmp_path, {"a": 10, "broken": 10}, memory_budget=100)
+    first = registry.get("a")
+    registry.evict("a")
+    assert registry.stats()['loaded'] == []
+    assert registry.get("a") is not first
+
+    registry.register("a", registry.paths["a"])
+    assert registry.stats()['loaded'] == []
+    with pytest.raises(ValueError):
+        registry.get("broken")
+    with pytest.raises(ValueError):
+        registry.get("missing")
+    stats = registry.stats()
+    assert (stats['loads'], stats['load_failures']) == (2, 1)
+
+
+def test_slow_load_does_not_block_other_corpora(tmp_path):
+    gate = threading.Event()
+    started = []
+    registry = make_registry(tmp_path, {"fast": 10, "slow": 10}, memory_budget=100,
+                             gates={"slow": gate}, started=started)
+    fast = registry.get("fast")
+
+    loaded = []
+    threads = [threading.Thread(target=lambda: loaded.append(registry.get("slow"))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    try:
+        deadline = time.monotonic() + 20
+        while "slow" not in started:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # 느린 로드가 끝나지 않은 동안에도 다른 코퍼스 조회와 통계는 바로 반환
+        hits = []
+        checker = threading.Thread(target=lambda: hits.extend(
+            [registry.get("fast") for _ in range(5)] + [registry.stats()['loaded']]))
+        checker.start()
+        checker.join(5)
+        assert not checker.is_alive()
+        assert hits == [fast] * 5 + [["fast"]]
+    finally:
+        gate.set()
+        for thread in threads:
+            thread.join(20)
+
+    # 같은 코퍼스를 동시에 요청해도 한 번만 로드
+    assert started.count("slow") == 1
+    assert len(loaded) == 3 and all(corpus is loaded[0] for corpus in loaded)
+    stats = registry.stats()
+    assert (stats['loads'], stats['hits']) == (2, 7)
+    assert stats['loaded'] == ["fast", "slow"]
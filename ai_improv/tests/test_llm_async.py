@@ -0,0 +1,104 @@
+# test_llm_async.py
+import os
+import json
+import glob
+import asyncio
+import pytest
+
+pytest.importorskip("langchain_ollama")
+pytest.importorskip("music21")
+from conftest import FIXTURES_DIR
+from feature_cache import FeatureCache
+from llm_api import LLMAPI
+from midi_feature_extractor import MIDIFeatureExtractor
+from midi_rag import MIDIRAGSystem
+from midi_vectorizer import MIDIVectorizer
+from stub_servers import StubGenerateServer
+
+CONCURRENT_CALLS = 300
+NOTES = [{"pitch": 60 + i % 12, "time": i * 0.5, "duration": 0.5, "velocity": 80} for i in range(8)]
+RESPONSE = "```json\n" + json.dumps({"tracks": [{"instrument": 0, "notes": NOTES}],
+                                     "time_signatures": ["4/4"], "key_signatures": []}) + "\n```"
+
+
+@pytest.fixture(scope="module")
+def rag(tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp("features"))
+    system = MIDIRAGSystem()
+    system.vectorizer = MIDIVectorizer(feature_cache=FeatureCache(cache_dir), motif_length=None)
+    system.feature_extractor = MIDIFeatureExtractor(cache=FeatureCache(cache_dir), extended=True)
+    system.train(sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.mid"))), workers=1)
+    yield system
+    system.close()
+
+
+async def wait_until(condition, timeout: float = 20.0):
+    """condition()이 참이 될 때까지 이벤트 루프를 돌리며 대기"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "제한 시간 안에 조건을 만족하지 못했습니다."
+        await asyncio.sleep(0.01)
+
+
+def test_hundreds_of_generations_in_flight(rag):
+    input_midi = os.path.join(FIXTURES_DIR, "multi_track.mid")
+
+    async def run(server):
+        tasks = [asyncio.create_task(rag.agenerate(input_midi)) for _ in range(CONCURRENT_CALLS)]
+        # 응답을 붙잡아 둔 동안 모든 요청이 한 이벤트 루프에서 동시에 서버에 도착해야 함
+        await wait_until(lambda: server.in_flight == CONCURRENT_CALLS)
+        server.release.set()
+        return await asyncio.gather(*tasks)
+
+    with StubGenerateServer(RESPONSE) as server:
+        rag.llm_api = LLMAPI(base_url=server.url)
+        results = asyncio.run(run(server))
+
+    assert server.calls == server.max_in_flight == CONCURRENT_CALLS
+    assert len(results) == CONCURRENT_CALLS
+    for result in results:
+        assert len(json.loads(result.response)["tracks"][0]["notes"]) >= 100
+        assert result.timings['llm'] > 0
+
+
+def test_max_connections_bounds_in_flight():
+    async def run():
+        return await asyncio.gather(*(llm_api.agenerate_response(f"입력 {i}", "유사 특징") for i in range(100)))
+
+    with StubGenerateServer(RESPONSE, hold=False, delay=0.02) as server:
+        llm_api = LLMAPI(base_url=server.url, max_connections=10)
+        results = asyncio.run(run())
+
+    assert server.calls == 100
+    assert server.max_in_flight == 10
+    assert all(isinstance(json.loads(response), dict) for response in results)
+
+
+def test_cancel_releases_connection_slot(rag):
+    input_midi = os.path.join(FIXTURES_DIR, "single_track_type0.mid")
+    slots = 4
+
+    async def run(server):
+        running = [asyncio.create_task(rag.agenerate(input_midi)) for _ in range(slots)]
+        await wait_until(lambda: server.in_flight == slots)
+        # 연결이 모두 사용 중이라 다음 호출은 서버에 도착하지 못하고 대기
+        waiting = asyncio.create_task(rag.agenerate(input_midi))
+        await asyncio.sleep(0.5)
+        assert server.calls == slots
+
+        running[0].cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running[0]
+        # 취소한 호출의 연결이 반환되어 대기하던 호출이 서버에 도착
+        await wait_until(lambda: server.calls == slots + 1)
+        server.release.set()
+        return await asyncio.gather(*running[1:], waiting)
+
+    with StubGenerateServer(RESPONSE) as server:
+        rag.llm_api = LLMAPI(base_url=server.url, max_connections=slots)
+        results = asyncio.run(run(server))
+
+    assert server.calls == slots + 1
+    assert len(results) == slots
+    assert all(len(json.loads(result.response)["tracks"][0]["notes"]) >= 100 for result in results)
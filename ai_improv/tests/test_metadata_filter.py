@@ -0,0 +1,93 @@
+# test_metadata_filter.py
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+from metadata_filter import GATHER_RATIO, filtered_search
+from vector_backends import FAISSBackend
+
+COUNT = 1000
+DIM = 16
+K = 10
+INDEXES = {
+    'flat': {},
+    'ivf_flat': {'nlist': 8, 'nprobe': 8},  # 모든 리스트를 탐색하므로 정확한 검색
+    'hnsw': {'ef_search': COUNT},
+}
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return np.random.default_rng(7).standard_normal((COUNT, DIM)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def stores(vectors):
+    stores = {}
+    for index_type, params in INDEXES.items():
+        store = FAISSBackend(None, index_type, params).create(vectors)
+        store.add_embeddings([(f"doc {i}", vector) for i, vector in enumerate(vectors)],
+                             metadatas=[{'position': i} for i in range(COUNT)], ids=[f"id{i}" for i in range(COUNT)])
+        stores[index_type] = store
+    return stores
+
+
+@pytest.fixture
+def bitmap_calls(monkeypatch):
+    """faiss 비트맵 선택자를 만든 횟수"""
+    calls = []
+    selector = faiss.IDSelectorBitmap
+
+    def spy(*args):
+        calls.append(args)
+        return selector(*args)
+    monkeypatch.setattr(faiss, "IDSelectorBitmap", spy)
+    return calls
+
+
+def brute_force(vectors, query, mask, k):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    positions = np.flatnonzero(mask)
+    order = positions[np.argsort(distances[positions], kind='stable')][:k]
+    return order.tolist(), distances[order]
+
+
+def check(store, vectors, query, mask):
+    found = filtered_search(store, query, K, mask)
+    positions = [doc.metadata['position'] for doc, _ in found]
+    expected, distances = brute_force(vectors, query, mask, K)
+    assert positions == expected
+    assert [score for _, score in found] == pytest.approx(distances.tolist(), rel=1e-4)
+
+
+@pytest.mark.parametrize("selectivity", [0.005, 0.05, GATHER_RATIO, 0.3, 0.7, 1.0])
+@pytest.mark.parametrize("index_type", list(INDEXES))
+def test_matches_brute_force(stores, vectors, bitmap_calls, index_type, selectivity):
+    rng = np.random.default_rng(int(selectivity * 1000))
+    mask = np.zeros(COUNT, dtype=bool)
+    mask[rng.choice(COUNT, int(COUNT * selectivity), replace=False)] = True
+    query = rng.standard_normal(DIM).astype(np.float32)
+    check(stores[index_type], vectors, query, mask)
+
+    # 후보가 적으면 직접 비교, flat은 더 가져와 거르고, 나머지는 비트맵 선택자
+    gathered = index_type != 'ivf_flat' and mask.sum() <= GATHER_RATIO * COUNT
+    assert bool(bitmap_calls) == (not gathered and index_type != 'flat')
+
+
+def test_overfetch_falls_back_to_bitmap(stores, vectors, bitmap_calls):
+    # 후보가 모두 질의에서 먼 벡터면 더 가져온 결과에 후보가 없어 비트맵 선택자로 다시 검색
+    query = vectors[0]
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    mask = np.zeros(COUNT, dtype=bool)
+    mask[np.argsort(distances)[-300:]] = True
+    check(stores['flat'], vectors, query, mask)
+    assert len(bitmap_calls) == 1
+
+
+def test_few_candidates_and_short_mask(stores, vectors):
+    mask = np.zeros(COUNT - 5, dtype=bool)  # 속성이 없는 마지막 문서들은 후보가 아님
+    mask[[3, 17]] = True
+    found = filtered_search(stores['flat'], vectors[3], K, mask)
+    assert [doc.metadata['position'] for doc, _ in found] == [3, 17]
+    assert filtered_search(stores['flat'], vectors[3], K, np.zeros(COUNT, dtype=bool)) == []
@@ -0,0 +1,23 @@
+# test_musical_embeddings.py
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("music21")
+from conftest import FIXTURES_DIR
+from midi_feature_extractor import MIDIFeatureExtractor
+from musical_embeddings import features_to_vector
+
+
+@pytest.mark.parametrize("name", ["five_four_tpq96.mid", "multi_track.mid"])
+def test_vectors_are_finite_unit_length(name):
+    # five_four_tpq96.mid는 단선율이라 코드 진행이 비어 있음
+    features = MIDIFeatureExtractor(engine='mido', use_cache=False, extended=True).extract_features(
+        os.path.join(FIXTURES_DIR, name))
+    vector = features_to_vector(features)
+    assert np.isfinite(vector).all()
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+
+
+def test_empty_features():
+    assert np.isfinite(features_to_vector({})).all()
@@ -0,0 +1,147 @@
+# test_near_duplicates.py
+import os
+import json
+import numpy as np
+import pytest
+
+pytest.importorskip("mmh3")
+from conftest import write_melody
+from near_duplicates import MIN_SHINGLES, NearDuplicateIndex
+
+# 음정/리듬 윤곽이 서로 다른 두 선율 (조옮김한 사본은 같은 곡으로 묶여야 함)
+THEME = [60, 62, 64, 60, 67, 65, 64, 62, 60, 59, 60, 64, 67, 72, 71, 67, 65, 64, 62, 60]
+THEME_BEATS = [1, 0.5, 0.5, 1, 2, 0.5, 0.5, 1, 1, 0.5, 0.5, 1, 1, 2, 0.5, 0.5, 1, 1, 0.5, 2]
+OTHER = [50, 57, 53, 62, 48, 55, 64, 52, 59, 67, 45, 60, 54, 63, 49, 58, 66, 51, 61, 56]
+OTHER_BEATS = [0.25, 1.5, 0.75, 3, 0.25, 1, 2, 0.5, 0.25, 1.5, 0.75, 1, 0.5, 0.25, 3, 1, 0.5, 0.25, 2, 1]
+
+
+def melody_line(pitches, beats):
+    onsets = np.concatenate([[0.0], np.cumsum(beats[:-1])])
+    return np.array(pitches, dtype=np.int16), onsets.astype(np.float32), np.arange(len(pitches)) == 0
+
+
+@pytest.fixture
+def index():
+    return NearDuplicateIndex(threshold=0.8)
+
+
+def test_transposed_copy_is_grouped_with_representative(index):
+    theme = index.signature(melody_line(THEME, THEME_BEATS))
+    assert index.add("theme.mid", theme) == (None, 0.0)
+    assert index.add("theme_up.mid", index.signature(melody_line([p + 5 for p in THEME], THEME_BEATS))) == \
+        ("theme.mid", 1.0)
+    assert index.add("other.mid", index.signature(melody_line(OTHER, OTHER_BEATS))) == (None, 0.0)
+    assert index.duplicates() == {"theme.mid": ["theme_up.mid"]}
+    with pytest.raises(ValueError):
+        index.add("theme.mid", theme)
+
+
+def test_short_melody_has_no_signature_and_is_always_kept(index):
+    short = melody_line(THEME[:MIN_SHINGLES], THEME_BEATS[:MIN_SHINGLES])
+    assert index.signature(short) is None
+    assert index.add("a.mid", None) == (None, 0.0)
+    assert index.add("b.mid", None) == (None, 0.0)
+    assert index.duplicates() == {}
+
+
+def test_removing_representative_returns_orphans_for_regrouping(index):
+    signatures = {name: index.signature(melody_line([p + shift for p in THEME], THEME_BEATS))
+                  for name, shift in (("a.mid", 0), ("b.mid", 2), ("c.mid", 7))}
+    for name, signature in signatures.items():
+        index.add(name, signature)
+    assert index.duplicates() == {"a.mid": ["b.mid", "c.mid"]}
+
+    orphans = index.remove(["a.mid", "missing.mid"])
+    assert set(orphans) == {"b.mid", "c.mid"}
+    assert len(index) == 0  # 고아도 색인에서 빠지므로 다시 add()해야 함
+
+    # 다시 묶으면 첫 고아가 새 대표가 되고 나머지는 그 대표의 중복
+    assert index.add("b.mid", orphans["b.mid"]) == (None, 0.0)
+    assert index.add("c.mid", orphans["c.mid"])[0] == "b.mid"
+    assert index.remove([]) == {}
+
+
+def test_removing_duplicate_keeps_representative(index):
+    index.add("a.mid", index.signature(melody_line(THEME, THEME_BEATS)))
+    index.add("b.mid", index.signature(melody_line([p - 3 for p in THEME], THEME_BEATS)))
+    assert index.remove(["b.mid"]) == {}
+    assert index.add("c.mid", index.signature(melody_line([p + 1 for p in THEME], THEME_BEATS)))[0] == "a.mid"
+
+
+def test_save_load_round_trip(index, tmp_path):
+    index.add("마음 솔로.mid", index.signature(melody_line(THEME, THEME_BEATS)))
+    index.add("copy.mid", index.signature(melody_line([p + 4 for p in THEME], THEME_BEATS)))
+    index.add("other.mid", index.signature(melody_line(OTHER, OTHER_BEATS)))
+    index.add("short.mid", None)
+    index.save(str(tmp_path))
+
+    with np.load(index.path(str(tmp_path)), allow_pickle=False) as data:
+        assert not any(data[name].dtype.hasobject for name in data.files)
+    loaded = NearDuplicateIndex.load(str(tmp_path), threshold=0.8)
+    assert list(loaded.entries) == list(index.entries)
+    for name, entry in index.entries.items():
+        restored = loaded.entries[name]
+        assert restored['representative'] == entry['representative']
+        assert restored['similarity'] == entry['similarity']
+        if entry['signature'] is None:
+            assert restored['signature'] is None
+        else:
+            assert np.array_equal(restored['signature'], entry['signature'])
+
+    # LSH 버킷도 다시 만들어져 새 사본이 기존 대표에 묶임
+    assert loaded.add("copy2.mid", loaded.signature(melody_line([p - 2 for p in THEME], THEME_BEATS)))[0] == \
+        "마음 솔로.mid"
+    assert NearDuplicateIndex.load(str(tmp_path), threshold=0.9) is None
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    pytest.importorskip("mido")
+    pytest.importorskip("music21")
+    pytest.importorskip("faiss")
+    root = tmp_path / "corpus"
+    root.mkdir()
+    return {name: write_melody(root / name, pitches, beats) for name, pitches, beats in (
+        ("a.mid", THEME, THEME_BEATS), ("b.mid", [p + 5 for p in THEME], THEME_BEATS),
+        ("c.mid", OTHER, OTHER_BEATS))}
+
+
+def indexed(vectorstore):
+    return sorted(os.path.basename(vectorstore.docstore.search(doc_id).metadata['filename'])
+                  for doc_id in vectorstore.index_to_docstore_id.values())
+
+
+def manifest_doc_ids(index_dir):
+    with open(os.path.join(index_dir, "manifest.json"), encoding="utf-8") as f:
+        files = json.load(f)['files']
+    return {os.path.basename(name): entry['doc_ids'] for name, entry in files.items()}
+
+
+def test_update_vectorstore_drops_and_promotes_duplicates(corpus, tmp_path):
+    from feature_cache import FeatureCache
+    from midi_vectorizer import MIDIVectorizer
+
+    index_dir = str(tmp_path / "index")
+
+    def update(files):
+        vectorizer = MIDIVectorizer(feature_cache=FeatureCache(str(tmp_path / "features")), dedup_threshold=0.8)
+        return vectorizer, vectorizer.update_vectorstore(files, index_dir, workers=1)
+
+    # b.mid는 a.mid의 조옮김이므로 문서 없이 목록에만 기록
+    vectorizer, vectorstore = update([corpus["a.mid"], corpus["b.mid"], corpus["c.mid"]])
+    assert indexed(vectorstore) == ["a.mid", "c.mid"]
+    doc_ids = manifest_doc_ids(index_dir)
+    assert doc_ids["b.mid"] == [] and len(doc_ids["a.mid"]) == len(doc_ids["c.mid"]) == 1
+    assert {os.path.basename(k): [os.path.basename(n) for n in v]
+            for k, v in vectorizer.dedup_index.duplicates().items()} == {"a.mid": ["b.mid"]}
+    assert sorted(map(os.path.basename, vectorizer.motif_index.filenames())) == ["a.mid", "c.mid"]
+
+    # 대표 a.mid가 사라지면 b.mid가 새 대표가 되어 문서가 만들어짐
+    os.remove(corpus["a.mid"])
+    vectorizer, vectorstore = update([corpus["b.mid"], corpus["c.mid"]])
+    assert indexed(vectorstore) == ["b.mid", "c.mid"]
+    new_ids = manifest_doc_ids(index_dir)
+    assert set(new_ids) == {"b.mid", "c.mid"}
+    assert len(new_ids["b.mid"]) == 1 and new_ids["c.mid"] == doc_ids["c.mid"]
+    assert vectorizer.dedup_index.duplicates() == {}
+    assert sorted(map(os.path.basename, vectorizer.motif_index.filenames())) == ["b.mid", "c.mid"]
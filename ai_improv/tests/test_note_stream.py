@@ -0,0 +1,82 @@
+# test_note_stream.py
+import json
+import math
+import pytest
+
+from note_stream import NoteStreamParser, _evaluate, parse_note, validate_note
+
+HOSTILE = ['9^9^9^9', '().__class__.__base__.__subclasses__().__len__()', '2**10**10', '__import__("os")',
+           '(' * 200 + '1' + ')' * 200]
+
+RESPONSE = json.dumps({"tracks": [
+    {"instrument": 33, "notes": [{"pitch": 40, "time": 0, "duration": 1, "velocity": 90},
+                                 {"pitch": 43, "time": 1, "duration": 0.5, "velocity": 70}]},
+    {"instrument": 0, "notes": [{"pitch": 72, "time": 0.5, "duration": 2}]}],
+    "time_signatures": ["4/4"]})
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(RESPONSE)])
+def test_parser_emits_notes_across_split_chunks(size):
+    parser = NoteStreamParser()
+    notes = []
+    for i in range(0, len(RESPONSE), size):
+        notes.extend(parser.feed(RESPONSE[i:i + size]))
+
+    assert [(n['track'], n['instrument'], n['pitch']) for n in notes] == [(0, 33, 40), (0, 33, 43), (1, 0, 72)]
+    assert notes[2] == {'track': 1, 'instrument': 0, 'pitch': 72, 'time': 0.5, 'duration': 2.0, 'velocity': 64}
+    assert parser.notes == 3 and parser.rejected == 0
+
+
+def test_parser_emits_note_as_soon_as_it_closes():
+    parser = NoteStreamParser()
+    assert parser.feed('{"tracks": [{"notes": [{"pitch": 60, "time": 0') == []
+    assert [n['pitch'] for n in parser.feed('}, {"pitch"')] == [60]
+
+
+def test_braces_inside_strings_are_ignored():
+    parser = NoteStreamParser()
+    notes = parser.feed('{"name": "{ \\"pitch\\" }", "notes": [{"pitch": 61}]}')
+    assert [n['pitch'] for n in notes] == [61]
+
+
+def test_expression_values():
+    assert parse_note('{"pitch": 60, "time": 0.6 + 1.8, "duration": 1.2}')['time'] == pytest.approx(2.4)
+    note = validate_note({'pitch': '48 + 12', 'time': '(1 + 2) * 0.5', 'duration': '3 / 2', 'velocity': '-(-90)'})
+    assert note['pitch'] == 60
+    assert note['time'] == pytest.approx(1.5)
+    assert note['duration'] == pytest.approx(1.5)
+    assert note['velocity'] == 90
+
+
+@pytest.mark.parametrize("raw", [
+    {'pitch': 128}, {'pitch': -1}, {'pitch': float('nan')}, {'pitch': float('inf')}, {'pitch': '1e308 * 10'},
+    {'pitch': 60, 'duration': 0}, {'pitch': 60, 'time': -1}, {'pitch': 60, 'duration': '1 / 0'},
+    {'pitch': None}, {'time': 1}, {'pitch': 'C4'}])
+def test_invalid_notes_are_dropped(raw):
+    assert validate_note(raw) is None
+
+
+def test_parser_counts_rejected_notes():
+    parser = NoteStreamParser()
+    notes = parser.feed('{"notes": [{"pitch": 200}, {"pitch": "nan"}, {"pitch": 64}]}')
+    assert [n['pitch'] for n in notes] == [64]
+    assert parser.rejected == 2
+
+
+@pytest.mark.parametrize("expr", HOSTILE)
+def test_hostile_expressions_are_rejected(expr):
+    with pytest.raises(ValueError):
+        _evaluate(expr)
+    assert validate_note({'pitch': expr}) is None
+
+
+def test_hostile_expression_does_not_stop_stream():
+    parser = NoteStreamParser()
+    notes = parser.feed(json.dumps({"notes": [{"pitch": "9^9^9^9"}, {"pitch": HOSTILE[1]}, {"pitch": 62}]}))
+    assert [n['pitch'] for n in notes] == [62]
+    assert parser.rejected == 2
+
+
+def test_evaluate_returns_float():
+    assert _evaluate('7') == 7.0 and isinstance(_evaluate('7'), float)
+    assert math.isinf(_evaluate('1e308 * 10'))
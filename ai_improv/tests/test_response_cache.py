@@ -0,0 +1,111 @@
+# test_response_cache.py
+import json
+import pytest
+
+import response_cache
+from response_cache import ResponseCache
+
+pytest.importorskip("langchain_ollama")
+from llm_api import LLMAPI, SAMPLING_PARAMS
+from stub_servers import StubGenerateServer
+
+NOTES = [{"pitch": 60 + i, "time": i * 0.5, "duration": 0.5, "velocity": 80} for i in range(4)]
+RESPONSE = "```json\n" + json.dumps({"tracks": [{"instrument": 0, "notes": NOTES}]}) + "\n```"
+KEY_ARGS = dict(input_features="{'tempo': 120}", doc_ids=["a", "b"], prompt_version="v1", model="llama3.2",
+                params={'temperature': 0.8})
+
+
+def test_ttl_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    cache.put("k", "응답")
+    now[0] += 59
+    assert cache.get("k") == "응답"
+    now[0] += 2
+    assert cache.get("k") is None
+    assert cache.get("k") is None  # 만료된 항목은 삭제되어 일반 미스
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expired'], stats['entries']) == (1, 2, 1, 0)
+    assert stats['ttl'] == 60
+
+
+def test_no_ttl_never_expires(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path), ttl=None)
+    cache.put("k", "응답")
+    now[0] += 10 ** 9
+    assert cache.get("k") == "응답"
+    assert cache.stats()['expired'] == 0
+
+
+def test_key_depends_on_every_input(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    base = cache.response_key(**KEY_ARGS)
+    assert cache.response_key(**dict(KEY_ARGS, params={'temperature': 0.8})) == base
+    changed = [dict(KEY_ARGS, input_features="{'tempo': 90}"), dict(KEY_ARGS, doc_ids=["b", "a"]),
+               dict(KEY_ARGS, prompt_version="v2"), dict(KEY_ARGS, model="other"),
+               dict(KEY_ARGS, params={'temperature': 0.9}), dict(KEY_ARGS, params={'temperature': 0.8, 'seed': 1})]
+    keys = {cache.response_key(**args) for args in changed}
+    assert base not in keys and len(keys) == len(changed)
+
+
+def test_key_ignores_param_order(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.response_key(**dict(KEY_ARGS, params={'seed': 1, 'top_k': 5})) == \
+        cache.response_key(**dict(KEY_ARGS, params={'top_k': 5, 'seed': 1}))
+
+
+def generate(llm_api, features="{'tempo': 120}"):
+    return llm_api.generate_response(features, "유사 특징", doc_ids=["a"])
+
+
+def test_llm_responses_are_reused(tmp_path):
+    with StubGenerateServer(RESPONSE, hold=False) as server:
+        llm_api = LLMAPI(base_url=server.url, cache=ResponseCache(str(tmp_path)))
+        first = generate(llm_api)
+        assert generate(llm_api) == first
+        assert server.calls == 1
+
+        generate(llm_api, "{'tempo': 90}")
+        assert server.calls == 2
+        # fresh는 캐시를 읽지 않고 새로 생성해 덮어씀 (솔로 확장이 무작위라 응답이 달라짐)
+        fresh = llm_api.generate_response("{'tempo': 120}", "유사 특징", doc_ids=["a"], fresh=True)
+        assert server.calls == 3
+        assert generate(llm_api) == fresh
+    assert server.calls == 3
+    assert llm_api.cache_stats()['hits'] == 2
+
+
+@pytest.mark.parametrize("change", ["prompt_version", "temperature", "seed"])
+def test_prompt_and_sampling_changes_miss(tmp_path, change):
+    assert change == "prompt_version" or change in SAMPLING_PARAMS
+    with StubGenerateServer(RESPONSE, hold=False) as server:
+        llm_api = LLMAPI(base_url=server.url, cache=ResponseCache(str(tmp_path)))
+        generate(llm_api)
+        if change == "prompt_version":
+            llm_api.prompt_version = "edited"
+        else:
+            setattr(llm_api.llm, change, 3)
+        generate(llm_api)
+        generate(llm_api)
+    assert server.calls == 2
+
+
+def test_cache_is_off_by_default(tmp_path):
+    with StubGenerateServer(RESPONSE, hold=False) as server:
+        llm_api = LLMAPI(base_url=server.url)
+        assert llm_api.cache is None and llm_api.cache_stats() == {}
+        generate(llm_api)
+        generate(llm_api)
+    assert server.calls == 2
+
+
+def test_unparsed_responses_are_not_cached(tmp_path):
+    with StubGenerateServer("JSON이 아닌 응답", hold=False) as server:
+        llm_api = LLMAPI(base_url=server.url, cache=ResponseCache(str(tmp_path)))
+        assert generate(llm_api) == "JSON이 아닌 응답"
+        generate(llm_api)
+    assert server.calls == 2
+    assert llm_api.cache_stats()['entries'] == 0
@@ -0,0 +1,142 @@
+# test_storage.py
+import os
+import glob
+import json
+import sqlite3
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("music21")
+from conftest import FIXTURES_DIR
+from feature_cache import FeatureCache
+from lazy_features import LazyFeatures
+from metadata_store import METADATA_FILENAME, DEFERRED_GROUPS, _unpack, read_metadata
+from midi_vectorizer import MIDIVectorizer
+from motif_index import MOTIF_FILENAME, MotifIndex, load_npz
+from near_duplicates import DEDUP_FILENAME
+from musical_rerank import rerank
+
+FIXTURES = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.mid")))
+
+
+def stored(value):
+    # 메타데이터는 JSON으로 저장되므로 튜플은 리스트로 돌아옴
+    return json.loads(json.dumps(value, ensure_ascii=False))
+
+
+@pytest.fixture(scope="module")
+def saved_store(tmp_path_factory):
+    root = tmp_path_factory.mktemp("store")
+    vectorizer = MIDIVectorizer(feature_cache=FeatureCache(str(root / "features")), dedup_threshold=0.8)
+    vectorstore = vectorizer.vectorize_midi(FIXTURES, workers=1)
+    path = str(root / "index")
+    vectorizer.save_vectorstore(vectorstore, path)
+    full = {doc_id: vectorstore.docstore.search(doc_id).metadata
+            for doc_id in vectorstore.index_to_docstore_id.values()}
+    return path, full
+
+
+def test_documents_table_has_no_bulky_groups(saved_store):
+    path, full = saved_store
+    conn = sqlite3.connect(os.path.join(path, METADATA_FILENAME))
+    try:
+        rows = conn.execute("SELECT doc_id, metadata FROM documents").fetchall()
+        deferred = dict(conn.execute("SELECT doc_id, features FROM features").fetchall())
+    finally:
+        conn.close()
+    assert len(rows) == len(full)
+    for doc_id, metadata in rows:
+        features = _unpack(metadata)['features']
+        assert not set(features) & set(DEFERRED_GROUPS)
+        assert set(_unpack(deferred[doc_id])) == set(DEFERRED_GROUPS)
+
+
+def test_lazy_store_reads_deferred_groups_on_access(saved_store):
+    path, full = saved_store
+    vectorizer = MIDIVectorizer(feature_cache=FeatureCache(os.path.join(os.path.dirname(path), "features")))
+    store = vectorizer.load_vectorstore(path)
+    doc_id = next(iter(full))
+    doc = store.docstore.search(doc_id)
+    features = doc.metadata['features']
+    assert isinstance(features, LazyFeatures)
+    assert features.computed == [name for name in full[doc_id]['features'] if name not in DEFERRED_GROUPS]
+    assert features.to_dict() == stored(full[doc_id]['features'])
+    assert list(features) == list(full[doc_id]['features'])
+
+    # 재정렬은 후보 문서의 profile을 그때 읽음
+    query = full[doc_id]['features']
+    docs = [store.docstore.search(other) for other in full]
+    assert rerank(query, docs, k=1)[0].id == doc_id
+
+
+def test_read_metadata_restores_full_features(saved_store):
+    path, full = saved_store
+    docs, positions = read_metadata(os.path.join(path, METADATA_FILENAME))
+    assert set(positions.values()) == set(full)
+    for doc_id, doc in docs.items():
+        assert doc.metadata == stored(full[doc_id])
+        assert list(doc.metadata['features']) == list(full[doc_id]['features'])
+
+
+def test_motif_and_dedup_indexes_are_memory_mapped(saved_store):
+    path, _ = saved_store
+    vectorizer = MIDIVectorizer(feature_cache=FeatureCache(os.path.join(os.path.dirname(path), "features")),
+                                dedup_threshold=0.8)
+    vectorizer.load_vectorstore(path)
+    motif = vectorizer.motif_index
+    assert isinstance(motif.pitches, np.memmap) and isinstance(motif.postings, np.memmap)
+    assert motif.files and all(isinstance(name, str) for name in motif.files)
+    signatures = [entry['signature'] for entry in vectorizer.dedup_index.entries.values()
+                  if entry['signature'] is not None]
+    assert signatures and isinstance(signatures[0].base, np.memmap)
+
+    # 메모리 매핑한 색인으로도 자기 자신의 선율을 찾음
+    line = motif.pitches[motif.file_offsets[0]:motif.file_offsets[1]]
+    onsets = motif.onsets[motif.file_offsets[0]:motif.file_offsets[1]]
+    assert motif.search(np.asarray(line[:8]), np.asarray(onsets[:8]), k=1)[0]['filename'] == motif.files[0]
+
+
+def test_npz_indexes_load_without_pickle(saved_store):
+    path, _ = saved_store
+    for filename in (MOTIF_FILENAME, DEDUP_FILENAME):
+        with np.load(os.path.join(path, filename), allow_pickle=False) as data:
+            assert not any(data[name].dtype.hasobject for name in data.files)
+
+
+def test_load_npz_refuses_object_arrays(tmp_path):
+    path = str(tmp_path / "legacy.npz")
+    np.savez(path, files=np.array(["a.mid", "b.mid"], dtype=object), offsets=np.arange(3))
+    with pytest.raises(ValueError):
+        load_npz(path)
+
+
+def test_motif_index_round_trips_unicode_names(tmp_path):
+    index = MotifIndex(length=3)
+    names = ["마음 솔로라인.mid", "b.mid"]
+    for name, pitches in zip(names, ([60, 62, 64, 65, 67], [60, 55, 59, 52, 57])):
+        index.add(name, (np.array(pitches), np.arange(5, dtype=np.float32), np.arange(5) == 0))
+    index.save(str(tmp_path))
+    loaded = MotifIndex.load(str(tmp_path), length=3)
+    assert loaded.files == names
+    assert loaded.search(np.array([70, 65, 69, 62]), np.arange(4), k=1)[0]['filename'] == names[1]
+
+
+def test_legacy_object_array_index_is_not_loaded(tmp_path):
+    index = MotifIndex(length=3)
+    index.save(str(tmp_path))
+    with np.load(MotifIndex.path(str(tmp_path))) as data:
+        arrays = dict(data)
+    arrays['files'] = np.array(["x.mid"], dtype=object)
+    np.savez(MotifIndex.path(str(tmp_path)), **arrays)
+    assert MotifIndex.load(str(tmp_path), length=3) is None
+
+
+def test_lazy_docstore_is_read_only(saved_store):
+    path, full = saved_store
+    store = MIDIVectorizer(feature_cache=FeatureCache(os.path.join(os.path.dirname(path), "features"))) \
+        .load_vectorstore(path)
+    with pytest.raises(TypeError, match="lazy=False"):
+        store.docstore.add({"new": store.docstore.search(next(iter(full)))})
+    with pytest.raises(TypeError, match="lazy=False"):
+        store.docstore.delete([next(iter(full))])
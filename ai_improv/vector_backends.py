@@ -0,0 +1,387 @@
+# vector_backends.py
+import os
+import json
+import uuid
+from typing import Dict, List
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from metadata_store import METADATA_FILENAME, write_metadata, open_metadata, read_metadata
+from metadata_filter import RANGE_FIELDS, TAG_FIELDS, feature_attributes
+from ann_index import (build_index, index_spec, remove_ids, rebuild_index, trained_on_data,
+                       RETRAIN_GROWTH_FACTOR)
+
+BACKENDS = ('faiss', 'chroma')
+INDEX_FILENAME = "index.faiss"
+# 색인을 학습한 벡터 수 등 색인 파일에 없는 정보
+INDEX_INFO_FILENAME = "index.json"
+CHROMA_FILENAME = "chroma.sqlite3"
+CHROMA_COLLECTION = "midi"
+# Chroma get()으로 전체 문서를 훑을 때 한 번에 읽는 수
+CHROMA_PAGE_SIZE = 10000
+
+
+class FAISSBackend:
+    """
+    FAISS 색인 + 문서 저장소 (langchain_community FAISS).
+    저장: index.faiss(FAISS 색인) + index.json(학습 벡터 수) + metadata.sqlite(문서 내용/메타데이터/필터 속성)
+    """
+
+    name = 'faiss'
+
+    def __init__(self, embeddings, index_type: str, index_params: Dict):
+        self.embeddings = embeddings
+        self.index_type = index_type
+        self.index_params = index_params
+
+    def spec(self) -> str:
+        """저장된 색인 재사용 여부 판단용 설정 문자열"""
+        return index_spec(self.index_type, self.index_params)
+
+    def create(self, vectors: List, path: str = None):
+        """빈 저장소 생성 (IVF/PQ 색인은 처음 추가하는 벡터로 학습, path는 사용하지 않음)"""
+        index = build_index(self.index_type, np.array(vectors, dtype=np.float32), self.index_params)
+        vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={}
+        )
+        vectorstore.trained_count = len(vectors)
+        return vectorstore
+
+    def delete(self, vectorstore, doc_ids):
+        """
+        문서 ID로 삭제 (FAISS.delete는 IVF/HNSW 색인의 번호를 맞추지 못하므로 직접 처리)
+        IVF/양자화 HNSW 색인은 남은 문서의 원본 벡터로 다시 학습해 새로 만듦
+        """
+        positions = {doc_id: position for position, doc_id in vectorstore.index_to_docstore_id.items()}
+        removed = sorted(positions[doc_id] for doc_id in doc_ids if doc_id in positions)
+        if not removed:
+            return
+        removed_set = set(removed)
+        remaining = [doc_id for position, doc_id in sorted(vectorstore.index_to_docstore_id.items())
+                     if position not in removed_set]
+        if not remove_ids(vectorstore.index, removed):
+            if remaining:
+                self._rebuild(vectorstore, remaining)
+            else:
+                vectorstore.index.reset()
+        vectorstore.docstore.delete([vectorstore.index_to_docstore_id[position] for position in removed])
+        vectorstore.index_to_docstore_id = dict(enumerate(remaining))
+
+    def retrain_if_grown(self, vectorstore):
+        """
+        문서를 추가한 뒤 호출: 양자화/IVF 색인의 벡터 수가 학습 때의 RETRAIN_GROWTH_FACTOR배를 넘으면
+        (처음 배치로 학습한 군집/코드북이 코퍼스를 대표하지 못하므로) 전체 원본 벡터로 다시 학습
+        """
+        index = vectorstore.index
+        trained = getattr(vectorstore, 'trained_count', None) or index.ntotal
+        if not trained_on_data(index) or index.ntotal <= RETRAIN_GROWTH_FACTOR * trained:
+            return
+        print(f"색인 벡터 {index.ntotal}개가 학습 벡터 {trained}개의 {RETRAIN_GROWTH_FACTOR:g}배를 넘어 "
+              f"원본 벡터로 다시 학습합니다.")
+        self._rebuild(vectorstore, [doc_id for _, doc_id in sorted(vectorstore.index_to_docstore_id.items())])
+
+    def _rebuild(self, vectorstore, doc_ids: List[str]):
+        """doc_ids 순서대로 원본 float 벡터를 다시 계산해 새로 학습한 색인으로 교체"""
+        vectors = self._original_vectors(vectorstore, doc_ids)
+        vectorstore.index = rebuild_index(self.index_type, vectors, self.index_params)
+        vectorstore.trained_count = len(vectors)
+
+    def _original_vectors(self, vectorstore, doc_ids: List[str]) -> np.ndarray:
+        """
+        문서의 양자화 전 벡터: 수치 임베딩은 메타데이터 특징으로 다시 계산하고,
+        모델 임베딩은 텍스트를 다시 임베딩 (CachedEmbeddings 디스크 캐시에서 읽으므로 모델 호출 없음)
+        """
+        docs = [vectorstore.docstore.search(doc_id) for doc_id in doc_ids]
+        if hasattr(self.embeddings, 'embed_features'):
+            vectors = [self.embeddings.embed_features(doc.metadata['features']) for doc in docs]
+        else:
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in docs])
+        return np.asarray(vectors, dtype=np.float32)
+
+    def save(self, vectorstore, path: str):
+        index_path = os.path.join(path, INDEX_FILENAME)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        faiss.write_index(vectorstore.index, tmp_path)
+        os.replace(tmp_path, index_path)
+        info_path = os.path.join(path, INDEX_INFO_FILENAME)
+        tmp_path = f"{info_path}.{os.getpid()}.tmp"
+        trained_count = getattr(vectorstore, 'trained_count', None) or vectorstore.index.ntotal
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'trained_count': trained_count}, f)
+        os.replace(tmp_path, info_path)
+        write_metadata(os.path.join(path, METADATA_FILENAME),
+                       vectorstore.docstore, vectorstore.index_to_docstore_id)
+
+    def load(self, path: str, lazy: bool = True, allow_dangerous_deserialization: bool = False):
+        """
+        lazy: True면 색인을 메모리 매핑하고 메타데이터는 검색된 문서만 SQLite에서 읽음 (읽기 전용).
+              False면 전체를 메모리로 읽음 (문서 추가/삭제 가능)
+        allow_dangerous_deserialization: 이전 형식(LangChain index.pkl) 저장소를 pickle로 읽을지 여부.
+              pickle은 읽는 것만으로 임의 코드를 실행할 수 있으므로 직접 만든 저장소에만 True로 지정
+        """
+        metadata_path = os.path.join(path, METADATA_FILENAME)
+        if not os.path.exists(metadata_path):
+            if not allow_dangerous_deserialization:
+                raise ValueError(f"{path}는 pickle(index.pkl)로 저장된 이전 형식 저장소입니다. "
+                                 "직접 만든 저장소라면 allow_dangerous_deserialization=True로 로드하세요.")
+            return FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+        index_path = os.path.join(path, INDEX_FILENAME)
+        if lazy:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC)
+            docstore, index_to_docstore_id = open_metadata(metadata_path)
+        else:
+            index = faiss.read_index(index_path)
+            docs, index_to_docstore_id = read_metadata(metadata_path)
+            docstore = InMemoryDocstore(docs)
+        vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+        try:
+            with open(os.path.join(path, INDEX_INFO_FILENAME), "r", encoding="utf-8") as f:
+                vectorstore.trained_count = json.load(f)['trained_count']
+        except (OSError, ValueError, KeyError):
+            # 학습 벡터 수를 기록하기 전에 저장한 색인은 현재 벡터 수로 학습했다고 봄
+            vectorstore.trained_count = index.ntotal
+        return vectorstore
+
+
+def faiss_batch_search(vectorstore, embeddings: List[List[float]], k: int) -> List[List[tuple]]:
+    """FAISS 저장소에서 여러 질의를 한 번의 색인 검색으로 처리 -> 질의별 [(Document, 거리), ...]"""
+    if not len(embeddings):
+        return []
+    scores, found = vectorstore.index.search(np.asarray(embeddings, dtype=np.float32), k)
+    results = []
+    for row_scores, row_found in zip(scores, found):
+        hits = []
+        for position, score in zip(row_found, row_scores):
+            if position < 0:
+                continue
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(position)])
+            if not isinstance(doc, str):
+                hits.append((doc, float(score)))
+        results.append(hits)
+    return results
+
+
+def _chroma_client(path: str = None):
+    # chromadb는 Chroma 백엔드에서만 필요하므로 사용할 때 가져옴
+    import chromadb
+    from chromadb.config import Settings
+    settings = Settings(anonymized_telemetry=False)
+    if path is None:
+        return chromadb.EphemeralClient(settings=settings)
+    return chromadb.PersistentClient(path=path, settings=settings)
+
+
+def _tag_key(field: str, value) -> str:
+    return f"{field}:{value}"
+
+
+def chroma_metadata(metadata: Dict) -> Dict:
+    """
+    Document 메타데이터 -> Chroma 메타데이터 (값은 스칼라만 가능)
+    원본은 JSON 문자열로 두고, 필터 속성은 범위 필드 값과 '필드:값' 불리언 키로 펼침
+    """
+    values, tags = feature_attributes(metadata.get('features') or {})
+    flat = {'filename': str(metadata.get('filename', '')),
+            'metadata': json.dumps(metadata, ensure_ascii=False, separators=(',', ':'))}
+    for field, value in zip(RANGE_FIELDS, values):
+        # 값이 없는 필드는 넣지 않으므로 어떤 범위 조건도 만족하지 않음 (AttributeIndex의 NaN과 같음)
+        if value is not None:
+            flat[field] = float(value)
+    for field, value in tags:
+        flat[_tag_key(field, value)] = True
+    return flat
+
+
+def chroma_where(filters: Dict):
+    """
+    필터 조건(metadata_filter 참고) -> Chroma where 절
+    조건이 없으면 None, 만족할 수 없는 조건(빈 값 목록)이 있으면 False
+    """
+    clauses = []
+    for field, condition in filters.items():
+        if field in RANGE_FIELDS:
+            low, high = condition
+            if low is not None:
+                clauses.append({field: {'$gte': float(low)}})
+            if high is not None:
+                clauses.append({field: {'$lte': float(high)}})
+        elif field in TAG_FIELDS:
+            values = [condition] if isinstance(condition, str) else list(condition)
+            if not values:
+                return False
+            options = [{_tag_key(field, value): True} for value in dict.fromkeys(str(value) for value in values)]
+            clauses.append(options[0] if len(options) == 1 else {'$or': options})
+        else:
+            raise ValueError(f"Unknown filter field: {field} (expected one of {RANGE_FIELDS + tuple(TAG_FIELDS)})")
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+class ChromaVectorStore:
+    """
+    Chroma 컬렉션을 FAISS 저장소와 같은 방식(add_embeddings, similarity_search, embedding_function)으로 쓰는 래퍼.
+    PersistentClient는 추가/삭제를 바로 디스크에 반영하고, 검색할 때 필요한 문서만 SQLite에서 읽습니다.
+    """
+
+    def __init__(self, client, collection, embedding_function, path: str = None):
+        self.client = client
+        self.collection = collection
+        self.embedding_function = embedding_function
+        self.path = path  # None이면 메모리 컬렉션
+
+    def __len__(self):
+        return self.collection.count()
+
+    def add_embeddings(self, text_embeddings, metadatas: List[Dict] = None, ids: List[str] = None):
+        text_embeddings = list(text_embeddings)
+        metadatas = metadatas or [{} for _ in text_embeddings]
+        ids = ids or [str(uuid.uuid4()) for _ in text_embeddings]
+        batch = self.client.get_max_batch_size()
+        for start in range(0, len(text_embeddings), batch):
+            rows = text_embeddings[start:start + batch]
+            self.collection.add(
+                ids=ids[start:start + batch],
+                embeddings=[np.asarray(vector, dtype=np.float32) for _, vector in rows],
+                documents=[text for text, _ in rows],
+                metadatas=[chroma_metadata(metadata) for metadata in metadatas[start:start + batch]]
+            )
+        return ids
+
+    def delete(self, ids):
+        ids = list(ids)
+        batch = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch):
+            self.collection.delete(ids=ids[start:start + batch])
+
+    def ids(self) -> List[str]:
+        """저장된 모든 문서 ID"""
+        ids = []
+        while True:
+            page = self.collection.get(include=[], limit=CHROMA_PAGE_SIZE, offset=len(ids))['ids']
+            ids.extend(page)
+            if len(page) < CHROMA_PAGE_SIZE:
+                return ids
+
+    def batch_search_by_vector(self, embeddings: List[List[float]], k: int = 4,
+                               filters: Dict = None) -> List[List[tuple]]:
+        """임베딩마다 가까운 k개 문서 -> 질의별 [(Document, 제곱 L2 거리), ...] (한 번의 컬렉션 질의)"""
+        where = chroma_where(filters) if filters else None
+        k = min(k, len(self))
+        if where is False or k == 0 or not len(embeddings):
+            return [[] for _ in embeddings]
+        result = self.collection.query(query_embeddings=[np.asarray(e, dtype=np.float32) for e in embeddings],
+                                       n_results=k, where=where, include=['documents', 'metadatas', 'distances'])
+        return [[(Document(page_content=text, metadata=json.loads(metadata['metadata']), id=doc_id), float(distance))
+                 for doc_id, text, metadata, distance in zip(ids, texts, metadatas, distances)]
+                for ids, texts, metadatas, distances in zip(result['ids'], result['documents'],
+                                                             result['metadatas'], result['distances'])]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filters: Dict = None) -> List[tuple]:
+        """임베딩과 가까운 k개 문서 -> [(Document, 제곱 L2 거리), ...] (filters: metadata_filter 조건)"""
+        return self.batch_search_by_vector([embedding], k, filters)[0]
+
+    def similarity_search(self, query: str, k: int = 4, filters: Dict = None) -> List[Document]:
+        embedding = self.embedding_function.embed_query(query)
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filters)]
+
+    def copy_to(self, path: str) -> 'ChromaVectorStore':
+        """모든 문서를 path의 새 영구 컬렉션으로 복사 (기존 컬렉션은 지움)"""
+        target = ChromaBackend.create_store(self.embedding_function, path)
+        offset = 0
+        while True:
+            page = self.collection.get(include=['embeddings', 'documents', 'metadatas'],
+                                       limit=CHROMA_PAGE_SIZE, offset=offset)
+            if not page['ids']:
+                return target
+            # 메타데이터는 이미 Chroma 형식이므로 add_embeddings를 거치지 않고 그대로 추가
+            target.collection.add(ids=page['ids'], embeddings=page['embeddings'],
+                                  documents=page['documents'], metadatas=page['metadatas'])
+            offset += len(page['ids'])
+
+
+class ChromaBackend:
+    """
+    Chroma 영구 저장소 (chromadb PersistentClient).
+    저장 디렉토리에 chroma.sqlite3와 HNSW 세그먼트를 두고, 로드할 때 전체를 읽지 않고 열기만 합니다.
+    Chroma가 자체 HNSW 색인을 쓰므로 index_type/index_params는 사용하지 않습니다.
+    """
+
+    name = 'chroma'
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def spec(self) -> str:
+        return "chroma"
+
+    @staticmethod
+    def create_store(embeddings, path: str = None) -> ChromaVectorStore:
+        client = _chroma_client(path)
+        if path is None:
+            # 메모리 클라이언트는 프로세스 안에서 공유되므로 저장소마다 다른 컬렉션 이름 사용
+            name = f"{CHROMA_COLLECTION}_{uuid.uuid4().hex}"
+        else:
+            name = CHROMA_COLLECTION
+            if _has_collection(client, name):
+                client.delete_collection(name)
+        collection = client.create_collection(name, embedding_function=None)
+        return ChromaVectorStore(client, collection, embeddings, path)
+
+    def create(self, vectors: List, path: str = None) -> ChromaVectorStore:
+        """빈 저장소 생성 (path가 있으면 그 디렉토리의 기존 컬렉션을 지우고 새로 만듦)"""
+        return self.create_store(self.embeddings, path)
+
+    def delete(self, vectorstore: ChromaVectorStore, doc_ids):
+        vectorstore.delete(doc_ids)
+
+    def retrain_if_grown(self, vectorstore: ChromaVectorStore):
+        # Chroma HNSW는 학습 단계가 없고 추가/삭제를 직접 처리함
+        pass
+
+    def save(self, vectorstore: ChromaVectorStore, path: str):
+        # 같은 디렉토리의 영구 컬렉션은 추가/삭제 때 이미 저장됨
+        if vectorstore.path is None or os.path.abspath(vectorstore.path) != os.path.abspath(path):
+            vectorstore.copy_to(path)
+
+    def load(self, path: str, lazy: bool = True, allow_dangerous_deserialization: bool = False) -> ChromaVectorStore:
+        """
+        저장된 컬렉션 열기 (lazy와 관계없이 문서는 검색할 때 필요한 것만 읽고, 추가/삭제 가능)
+        Chroma 저장소는 pickle을 쓰지 않으므로 allow_dangerous_deserialization은 사용하지 않음
+        """
+        if not os.path.exists(os.path.join(path, CHROMA_FILENAME)):
+            raise FileNotFoundError(f"Chroma 저장소를 찾을 수 없습니다: {path}")
+        client = _chroma_client(path)
+        if not _has_collection(client, CHROMA_COLLECTION):
+            raise FileNotFoundError(f"Chroma 컬렉션 '{CHROMA_COLLECTION}'이 없습니다: {path}")
+        return ChromaVectorStore(client, client.get_collection(CHROMA_COLLECTION, embedding_function=None),
+                                 self.embeddings, path)
+
+
+def _has_collection(client, name: str) -> bool:
+    from chromadb.errors import ChromaError
+    try:
+        client.get_collection(name, embedding_function=None)
+        return True
+    except (ChromaError, ValueError):
+        return False
+
+
+def make_backend(backend: str, embeddings, index_type: str, index_params: Dict):
+    """backend 이름으로 저장소 백엔드 생성"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (expected one of {BACKENDS})")
+    if backend == 'chroma':
+        return ChromaBackend(embeddings)
+    return FAISSBackend(embeddings, index_type, index_params)